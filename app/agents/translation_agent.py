@@ -4,9 +4,11 @@ Translation agent using IO Intelligence framework for medical consensus results.
 
 import os
 import asyncio
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Union, Iterator, AsyncIterator
 from dotenv import load_dotenv
 
+from app.models.llm_client import IOIntelligenceClient
+
 try:
     from iointel import Agent, Workflow
     IOINTEL_AVAILABLE = True
@@ -17,6 +19,21 @@ except ImportError:
 # Load environment variables
 load_dotenv()
 
+TRANSLATION_MODEL = "meta-llama/Llama-3.3-70B-Instruct"
+TRANSLATION_INSTRUCTIONS = """You are a specialized medical translation assistant. 
+                Your role is to translate medical consensus reports, diagnoses, and treatment plans 
+                while maintaining medical accuracy and terminology. 
+                
+                Important guidelines:
+                1. Preserve all medical terms and their accuracy
+                2. Maintain the professional tone of medical documents
+                3. Keep the structure and formatting of the original text
+                4. Ensure medical abbreviations and terms are correctly translated
+                5. Preserve numerical values, percentages, and measurements exactly
+                6. Maintain the hierarchical structure of medical reports
+                
+                When translating medical content, prioritize accuracy over fluency."""
+
 class MedicalTranslationAgent:
     """
     Medical translation agent using IO Intelligence framework.
@@ -34,6 +51,7 @@ class MedicalTranslationAgent:
         self.base_url = base_url
         self.agent = None
         self.workflow = None
+        self.last_stream_metrics: Optional[Dict[str, Any]] = None
         
         if IOINTEL_AVAILABLE and self.api_key:
             self._initialize_agent()
@@ -43,20 +61,8 @@ class MedicalTranslationAgent:
         try:
             self.agent = Agent(
                 name="Medical Translation Agent",
-                instructions="""You are a specialized medical translation assistant. 
-                Your role is to translate medical consensus reports, diagnoses, and treatment plans 
-                while maintaining medical accuracy and terminology. 
-                
-                Important guidelines:
-                1. Preserve all medical terms and their accuracy
-                2. Maintain the professional tone of medical documents
-                3. Keep the structure and formatting of the original text
-                4. Ensure medical abbreviations and terms are correctly translated
-                5. Preserve numerical values, percentages, and measurements exactly
-                6. Maintain the hierarchical structure of medical reports
-                
-                When translating medical content, prioritize accuracy over fluency.""",
-                model="meta-llama/Llama-3.3-70B-Instruct",
+                instructions=TRANSLATION_INSTRUCTIONS,
+                model=TRANSLATION_MODEL,
                 api_key=self.api_key,
                 base_url=self.base_url
             )
@@ -157,6 +163,79 @@ class MedicalTranslationAgent:
             print(f"Sync translation error: {e}")
             return f"[Translation failed: {str(e)}]\n\n{text}"
     
+    def _translation_messages(self, text: str, target_language: str) -> List[Dict[str, str]]:
+        """Build the chat messages asking for a translation."""
+        return [
+            {"role": "system", "content": TRANSLATION_INSTRUCTIONS},
+            {"role": "user", "content": f"Translate the following medical text to {target_language}. "
+                                        f"Return only the translation.\n\n{text}"}
+        ]
+    
+    async def stream_medical_text(self, text: str, target_language: str) -> AsyncIterator[str]:
+        """
+        Translate medical text, yielding the translation as it is generated.
+        
+        The translation is streamed from the chat completions API, so callers can show it
+        before it is complete. Timing and usage of the stream are kept in last_stream_metrics.
+        Without an API key, or if the stream fails before any text, the translation of
+        translate_medical_text is yielded in one piece.
+        
+        Args:
+            text: Medical text to translate
+            target_language: Target language code (e.g., 'spanish', 'french', 'german')
+            
+        Yields:
+            Pieces of the translated text
+        """
+        if not self.api_key:
+            yield await self.translate_medical_text(text, target_language)
+            return
+        
+        stream = IOIntelligenceClient(api_key=self.api_key, base_url=self.base_url).astream_chat_completion(
+            self._translation_messages(str(text), target_language), model=TRANSLATION_MODEL, temperature=0.2
+        )
+        try:
+            async for delta in stream:
+                yield delta
+        except Exception as e:
+            print(f"Streaming translation error: {e}")
+            if stream.content:
+                yield f"\n\n[Translation interrupted: {str(e)}]"
+            else:
+                yield await self.translate_medical_text(text, target_language)
+        finally:
+            self.last_stream_metrics = stream.metrics()
+    
+    def stream_medical_text_sync(self, text: str, target_language: str) -> Iterator[str]:
+        """
+        Synchronous version of stream_medical_text.
+        
+        Args:
+            text: Medical text to translate
+            target_language: Target language code
+            
+        Yields:
+            Pieces of the translated text
+        """
+        if not self.api_key:
+            yield self.translate_medical_text_sync(text, target_language)
+            return
+        
+        stream = IOIntelligenceClient(api_key=self.api_key, base_url=self.base_url).stream_chat_completion(
+            self._translation_messages(str(text), target_language), model=TRANSLATION_MODEL, temperature=0.2
+        )
+        try:
+            for delta in stream:
+                yield delta
+        except Exception as e:
+            print(f"Streaming translation error: {e}")
+            if stream.content:
+                yield f"\n\n[Translation interrupted: {str(e)}]"
+            else:
+                yield self.translate_medical_text_sync(text, target_language)
+        finally:
+            self.last_stream_metrics = stream.metrics()
+    
     async def translate_consensus_report(self, consensus_data: Dict[str, Any], target_language: str) -> Dict[str, Any]:
         """
         Translate an entire consensus report.
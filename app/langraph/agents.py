@@ -5,7 +5,11 @@ Agents for the Consensus Mechanism AI Agents system.
 import os
 import json
 import re
-from typing import Dict, Any, List, Tuple, Optional, Callable
+import time
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Tuple, Optional, Callable, Awaitable, NamedTuple
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
@@ -14,13 +18,22 @@ from langchain_core.tools import BaseTool
 from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain.tools import Tool, StructuredTool
 
-from app.tools.web_search import GoogleSearchTool, WebScraper, SerpApiSearchTool, web_search
-from app.models.llm_client import get_llm
+from app.tools.web_search import GoogleSearchTool, WebScraper, SerpApiSearchTool, web_search, async_web_search
+from app.models.llm_client import get_llm, get_llm_manager
 from app.models.lung_cancer_classifier import LungCancerClassifier
 from app.models.lung_cancer_stager import LungCancerStager
 from app.models.lung_cancer_treatment_advisor import LungCancerTreatmentAdvisor
 from app.models.lung_cancer_prognosis import LungCancerPrognosisPredictor
 from app.models.clinical_trial_finder import ClinicalTrialFinder
+from app.langraph.metrics import with_metrics, estimate_tokens
+from app.langraph.digest import build_digest
+from app.langraph.token_budget import fit_to_budget
+from app.models.token_usage import TokenUsage, get_token_usage, usage_from_response
+from app.langraph.node_cache import NodeCache, get_node_cache
+from app.langraph.semantic_cache import get_semantic_cache
+from app.tools.single_flight import get_single_flight
+from app.langraph.convergence import CONVERGENCE_THRESHOLD, consensus_similarity, diagnoses_similarity
+from prompts import PERSONAS, EXPERT_ANALYSIS_PROMPT_TEMPLATE, CONSENSUS_SYNTHESIS_PROMPT_TEMPLATE
 
 def filter_thinking_tags(content: str) -> str:
     """
@@ -52,6 +65,400 @@ def filter_thinking_tags(content: str) -> str:
     
     return content
 
+class ThinkingTagFilter:
+    """
+    Incremental version of filter_thinking_tags for streamed text.
+    
+    Text inside thinking tags is dropped as it arrives. Text that could be the start of an
+    opening tag is held back until the next chunk decides it.
+    """
+    
+    TAGS = [
+        ("<think>", "</think>"),
+        ("[thinking]", "[/thinking]"),
+        ("[thought]", "[/thought]"),
+        ("[reasoning]", "[/reasoning]")
+    ]
+    
+    def __init__(self):
+        """Initialize the filter."""
+        self._buffer = ""
+        self._closing_tag = None  # Closing tag we are waiting for while inside a thinking span
+        self._started = False  # Leading whitespace is dropped like filter_thinking_tags does
+    
+    def feed(self, text: str) -> str:
+        """
+        Add a chunk of streamed text.
+        
+        Args:
+            text: New text from the stream
+            
+        Returns:
+            Text that can be shown now
+        """
+        self._buffer += text
+        output = ""
+        
+        while self._buffer:
+            if self._closing_tag:
+                end = self._buffer.find(self._closing_tag)
+                if end == -1:
+                    # Keep just enough to recognise a closing tag split across chunks
+                    self._buffer = self._buffer[-(len(self._closing_tag) - 1):]
+                    break
+                self._buffer = self._buffer[end + len(self._closing_tag):]
+                self._closing_tag = None
+                continue
+            
+            # Find the earliest opening tag
+            start, match = -1, None
+            for opening, closing in self.TAGS:
+                index = self._buffer.find(opening)
+                if index != -1 and (start == -1 or index < start):
+                    start, match = index, (opening, closing)
+            
+            if match:
+                output += self._buffer[:start]
+                self._buffer = self._buffer[start + len(match[0]):]
+                self._closing_tag = match[1]
+                continue
+            
+            # Hold back a suffix that could still become an opening tag
+            held = 0
+            for opening, _ in self.TAGS:
+                for length in range(min(len(opening) - 1, len(self._buffer)), 0, -1):
+                    if self._buffer.endswith(opening[:length]):
+                        held = max(held, length)
+                        break
+            output += self._buffer[:len(self._buffer) - held]
+            self._buffer = self._buffer[len(self._buffer) - held:]
+            break
+        
+        return self._emit(output)
+    
+    def flush(self) -> str:
+        """
+        Finish the stream.
+        
+        Returns:
+            Remaining text that was held back (nothing if a thinking span is unterminated)
+        """
+        output = "" if self._closing_tag else self._buffer
+        self._buffer = ""
+        return self._emit(output)
+    
+    def _emit(self, output: str) -> str:
+        """Drop leading whitespace of the whole stream."""
+        if not self._started:
+            output = output.lstrip()
+            self._started = bool(output)
+        return output
+
+def _stream_writer() -> Callable[[Any], None]:
+    """Get the LangGraph custom stream writer, or a no-op outside of a streaming graph run."""
+    try:
+        from langgraph.config import get_stream_writer
+        return get_stream_writer()
+    except Exception:
+        return lambda chunk: None
+
+# Optional work (such as additional research queries) is skipped when less time than this remains
+OPTIONAL_STEP_MIN_SECONDS = float(os.getenv("OPTIONAL_STEP_MIN_SECONDS", "30"))
+
+# How the research digest is built: "extractive", "llm" (extractive digest condensed by one LLM call) or "off"
+DIGEST_MODE = os.getenv("DIGEST_MODE", "extractive").lower()
+# Model condensing the digest in "llm" mode (defaults to the agents' model); a small, cheap model is enough
+DIGEST_MODEL = os.getenv("DIGEST_MODEL") or None
+
+# Later consensus rounds only search for the gaps flagged by the previous consensus
+MAX_GAP_QUERIES = 3
+GAP_RESULTS_PER_QUERY = 5
+GAP_MARKERS = re.compile(
+    r"\b(further|additional|unclear|unknown|uncertain|insufficient|limited|pending|not (?:provided|available|specified|mentioned)|"
+    r"to (?:confirm|rule out|determine|clarify)|requires?|needs?)\b",
+    re.IGNORECASE
+)
+GAP_STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "are", "was", "were", "been", "being", "have", "has", "should",
+    "would", "could", "which", "from", "into", "such", "also", "more", "than", "their", "there", "these", "those",
+    "patient", "patients", "further", "additional", "unclear", "unknown", "uncertain", "insufficient", "limited",
+    "pending", "provided", "available", "specified", "mentioned", "confirm", "rule", "determine", "clarify",
+    "require", "requires", "need", "needs", "needed", "information", "recommended", "recommend"
+}
+
+class DeadlineExceeded(Exception):
+    """Raised when a diagnosis run has used up its time budget."""
+
+def time_remaining(state: Dict[str, Any]) -> Optional[float]:
+    """
+    Get the number of seconds left before the run deadline.
+    
+    Args:
+        state: The current state
+        
+    Returns:
+        Seconds remaining, or None if the run has no deadline
+    """
+    deadline = state.get("deadline")
+    if not deadline:
+        return None
+    return deadline - time.time()
+
+def check_deadline(state: Dict[str, Any], node: str) -> Optional[float]:
+    """
+    Abort the node if the run deadline has passed.
+    
+    Args:
+        state: The current state
+        node: Name of the node about to run
+        
+    Returns:
+        Seconds remaining, or None if the run has no deadline
+    """
+    remaining = time_remaining(state)
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before {node}")
+    return remaining
+
+async def await_before_deadline(state: Dict[str, Any], node: str, awaitable: Awaitable[Any]) -> Any:
+    """
+    Await a node's call, aborting it when the run deadline passes.
+    
+    Args:
+        state: The current state
+        node: Name of the node making the call
+        awaitable: The call
+        
+    Returns:
+        Result of the call
+    
+    Raises:
+        DeadlineExceeded: If the deadline passed before the call completed
+    """
+    try:
+        return await asyncio.wait_for(awaitable, timeout=time_remaining(state))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Deadline exceeded during {node}") from None
+
+def call_timeout(state: Dict[str, Any], default: float) -> float:
+    """Timeout for a single HTTP call, capped by the time left before the deadline."""
+    remaining = time_remaining(state)
+    if remaining is None:
+        return default
+    return max(0.1, min(default, remaining))
+
+def bind_timeout(llm: Any, timeout: Optional[float]) -> Any:
+    """Bind a request timeout to a LangChain chat model if a deadline applies."""
+    if timeout is None or not hasattr(llm, "bind"):
+        return llm
+    return llm.bind(timeout=max(0.1, timeout))
+
+def llm_model_name(llm: Any) -> str:
+    """Name of the model behind an LLM client."""
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+def llm_temperature(llm: Any) -> Optional[float]:
+    """Sampling temperature of an LLM client, or None if it does not expose one."""
+    return getattr(llm, "temperature", None)
+
+def served_model_name(llm: Any, result: Any = None) -> str:
+    """
+    Name of the model that actually produced a result.
+    
+    A routed LLM may fail over or hedge to another endpoint than the one llm_model_name
+    names; it records the serving model in the result's response metadata.
+    
+    Args:
+        llm: LLM client that was called
+        result: Message (or first stream chunk) returned by the call
+        
+    Returns:
+        Model name
+    """
+    routed_model = (getattr(result, "response_metadata", None) or {}).get("routed_model")
+    return routed_model or llm_model_name(llm)
+
+class NodeCacheKey(NamedTuple):
+    """Identity of a node call in the node caches."""
+    key: str
+    inputs: Dict[str, Any]
+    model: str
+    prompt_version: str
+    temperature: Optional[float] = None
+
+def cached_node_output(node: str, inputs: Dict[str, Any], llm: Any, prompt_version: str) -> Tuple[NodeCacheKey, Optional[str]]:
+    """
+    Look up the cached LLM output of a node for the given prompt inputs.
+    
+    The exact node cache is tried first, then the semantic cache for near-duplicate inputs.
+    
+    Args:
+        node: Name of the node
+        inputs: Prompt inputs of the node
+        llm: LLM client the node would call
+        prompt_version: Version of the node prompt
+        
+    Returns:
+        Tuple of (cache key, cached output). The output is None on a miss.
+    """
+    model = llm_model_name(llm)
+    temperature = llm_temperature(llm)
+    cache_key = NodeCacheKey(NodeCache.make_key(node, inputs, model, prompt_version, temperature),
+                             inputs, model, prompt_version, temperature)
+    cached = None
+    
+    cache = get_node_cache()
+    if cache is not None:
+        cached = cache.get(node, cache_key.key)
+    
+    if cached is None:
+        semantic_cache = get_semantic_cache()
+        if semantic_cache is not None:
+            cached = semantic_cache.lookup(node, inputs, model, prompt_version, temperature)
+            if cached is not None and cache is not None:
+                # Serve the same inputs again from the exact cache
+                cache.set(node, cache_key.key, cached)
+    
+    return cache_key, cached
+
+def store_node_output(node: str, cache_key: Optional[NodeCacheKey], content: str, model: Optional[str] = None) -> None:
+    """
+    Store the LLM output of a node under the key returned by cached_node_output.
+    
+    If another model than the one in the key served the call (after a failover or a hedge),
+    the output is stored under that model's key instead.
+    """
+    if cache_key is None or not content:
+        return
+    if model and model != cache_key.model:
+        cache_key = cache_key._replace(
+            key=NodeCache.make_key(node, cache_key.inputs, model, cache_key.prompt_version, cache_key.temperature),
+            model=model
+        )
+    
+    cache = get_node_cache()
+    if cache is not None:
+        cache.set(node, cache_key.key, content)
+    
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        semantic_cache.store(node, cache_key.inputs, cache_key.model, cache_key.prompt_version, content, cache_key.temperature)
+
+def _prompt_text(runnable: Any, inputs: Any) -> str:
+    """Text of the prompt a runnable sends for the given inputs, for token estimates."""
+    if isinstance(inputs, list):
+        return "\n".join(str(getattr(message, "content", message)) for message in inputs)
+    prompt = getattr(runnable, "first", None)
+    if isinstance(inputs, dict) and hasattr(prompt, "format"):
+        try:
+            return prompt.format(**inputs)
+        except Exception:
+            pass
+    return str(inputs)
+
+def record_llm_call(node: str, usage: Optional[TokenUsage], runnable: Any, inputs: Any, result: Any, latency: float) -> None:
+    """
+    Record the tokens and latency of an LLM call of a node.
+    
+    The provider's usage is used when reported, else both sides are estimated.
+    
+    Args:
+        node: Name of the node
+        usage: Token usage of the node run (None to record process-wide only)
+        runnable: Chain or LLM that was invoked
+        inputs: Inputs of the runnable
+        result: Message returned by the LLM
+        latency: Duration of the call in seconds
+    """
+    reported = usage_from_response(result)
+    if reported is not None:
+        prompt_tokens, completion_tokens = reported
+    else:
+        prompt_tokens = estimate_tokens(_prompt_text(runnable, inputs))
+        completion_tokens = estimate_tokens(getattr(result, "content", None) or "")
+    for target in (usage, get_token_usage(node)):
+        if target is not None:
+            target.record(prompt_tokens, completion_tokens, latency, estimated=reported is None)
+
+def invoke_coalesced(node: str, cache_key: NodeCacheKey, runnable: Any, inputs: Any, usage: Optional[TokenUsage] = None,
+                     timeout: Optional[float] = None) -> Any:
+    """
+    Invoke the LLM runnable of a node, sharing one in-flight call among concurrent identical node calls.
+    
+    Only the caller actually making the call records its tokens and latency.
+    
+    Args:
+        node: Name of the node
+        cache_key: Key returned by cached_node_output for the call
+        runnable: Chain or LLM to invoke
+        inputs: Inputs of the runnable
+        usage: Token usage of the node run
+        timeout: Time left before the caller's deadline, bounding the wait for an identical
+            call already in flight
+        
+    Returns:
+        Result of the runnable
+    
+    Raises:
+        DeadlineExceeded: If the identical call in flight did not complete before the deadline
+    """
+    def call():
+        start_time = time.monotonic()
+        result = runnable.invoke(inputs)
+        record_llm_call(node, usage, runnable, inputs, result, time.monotonic() - start_time)
+        return result
+    
+    try:
+        return get_single_flight("node_llm").do((node, cache_key.key), call, timeout=timeout)
+    except TimeoutError:
+        raise DeadlineExceeded(f"Deadline exceeded during {node}") from None
+
+async def ainvoke_coalesced(node: str, cache_key: NodeCacheKey, runnable: Any, inputs: Any, usage: Optional[TokenUsage] = None) -> Any:
+    """Async version of invoke_coalesced."""
+    async def call():
+        start_time = time.monotonic()
+        result = await runnable.ainvoke(inputs)
+        record_llm_call(node, usage, runnable, inputs, result, time.monotonic() - start_time)
+        return result
+    
+    return await get_single_flight("node_llm").ado((node, cache_key.key), call)
+
+def research_context(state: Dict[str, Any]) -> str:
+    """Research evidence given to the LLM agents: the digest if one was built, else the full findings."""
+    return state.get("research_digest") or state.get("research_findings") or ""
+
+def with_cache_status(state: Dict[str, Any], node: str, hit: bool, llm: Any = None,
+                      usage: Optional[TokenUsage] = None) -> Dict[str, Any]:
+    """
+    Record in the run metrics whether a node was served from the node cache.
+    
+    If the node called a routed LLM, its routing decision is recorded too, and the tokens
+    of the node's LLM calls are added to its earlier rounds.
+    """
+    updates = {"node_cache": {node: "hit" if hit else "miss"}}
+    route_snapshot = getattr(llm, "route_snapshot", None)
+    if route_snapshot is not None:
+        updates["llm_routing"] = {node: route_snapshot()}
+    updates.update(llm_usage_update(state, node, usage))
+    return {**state, "run_metrics": with_metrics(state, updates)}
+
+def llm_usage_update(state: Dict[str, Any], node: str, usage: Optional[TokenUsage]) -> Dict[str, Any]:
+    """
+    Run metrics update adding the token usage of a node run to the node's earlier rounds.
+    
+    Args:
+        state: The current state
+        node: Name of the node
+        usage: Token usage of the node run
+        
+    Returns:
+        Update for with_metrics (empty if nothing was spent or trimmed)
+    """
+    if usage is None or not (usage.calls or usage.trimmed_tokens):
+        return {}
+    previous = ((state.get("run_metrics") or {}).get("llm_usage") or {}).get(node)
+    return {"llm_usage": {node: usage.as_dict(previous)}}
+
 class BaseAgent:
     """Base agent class for all agents in the system."""
     
@@ -79,11 +486,11 @@ class BaseAgent:
             
             # Initialize the LLM with IO.net Intelligence
             print("BaseAgent: Using IO.net Intelligence API")
-            self.llm = ChatOpenAI(
+            self.llm = get_llm_manager().get_chat_model(
                 model=self.model,
-                openai_api_key=self.api_key,
-                openai_api_base=self.base_url,
-                temperature=temperature
+                temperature=temperature,
+                api_key=self.api_key,
+                base_url=self.base_url
             )
         # Priority 2: Fall back to OpenAI if IO.net Intelligence API is not available
         elif os.getenv("OPENAI_API_KEY"):
@@ -92,9 +499,10 @@ class BaseAgent:
             
             # Initialize the LLM with OpenAI
             print("BaseAgent: Using OpenAI API as fallback")
-            self.llm = ChatOpenAI(
+            self.llm = get_llm_manager().get_chat_model(
                 model=self.model,
-                temperature=temperature
+                temperature=temperature,
+                api_key=self.api_key
             )
         else:
             raise ValueError("No API key provided. Please set either IOINTELLIGENCE_API_KEY or OPENAI_API_KEY in your environment variables.")
@@ -137,6 +545,118 @@ class ResearcherAgent:
         Returns:
             Updated state with research findings
         """
+        check_deadline(state, "research")
+        if self._is_incremental(state):
+            return self._run_incremental(state)
+        
+        topic, symptoms, query, use_trusted_domains, min_sources = self._prepare_research(state)
+        
+        if not self.realtime:
+            # Simulate research results if not using realtime
+            print("Using simulated cancer research results")
+            findings = self._simulate_research(topic, symptoms, min_sources)
+            
+            return {**state, "research_findings": findings, "next": "verify_sources"}
+        
+        try:
+            # Calculate number of results to request based on min_sources
+            # Request more than needed to account for filtering and duplicates
+            base_results = max(min_sources, 12)
+            
+            # Perform actual web search
+            search_results = web_search(query, num_results=base_results, use_trusted_domains=use_trusted_domains,
+                                        timeout=call_timeout(state, 15))
+            
+            if not search_results:
+                print("No search results found. Using simulated cancer research.")
+                findings = self._simulate_research(topic, symptoms, min_sources)
+                return {**state, "research_findings": findings, "next": "verify_sources"}
+            
+            # If we don't have enough results yet, try additional queries
+            if len(search_results) < min_sources:
+                # Keep track of links we've already seen
+                seen_links = {result["link"] for result in search_results}
+                
+                # Try each additional query until we have enough results
+                for additional_query in self._additional_queries(topic):
+                    if len(search_results) >= min_sources or self._skip_optional_step(state):
+                        break
+                        
+                    print(f"Searching with additional query: {additional_query}")
+                    additional_results = web_search(additional_query, num_results=base_results, use_trusted_domains=use_trusted_domains,
+                                                    timeout=call_timeout(state, 15))
+                    self._merge_results(search_results, additional_results, seen_links, min_sources)
+            
+            return {**state, "research_findings": self._summarize_results(topic, search_results), "next": "verify_sources"}
+            
+        except Exception as e:
+            print(f"Error during cancer research: {str(e)}")
+            # Use simulated results in case of error
+            findings = self._simulate_research(topic, symptoms, min_sources)
+            return {**state, "research_findings": findings, "next": "verify_sources"}
+    
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async version of run that searches without blocking the event loop.
+        
+        Args:
+            state: Dictionary with current workflow state
+            
+        Returns:
+            Updated state with research findings
+        """
+        check_deadline(state, "research")
+        if self._is_incremental(state):
+            return await self._arun_incremental(state)
+        
+        topic, symptoms, query, use_trusted_domains, min_sources = self._prepare_research(state)
+        
+        if not self.realtime:
+            print("Using simulated cancer research results")
+            findings = self._simulate_research(topic, symptoms, min_sources)
+            
+            return {**state, "research_findings": findings, "next": "verify_sources"}
+        
+        try:
+            base_results = max(min_sources, 12)
+            
+            search_results = await async_web_search(query, num_results=base_results, use_trusted_domains=use_trusted_domains,
+                                                    timeout=call_timeout(state, 15))
+            
+            if not search_results:
+                print("No search results found. Using simulated cancer research.")
+                findings = self._simulate_research(topic, symptoms, min_sources)
+                return {**state, "research_findings": findings, "next": "verify_sources"}
+            
+            if len(search_results) < min_sources:
+                seen_links = {result["link"] for result in search_results}
+                
+                for additional_query in self._additional_queries(topic):
+                    if len(search_results) >= min_sources or self._skip_optional_step(state):
+                        break
+                        
+                    print(f"Searching with additional query: {additional_query}")
+                    additional_results = await async_web_search(additional_query, num_results=base_results, use_trusted_domains=use_trusted_domains,
+                                                                timeout=call_timeout(state, 15))
+                    self._merge_results(search_results, additional_results, seen_links, min_sources)
+            
+            return {**state, "research_findings": self._summarize_results(topic, search_results), "next": "verify_sources"}
+            
+        except Exception as e:
+            print(f"Error during cancer research: {str(e)}")
+            findings = self._simulate_research(topic, symptoms, min_sources)
+            return {**state, "research_findings": findings, "next": "verify_sources"}
+    
+    def _prepare_research(self, state: Dict[str, Any]) -> Tuple[str, str, str, bool, int]:
+        """
+        Build the search query for the current research attempt.
+        
+        Args:
+            state: Dictionary with current workflow state
+            
+        Returns:
+            Tuple of (topic, symptoms, query, use_trusted_domains, min_sources)
+        """
         topic = state["topic"]
         symptoms = state["symptoms"]
         medical_history = state.get("medical_history", "")
@@ -175,79 +695,178 @@ class ResearcherAgent:
         print(f"Use trusted domains: {use_trusted_domains}")
         print(f"Target minimum sources: {min_sources}")
         
-        if not self.realtime:
-            # Simulate research results if not using realtime
-            print("Using simulated cancer research results")
-            findings = self._simulate_research(topic, symptoms, min_sources)
+        return topic, symptoms, query, use_trusted_domains, min_sources
+    
+    def _is_incremental(self, state: Dict[str, Any]) -> bool:
+        """Whether this is a later consensus round that only needs to fill research gaps."""
+        return state.get("current_round", 1) > 1 and bool(state.get("research_findings"))
+    
+    def _run_incremental(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Research only the gaps flagged by the previous consensus, appending new findings.
+        
+        Args:
+            state: Dictionary with current workflow state
             
-            return {**state, "research_findings": findings, "next": "verify_sources"}
+        Returns:
+            Updated state with the new findings appended to the research findings
+        """
+        queries = self._gap_queries(state)
+        if not self.realtime or not queries:
+            print(f"No research gaps to fill in round {state.get('current_round')}. Reusing previous findings.")
+            return {**state, "next": "verify_sources"}
         
+        seen_links = self._known_links(state)
+        new_results = []
         try:
-            # Calculate number of results to request based on min_sources
-            # Request more than needed to account for filtering and duplicates
-            base_results = max(min_sources, 12)
-            
-            # Perform actual web search
-            search_results = web_search(query, num_results=base_results, use_trusted_domains=use_trusted_domains)
+            for gap_query in queries:
+                if self._skip_optional_step(state):
+                    break
+                print(f"Searching research gap: {gap_query}")
+                results = web_search(gap_query, num_results=GAP_RESULTS_PER_QUERY, use_trusted_domains=True,
+                                     timeout=call_timeout(state, 15))
+                self._merge_results(new_results, results, seen_links, GAP_RESULTS_PER_QUERY * len(queries))
+        except Exception as e:
+            print(f"Error during incremental cancer research: {str(e)}")
+        
+        return self._append_findings(state, queries, new_results)
+    
+    async def _arun_incremental(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async version of _run_incremental.
+        
+        Args:
+            state: Dictionary with current workflow state
             
-            if not search_results:
-                print("No search results found. Using simulated cancer research.")
-                findings = self._simulate_research(topic, symptoms, min_sources)
-                return {**state, "research_findings": findings, "next": "verify_sources"}
+        Returns:
+            Updated state with the new findings appended to the research findings
+        """
+        queries = self._gap_queries(state)
+        if not self.realtime or not queries:
+            print(f"No research gaps to fill in round {state.get('current_round')}. Reusing previous findings.")
+            return {**state, "next": "verify_sources"}
+        
+        seen_links = self._known_links(state)
+        new_results = []
+        try:
+            if not self._skip_optional_step(state):
+                print(f"Searching {len(queries)} research gaps: {queries}")
+                search_results = await asyncio.gather(*[
+                    async_web_search(gap_query, num_results=GAP_RESULTS_PER_QUERY, use_trusted_domains=True,
+                                     timeout=call_timeout(state, 15))
+                    for gap_query in queries
+                ])
+                for results in search_results:
+                    self._merge_results(new_results, results, seen_links, GAP_RESULTS_PER_QUERY * len(queries))
+        except Exception as e:
+            print(f"Error during incremental cancer research: {str(e)}")
+        
+        return self._append_findings(state, queries, new_results)
+    
+    def _gap_queries(self, state: Dict[str, Any]) -> List[str]:
+        """
+        Build search queries for the gaps flagged by the previous consensus.
+        
+        Sentences of the consensus that call for further tests or mention missing or unclear
+        information are turned into queries. Queries issued in earlier rounds are skipped.
+        
+        Args:
+            state: Dictionary with current workflow state
             
-            # If we don't have enough results yet, try additional queries
-            if len(search_results) < min_sources:
-                # Try different query formulations to get more diverse results
-                additional_queries = [
-                    f"{topic} cancer latest research treatment options clinical trials",
-                    f"{topic} cancer diagnosis guidelines oncology",
-                    f"{topic} cancer prognosis survival rates statistics",
-                    f"{topic} cancer genetic factors biomarkers",
-                    f"{topic} cancer supportive care management"
-                ]
-                
-                # Keep track of links we've already seen
-                seen_links = {result["link"] for result in search_results}
-                
-                # Try each additional query until we have enough results
-                for additional_query in additional_queries:
-                    if len(search_results) >= min_sources:
-                        break
-                        
-                    print(f"Searching with additional query: {additional_query}")
-                    additional_results = web_search(additional_query, num_results=base_results, use_trusted_domains=use_trusted_domains)
-                    
-                    # Add new results that we haven't seen before
-                    for result in additional_results:
-                        if result["link"] not in seen_links:
-                            search_results.append(result)
-                            seen_links.add(result["link"])
-                            
-                            if len(search_results) >= min_sources:
-                                break
-            
-            # Report how many sources we found
-            print(f"Found {len(search_results)} sources for cancer research")
-            
-            # Summarize results
-            summary = f"Cancer research findings for {topic}:\n\n"
-            
-            for i, result in enumerate(search_results):
-                title = result.get("title", "No title")
-                snippet = result.get("snippet", "No snippet")
-                link = result.get("link", "No link")
+        Returns:
+            Up to MAX_GAP_QUERIES new queries
+        """
+        topic = state["topic"]
+        issued = set(state.get("research_queries") or [])
+        queries = []
+        
+        for sentence in re.split(r"(?<=[.!?])\s+|\n+", state.get("consensus") or ""):
+            if not GAP_MARKERS.search(sentence):
+                continue
+            keywords = [
+                word for word in re.findall(r"[A-Za-z][A-Za-z0-9-]+", sentence)
+                if len(word) > 3 and word.lower() not in GAP_STOPWORDS and word.lower() not in topic.lower()
+            ]
+            if len(keywords) < 2:
+                continue
+            query = f"{topic} cancer {' '.join(keywords[:6])}"
+            if query not in issued and query not in queries:
+                queries.append(query)
+            if len(queries) >= MAX_GAP_QUERIES:
+                break
+        
+        return queries
+    
+    def _known_links(self, state: Dict[str, Any]) -> set:
+        """Links already present in the research findings or the verified sources."""
+        text = (state.get("research_findings") or "") + "\n" + "\n".join(state.get("verified_sources") or [])
+        return {link.strip(".,()[]{}") for link in re.findall(r"https?://\S+", text)}
+    
+    def _append_findings(self, state: Dict[str, Any], queries: List[str], new_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Append new search results to the research findings of the previous rounds."""
+        findings = state.get("research_findings") or ""
+        research_queries = list(state.get("research_queries") or []) + queries
+        
+        if not new_results:
+            print("Incremental research found no new sources.")
+            return {**state, "research_queries": research_queries, "next": "verify_sources"}
+        
+        print(f"Incremental research found {len(new_results)} new sources")
+        start = findings.count("Source:") + 1
+        addition = f"\n\nAdditional findings for round {state.get('current_round')}:\n\n"
+        for i, result in enumerate(new_results, start):
+            addition += f"{i}. {result.get('title', 'No title')}\n"
+            addition += f"   Summary: {result.get('snippet', 'No snippet')}\n"
+            addition += f"   Source: {result.get('link', 'No link')}\n\n"
+        
+        return {**state, "research_findings": findings + addition, "research_queries": research_queries, "next": "verify_sources"}
+    
+    def _skip_optional_step(self, state: Dict[str, Any]) -> bool:
+        """Whether the deadline is too close for additional research queries."""
+        remaining = time_remaining(state)
+        if remaining is not None and remaining < OPTIONAL_STEP_MIN_SECONDS:
+            print(f"Only {remaining:.0f}s left before the deadline. Skipping additional research queries.")
+            return True
+        return False
+    
+    def _additional_queries(self, topic: str) -> List[str]:
+        """Different query formulations used to get more diverse results."""
+        return [
+            f"{topic} cancer latest research treatment options clinical trials",
+            f"{topic} cancer diagnosis guidelines oncology",
+            f"{topic} cancer prognosis survival rates statistics",
+            f"{topic} cancer genetic factors biomarkers",
+            f"{topic} cancer supportive care management"
+        ]
+    
+    def _merge_results(self, search_results: List[Dict[str, Any]], additional_results: List[Dict[str, Any]],
+                       seen_links: set, min_sources: int) -> None:
+        """Add new results that we haven't seen before, stopping at min_sources."""
+        for result in additional_results:
+            if result["link"] not in seen_links:
+                search_results.append(result)
+                seen_links.add(result["link"])
                 
-                summary += f"{i+1}. {title}\n"
-                summary += f"   Summary: {snippet}\n"
-                summary += f"   Source: {link}\n\n"
-            
-            return {**state, "research_findings": summary, "next": "verify_sources"}
+                if len(search_results) >= min_sources:
+                    break
+    
+    def _summarize_results(self, topic: str, search_results: List[Dict[str, Any]]) -> str:
+        """Format search results as research findings text."""
+        # Report how many sources we found
+        print(f"Found {len(search_results)} sources for cancer research")
+        
+        summary = f"Cancer research findings for {topic}:\n\n"
+        
+        for i, result in enumerate(search_results):
+            title = result.get("title", "No title")
+            snippet = result.get("snippet", "No snippet")
+            link = result.get("link", "No link")
             
-        except Exception as e:
-            print(f"Error during cancer research: {str(e)}")
-            # Use simulated results in case of error
-            findings = self._simulate_research(topic, symptoms, min_sources)
-            return {**state, "research_findings": findings, "next": "verify_sources"}
+            summary += f"{i+1}. {title}\n"
+            summary += f"   Summary: {snippet}\n"
+            summary += f"   Source: {link}\n\n"
+        
+        return summary
     
     def _simulate_research(self, topic: str, symptoms: str, min_sources: int = 10) -> str:
         """
@@ -351,26 +970,22 @@ class ResearcherAgent:
 class Diagnostician:
     """Agent for diagnosing cancer conditions."""
     
-    def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    # Bump when the prompt changes to invalidate cached diagnoses
+    PROMPT_VERSION = "1"
+    # Inputs cut to fit the input budget, lowest priority first
+    TRIM_ORDER = ["findings", "test_results", "medical_history"]
+    
+    def __init__(self, model: Optional[str] = None):
         """
-        Generate potential cancer diagnoses based on research and symptoms.
+        Initialize the diagnostician agent.
         
         Args:
-            state: The current state
-            
-        Returns:
-            Updated state with diagnoses
+            model: LLM model to use (defaults to the provider model)
         """
-        topic = state["topic"]
-        symptoms = state["symptoms"]
-        medical_history = state.get("medical_history", "")
-        test_results = state.get("test_results", "")
-        findings = state.get("research_findings", "")
-        
-        llm = get_llm()
+        self.model = model
         
         # Prepare the diagnostic prompt
-        prompt = ChatPromptTemplate.from_messages([
+        self.prompt = ChatPromptTemplate.from_messages([
             ("system", """You are a highly skilled oncologist specializing in cancer diagnosis. Based on the patient information and research findings provided, 
              suggest the most likely cancer diagnoses. Focus on evidence-based oncology.
              
@@ -404,58 +1019,113 @@ class Diagnostician:
             
             Based on the above information, what are the most likely cancer diagnoses? Format as instructed.""")
         ])
+    
+    def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Generate potential cancer diagnoses based on research and symptoms.
+        
+        Args:
+            state: The current state
             
+        Returns:
+            Updated state with diagnoses
+        """
+        check_deadline(state, "diagnose")
+        llm = get_llm(self.model)
+        usage = TokenUsage()
+        inputs = fit_to_budget("diagnose", self._prepare_inputs(state), self.TRIM_ORDER, usage)
+        
+        cache_key, cached = cached_node_output("diagnose", inputs, llm, self.PROMPT_VERSION)
+        if cached is not None:
+            return with_cache_status(self._handle_result(state, AIMessage(content=cached)), "diagnose", True, usage=usage)
+        
         try:
-            chain = prompt | llm
-            result = chain.invoke({
-                "topic": topic,
-                "symptoms": symptoms,
-                "medical_history": medical_history,
-                "test_results": test_results,
-                "findings": findings
-            })
-            
-            diagnoses = filter_thinking_tags(result.content)
-            # Keep as string to preserve formatting
-            
-            return {**state, "diagnoses": diagnoses, "next": "recommend_treatment"}
+            chain = self.prompt | bind_timeout(llm, time_remaining(state))
+            result = invoke_coalesced("diagnose", cache_key, chain, inputs, usage, timeout=time_remaining(state))
+            store_node_output("diagnose", cache_key, result.content, served_model_name(llm, result))
+            return with_cache_status(self._handle_result(state, result), "diagnose", False, llm, usage)
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"Error during cancer diagnosis: {str(e)}")
-            return {**state, "diagnoses": f"Unable to generate cancer diagnosis: {str(e)}", "next": "recommend_treatment"}
-
-
-class TreatmentAdvisor:
-    """Agent for recommending cancer treatments."""
+            # A request cut short by the deadline ends the run instead of producing an error text
+            check_deadline(state, "diagnose")
+            return self._handle_error(state, e)
     
-    def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Recommend cancer treatments based on diagnoses.
+        Async version of run using a non-blocking LLM call.
         
         Args:
             state: The current state
             
         Returns:
-            Updated state with treatment recommendations
+            Updated state with diagnoses
         """
-        diagnoses = state.get("diagnoses", [])
-        if not diagnoses:
-            return {**state, "treatments": ["No cancer diagnoses provided to base treatments on"], "next": "build_consensus"}
+        check_deadline(state, "diagnose")
+        llm = get_llm(self.model)
+        usage = TokenUsage()
+        inputs = fit_to_budget("diagnose", self._prepare_inputs(state), self.TRIM_ORDER, usage)
         
-        # Keep as string if it's already a string
-        if isinstance(diagnoses, list):
-            diagnoses_str = "\n".join(diagnoses)
-        else:
-            diagnoses_str = str(diagnoses)
+        cache_key, cached = cached_node_output("diagnose", inputs, llm, self.PROMPT_VERSION)
+        if cached is not None:
+            return with_cache_status(self._handle_result(state, AIMessage(content=cached)), "diagnose", True, usage=usage)
+        
+        try:
+            chain = self.prompt | llm
+            result = await await_before_deadline(state, "diagnose", ainvoke_coalesced("diagnose", cache_key, chain, inputs, usage))
+            store_node_output("diagnose", cache_key, result.content, served_model_name(llm, result))
+            return with_cache_status(self._handle_result(state, result), "diagnose", False, llm, usage)
             
-        symptoms = state.get("symptoms", "")
-        medical_history = state.get("medical_history", "")
-        findings = state.get("research_findings", "")
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            # A request cut short by the deadline ends the run instead of producing an error text
+            check_deadline(state, "diagnose")
+            return self._handle_error(state, e)
+    
+    def _prepare_inputs(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Collect the prompt inputs from the state."""
+        return {
+            "topic": state["topic"],
+            "symptoms": state["symptoms"],
+            "medical_history": state.get("medical_history", ""),
+            "test_results": state.get("test_results", ""),
+            "findings": research_context(state)
+        }
+    
+    def _handle_result(self, state: Dict[str, Any], result: Any) -> Dict[str, Any]:
+        """Update the state with the LLM response."""
+        diagnoses = filter_thinking_tags(result.content)
+        # Keep as string to preserve formatting
         
-        llm = get_llm()
+        return {**state, "diagnoses": diagnoses, "next": "recommend_treatment"}
+    
+    def _handle_error(self, state: Dict[str, Any], e: Exception) -> Dict[str, Any]:
+        """Update the state after a failed LLM call."""
+        print(f"Error during cancer diagnosis: {str(e)}")
+        return {**state, "diagnoses": f"Unable to generate cancer diagnosis: {str(e)}", "next": "recommend_treatment"}
+
+
+class TreatmentAdvisor:
+    """Agent for recommending cancer treatments."""
+    
+    # Bump when the prompt changes to invalidate cached treatment plans
+    PROMPT_VERSION = "1"
+    # Inputs cut to fit the input budget, lowest priority first
+    TRIM_ORDER = ["findings", "medical_history", "symptoms"]
+    
+    def __init__(self, model: Optional[str] = None):
+        """
+        Initialize the treatment advisor agent.
+        
+        Args:
+            model: LLM model to use (defaults to the provider model)
+        """
+        self.model = model
         
         # Prepare the treatment prompt
-        prompt = ChatPromptTemplate.from_messages([
+        self.prompt = ChatPromptTemplate.from_messages([
             ("system", """You are a medical oncologist specializing in cancer treatment. Based on the diagnoses and patient information, 
              recommend appropriate evidence-based cancer treatments.
              
@@ -507,68 +1177,128 @@ class TreatmentAdvisor:
             Research Findings:
             {findings}
             
-            Based on these cancer diagnoses and patient information, what treatments would you recommend? Format as instructed.""")
-        ])
+            Based on these cancer diagnoses and patient information, what treatments would you recommend? Format as instructed.""")
+        ])
+    
+    def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Recommend cancer treatments based on diagnoses.
+        
+        Args:
+            state: The current state
+            
+        Returns:
+            Updated state with treatment recommendations
+        """
+        check_deadline(state, "recommend_treatment")
+        if not state.get("diagnoses", []):
+            return {**state, "treatments": ["No cancer diagnoses provided to base treatments on"], "next": "build_consensus"}
+        
+        llm = get_llm(self.model)
+        usage = TokenUsage()
+        inputs = fit_to_budget("recommend_treatment", self._prepare_inputs(state), self.TRIM_ORDER, usage)
+        
+        cache_key, cached = cached_node_output("recommend_treatment", inputs, llm, self.PROMPT_VERSION)
+        if cached is not None:
+            return with_cache_status(self._handle_result(state, AIMessage(content=cached)), "recommend_treatment", True, usage=usage)
         
         try:
-            chain = prompt | llm
-            result = chain.invoke({
-                "diagnoses": diagnoses_str,
-            "symptoms": symptoms,
-                "medical_history": medical_history,
-                "findings": findings
-            })
-            
-            treatments = filter_thinking_tags(result.content)
-            # Keep as string to preserve formatting
-            
-            return {**state, "treatments": treatments, "next": "build_consensus"}
+            chain = self.prompt | bind_timeout(llm, time_remaining(state))
+            result = invoke_coalesced("recommend_treatment", cache_key, chain, inputs, usage, timeout=time_remaining(state))
+            store_node_output("recommend_treatment", cache_key, result.content, served_model_name(llm, result))
+            return with_cache_status(self._handle_result(state, result), "recommend_treatment", False, llm, usage)
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"Error generating cancer treatment recommendations: {str(e)}")
-            return {**state, "treatments": f"Unable to generate cancer treatment recommendations: {str(e)}", "next": "build_consensus"}
-
-
-class ConsensusBuilder:
-    """Agent for building consensus among multiple cancer diagnoses and treatments."""
+            # A request cut short by the deadline ends the run instead of producing an error text
+            check_deadline(state, "recommend_treatment")
+            return self._handle_error(state, e)
     
-    def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Build consensus from the various cancer diagnoses and treatments.
+        Async version of run using a non-blocking LLM call.
         
         Args:
             state: The current state
             
         Returns:
-            Updated state with consensus
+            Updated state with treatment recommendations
         """
-        topic = state.get("topic", "")
+        check_deadline(state, "recommend_treatment")
+        if not state.get("diagnoses", []):
+            return {**state, "treatments": ["No cancer diagnoses provided to base treatments on"], "next": "build_consensus"}
+        
+        llm = get_llm(self.model)
+        usage = TokenUsage()
+        inputs = fit_to_budget("recommend_treatment", self._prepare_inputs(state), self.TRIM_ORDER, usage)
+        
+        cache_key, cached = cached_node_output("recommend_treatment", inputs, llm, self.PROMPT_VERSION)
+        if cached is not None:
+            return with_cache_status(self._handle_result(state, AIMessage(content=cached)), "recommend_treatment", True, usage=usage)
+        
+        try:
+            chain = self.prompt | llm
+            result = await await_before_deadline(state, "recommend_treatment", ainvoke_coalesced("recommend_treatment", cache_key, chain, inputs, usage))
+            store_node_output("recommend_treatment", cache_key, result.content, served_model_name(llm, result))
+            return with_cache_status(self._handle_result(state, result), "recommend_treatment", False, llm, usage)
+            
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            # A request cut short by the deadline ends the run instead of producing an error text
+            check_deadline(state, "recommend_treatment")
+            return self._handle_error(state, e)
+    
+    def _prepare_inputs(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Collect the prompt inputs from the state."""
         diagnoses = state.get("diagnoses", [])
-        treatments = state.get("treatments", [])
-        findings = state.get("research_findings", "")
-        sources = state.get("verified_sources", [])
-        credibility = state.get("source_credibility", 0.0)
         
-        # Handle different data types
+        # Keep as string if it's already a string
         if isinstance(diagnoses, list):
             diagnoses_str = "\n".join(diagnoses)
         else:
             diagnoses_str = str(diagnoses)
-            
-        if isinstance(treatments, list):
-            treatments_str = "\n".join(treatments)
-        else:
-            treatments_str = str(treatments)
-            
-        if isinstance(sources, list):
-            sources_str = "\n".join(sources)
-        else:
-            sources_str = str(sources)
         
-        llm = get_llm()
+        return {
+            "diagnoses": diagnoses_str,
+            "symptoms": state.get("symptoms", ""),
+            "medical_history": state.get("medical_history", ""),
+            "findings": research_context(state)
+        }
+    
+    def _handle_result(self, state: Dict[str, Any], result: Any) -> Dict[str, Any]:
+        """Update the state with the LLM response."""
+        treatments = filter_thinking_tags(result.content)
+        # Keep as string to preserve formatting
+        
+        return {**state, "treatments": treatments, "next": "build_consensus"}
+    
+    def _handle_error(self, state: Dict[str, Any], e: Exception) -> Dict[str, Any]:
+        """Update the state after a failed LLM call."""
+        print(f"Error generating cancer treatment recommendations: {str(e)}")
+        return {**state, "treatments": f"Unable to generate cancer treatment recommendations: {str(e)}", "next": "build_consensus"}
+
+
+class ConsensusBuilder:
+    """Agent for building consensus among multiple cancer diagnoses and treatments."""
+    
+    # Bump when the prompt changes to invalidate cached consensus reports
+    PROMPT_VERSION = "1"
+    # Inputs cut to fit the input budget, lowest priority first
+    TRIM_ORDER = ["sources", "findings", "treatments", "diagnoses"]
+    
+    def __init__(self, model: Optional[str] = None):
+        """
+        Initialize the consensus builder agent.
+        
+        Args:
+            model: LLM model to use (defaults to the provider model)
+        """
+        self.model = model
         
         # Prepare the consensus prompt
-        prompt = ChatPromptTemplate.from_messages([
+        self.prompt = ChatPromptTemplate.from_messages([
             ("system", """You are a tumor board chairperson responsible for synthesizing multiple expert opinions on cancer cases. 
              Your task is to analyze the cancer diagnoses and treatments provided, and create a unified assessment that represents 
              the most likely scenario based on available evidence.
@@ -618,42 +1348,529 @@ class ConsensusBuilder:
             
             Based on all this information, provide your oncological reasoning, consensus cancer diagnosis, comprehensive cancer care plan, and patient guidance.""")
         ])
+    
+    def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build consensus from the various cancer diagnoses and treatments.
+        
+        Args:
+            state: The current state
+            
+        Returns:
+            Updated state with consensus
+        """
+        check_deadline(state, "build_consensus")
+        llm = get_llm(self.model)
+        usage = TokenUsage()
+        inputs = fit_to_budget("build_consensus", self._prepare_inputs(state), self.TRIM_ORDER, usage)
+        
+        cache_key, cached = cached_node_output("build_consensus", inputs, llm, self.PROMPT_VERSION)
+        if cached is not None:
+            return self._handle_cached(state, cached, usage)
         
         try:
-            chain = prompt | llm
-            result = chain.invoke({
-                "topic": topic,
-                "diagnoses": diagnoses_str,
-                "treatments": treatments_str,
-                "findings": findings,
-                "sources": sources_str,
-                "credibility": f"{credibility:.1f}"
-            })
+            chain = self.prompt | bind_timeout(llm, time_remaining(state))
+            if state.get("stream_consensus"):
+                return with_cache_status(self._stream(state, chain, inputs, cache_key, usage), "build_consensus", False, llm, usage)
+            result = invoke_coalesced("build_consensus", cache_key, chain, inputs, usage, timeout=time_remaining(state))
+            store_node_output("build_consensus", cache_key, result.content, served_model_name(llm, result))
+            return with_cache_status(self._handle_result(state, result), "build_consensus", False, llm, usage)
+            
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            # A request cut short by the deadline ends the run instead of producing an error text
+            check_deadline(state, "build_consensus")
+            return self._handle_error(state, e)
+    
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async version of run using a non-blocking LLM call.
+        
+        Args:
+            state: The current state
+            
+        Returns:
+            Updated state with consensus
+        """
+        check_deadline(state, "build_consensus")
+        llm = get_llm(self.model)
+        usage = TokenUsage()
+        inputs = fit_to_budget("build_consensus", self._prepare_inputs(state), self.TRIM_ORDER, usage)
+        
+        cache_key, cached = cached_node_output("build_consensus", inputs, llm, self.PROMPT_VERSION)
+        if cached is not None:
+            return self._handle_cached(state, cached, usage)
+        
+        try:
+            chain = self.prompt | llm
+            if state.get("stream_consensus"):
+                streamed = await await_before_deadline(state, "build_consensus", self._astream(state, chain, inputs, cache_key, usage))
+                return with_cache_status(streamed, "build_consensus", False, llm, usage)
+            result = await await_before_deadline(state, "build_consensus", ainvoke_coalesced("build_consensus", cache_key, chain, inputs, usage))
+            store_node_output("build_consensus", cache_key, result.content, served_model_name(llm, result))
+            return with_cache_status(self._handle_result(state, result), "build_consensus", False, llm, usage)
+            
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            # A request cut short by the deadline ends the run instead of producing an error text
+            check_deadline(state, "build_consensus")
+            return self._handle_error(state, e)
+    
+    def _stream(self, state: Dict[str, Any], chain: Any, inputs: Dict[str, Any], cache_key: Optional[NodeCacheKey],
+                usage: Optional[TokenUsage] = None) -> Dict[str, Any]:
+        """
+        Generate the consensus token by token, emitting filtered text to the graph stream.
+        
+        Args:
+            state: The current state
+            chain: Prompt and LLM chain
+            inputs: Prompt inputs
+            cache_key: Node cache key under which to store the consensus
+            usage: Token usage of the node run
+            
+        Returns:
+            Updated state with consensus and time-to-first-token metric
+        """
+        writer = _stream_writer()
+        thinking_filter = ThinkingTagFilter()
+        start_time = time.time()
+        first_token_ms = None
+        content = ""
+        usage_chunk = None
+        served_model = None
+        
+        for chunk in chain.stream(inputs):
+            if usage_from_response(chunk) is not None:
+                usage_chunk = chunk
+            served_model = served_model or (getattr(chunk, "response_metadata", None) or {}).get("routed_model")
+            text = chunk.content if hasattr(chunk, "content") else str(chunk)
+            if not text:
+                continue
+            if first_token_ms is None:
+                first_token_ms = round((time.time() - start_time) * 1000, 1)
+            content += text
+            delta = thinking_filter.feed(text)
+            if delta:
+                writer({"consensus_delta": delta})
+        
+        delta = thinking_filter.flush()
+        if delta:
+            writer({"consensus_delta": delta})
+        
+        record_llm_call("build_consensus", usage, chain, inputs, usage_chunk or AIMessage(content=content), time.time() - start_time)
+        return self._handle_streamed(state, content, first_token_ms, start_time, cache_key, served_model)
+    
+    async def _astream(self, state: Dict[str, Any], chain: Any, inputs: Dict[str, Any], cache_key: Optional[NodeCacheKey],
+                       usage: Optional[TokenUsage] = None) -> Dict[str, Any]:
+        """
+        Async version of _stream.
+        
+        Args:
+            state: The current state
+            chain: Prompt and LLM chain
+            inputs: Prompt inputs
+            cache_key: Node cache key under which to store the consensus
+            usage: Token usage of the node run
             
-            consensus = filter_thinking_tags(result.content)
+        Returns:
+            Updated state with consensus and time-to-first-token metric
+        """
+        writer = _stream_writer()
+        thinking_filter = ThinkingTagFilter()
+        start_time = time.time()
+        first_token_ms = None
+        content = ""
+        usage_chunk = None
+        served_model = None
+        
+        async for chunk in chain.astream(inputs):
+            if usage_from_response(chunk) is not None:
+                usage_chunk = chunk
+            served_model = served_model or (getattr(chunk, "response_metadata", None) or {}).get("routed_model")
+            text = chunk.content if hasattr(chunk, "content") else str(chunk)
+            if not text:
+                continue
+            if first_token_ms is None:
+                first_token_ms = round((time.time() - start_time) * 1000, 1)
+            content += text
+            delta = thinking_filter.feed(text)
+            if delta:
+                writer({"consensus_delta": delta})
+        
+        delta = thinking_filter.flush()
+        if delta:
+            writer({"consensus_delta": delta})
+        
+        record_llm_call("build_consensus", usage, chain, inputs, usage_chunk or AIMessage(content=content), time.time() - start_time)
+        return self._handle_streamed(state, content, first_token_ms, start_time, cache_key, served_model)
+    
+    def _handle_streamed(self, state: Dict[str, Any], content: str, first_token_ms: Optional[float],
+                         start_time: float, cache_key: Optional[NodeCacheKey], served_model: Optional[str] = None) -> Dict[str, Any]:
+        """Update the state with a streamed consensus and its timing."""
+        total_ms = round((time.time() - start_time) * 1000, 1)
+        print(f"Consensus streamed in {total_ms / 1000:.2f}s (time to first token: {first_token_ms} ms)")
+        store_node_output("build_consensus", cache_key, content, served_model)
+        
+        new_state = self._handle_result(state, AIMessage(content=content))
+        new_state["run_metrics"] = with_metrics(new_state, {
+            "consensus_ttft_ms": first_token_ms,
+            "consensus_generation_ms": total_ms,
+            "node_cache": {"build_consensus": "miss"}
+        })
+        return new_state
+    
+    def _handle_cached(self, state: Dict[str, Any], content: str, usage: Optional[TokenUsage] = None) -> Dict[str, Any]:
+        """Update the state with a consensus served from the node cache."""
+        if state.get("stream_consensus"):
+            # Emit the whole report at once so streaming consumers still receive it
+            thinking_filter = ThinkingTagFilter()
+            delta = thinking_filter.feed(content) + thinking_filter.flush()
+            if delta:
+                _stream_writer()({"consensus_delta": delta})
+        
+        return with_cache_status(self._handle_result(state, AIMessage(content=content)), "build_consensus", True, usage=usage)
+    
+    def _prepare_inputs(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Collect the prompt inputs from the state."""
+        diagnoses = state.get("diagnoses", [])
+        treatments = state.get("treatments", [])
+        sources = state.get("verified_sources", [])
+        credibility = state.get("source_credibility", 0.0)
+        
+        # Handle different data types
+        if isinstance(diagnoses, list):
+            diagnoses_str = "\n".join(diagnoses)
+        else:
+            diagnoses_str = str(diagnoses)
             
-            # Handle rounds if needed
-            current_round = state.get("current_round", 1)
-            max_rounds = state.get("max_rounds", 1)
+        if isinstance(treatments, list):
+            treatments_str = "\n".join(treatments)
+        else:
+            treatments_str = str(treatments)
             
+        if isinstance(sources, list):
+            sources_str = "\n".join(sources)
+        else:
+            sources_str = str(sources)
+        
+        # Add the expert panel consensus when the panel ran alongside the LLM path
+        panel_consensus = state.get("panel_consensus")
+        if panel_consensus:
+            diagnoses_str += f"\n\nMultidisciplinary Expert Panel Consensus:\n{panel_consensus}"
+        
+        # Add the lung cancer specialist perspective when it ran alongside the LLM path
+        specialist_diagnoses = state.get("specialist_diagnoses")
+        if specialist_diagnoses:
+            if isinstance(specialist_diagnoses, list):
+                specialist_diagnoses = "\n".join(specialist_diagnoses)
+            diagnoses_str += f"\n\nLung Cancer Specialist Assessment:\n{specialist_diagnoses}"
+        
+        specialist_treatments = state.get("specialist_treatments")
+        if specialist_treatments:
+            if isinstance(specialist_treatments, list):
+                specialist_treatments = "\n".join(specialist_treatments)
+            treatments_str += f"\n\nLung Cancer Specialist Recommendations:\n{specialist_treatments}"
+        
+        return {
+            "topic": state.get("topic", ""),
+            "diagnoses": diagnoses_str,
+            "treatments": treatments_str,
+            "findings": research_context(state),
+            "sources": sources_str,
+            "credibility": f"{credibility:.1f}"
+        }
+    
+    def _handle_result(self, state: Dict[str, Any], result: Any) -> Dict[str, Any]:
+        """
+        Update the state with the LLM response and decide whether to run another round.
+        
+        Another round is skipped once the consensus and the diagnoses of successive rounds
+        are at least CONVERGENCE_THRESHOLD similar.
+        """
+        consensus = filter_thinking_tags(result.content)
+        
+        # Handle rounds if needed
+        current_round = state.get("current_round", 1)
+        max_rounds = state.get("max_rounds", 1)
+        convergence = {"rounds_completed": current_round}
+        converged = False
+        
+        previous_round = state.get("previous_round")
+        if previous_round:
+            consensus_score = consensus_similarity(previous_round.get("consensus", ""), consensus)
+            diagnoses_score = diagnoses_similarity(previous_round.get("diagnoses"), state.get("diagnoses"))
+            converged = consensus_score >= CONVERGENCE_THRESHOLD and diagnoses_score >= CONVERGENCE_THRESHOLD
+            convergence["consensus_similarity"] = round(consensus_score, 3)
+            convergence["diagnoses_similarity"] = round(diagnoses_score, 3)
+            print(f"Round {current_round} similarity to previous round: consensus {consensus_score:.2f}, diagnoses {diagnoses_score:.2f}")
+        
+        if current_round < max_rounds and not converged:
+            # Continue with another round
+            next_step = "research"  # Start another cycle
+            current_round += 1
+        else:
+            # End the process
+            next_step = None
             if current_round < max_rounds:
-                # Continue with another round
-                next_step = "research"  # Start another cycle
-                current_round += 1
-            else:
-                # End the process
-                next_step = None
+                convergence["rounds_saved"] = max_rounds - current_round
+                print(f"Consensus converged after round {current_round}. Skipping {max_rounds - current_round} remaining round(s).")
+        
+        return {
+            **state, 
+            "consensus": consensus, 
+            "current_round": current_round,
+            "next": next_step,
+            "previous_round": {"consensus": consensus, "diagnoses": state.get("diagnoses")},
+            "run_metrics": with_metrics(state, {"convergence": convergence})
+        }
+    
+    def _handle_error(self, state: Dict[str, Any], e: Exception) -> Dict[str, Any]:
+        """Update the state after a failed LLM call."""
+        print(f"Error building cancer consensus: {str(e)}")
+        return {**state, "consensus": f"Unable to build cancer consensus: {str(e)}", "next": None}
+
+
+# Number of PERSONAS consulted by the expert panel and the process-wide limit on concurrent persona calls
+EXPERT_PANEL_SIZE = int(os.getenv("EXPERT_PANEL_SIZE", str(len(PERSONAS))))
+EXPERT_PANEL_MAX_CONCURRENCY = int(os.getenv("EXPERT_PANEL_MAX_CONCURRENCY", "4"))
+
+# Shared by all panels in the process, so concurrent runs respect the same limit
+_panel_executor = ThreadPoolExecutor(max_workers=EXPERT_PANEL_MAX_CONCURRENCY, thread_name_prefix="expert-panel")
+_panel_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+def _panel_semaphore() -> asyncio.Semaphore:
+    """Get the expert panel concurrency limit of the running event loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _panel_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(EXPERT_PANEL_MAX_CONCURRENCY)
+        _panel_semaphores[loop] = semaphore
+    return semaphore
+
+def persona_title(persona: str) -> str:
+    """Short title of a persona, e.g. "thoracic oncologist"."""
+    match = re.match(r"You are an? (.+?)(?: with | who |,|\.)", persona)
+    return match.group(1) if match else persona[:40]
+
+
+class ExpertPanel:
+    """Agent convening a multidisciplinary panel of specialist PERSONAS concurrently."""
+    
+    # Bump when the prompts change to invalidate cached panel opinions
+    PROMPT_VERSION = "1"
+    # Inputs of the persona prompts cut to fit the input budget, lowest priority first
+    TRIM_ORDER = ["context"]
+    
+    def __init__(self, model: Optional[str] = None, personas: Optional[List[str]] = None):
+        """
+        Initialize the expert panel.
+        
+        Args:
+            model: LLM model to use (defaults to the provider model)
+            personas: Specialist personas to consult (defaults to the first EXPERT_PANEL_SIZE PERSONAS)
+        """
+        self.model = model
+        self.personas = personas or PERSONAS[:EXPERT_PANEL_SIZE]
+    
+    def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Collect the opinion of every persona concurrently and synthesize a panel consensus.
+        
+        Opinions are emitted to the graph stream as they complete.
+        
+        Args:
+            state: The current state
+            
+        Returns:
+            Updated state with expert opinions and the panel consensus
+        """
+        check_deadline(state, "expert_panel")
+        llm = get_llm(self.model)
+        usage = TokenUsage()
+        query, context_str = self._prepare_inputs(state, usage)
+        writer = _stream_writer()
+        start_time = time.time()
+        
+        futures = {
+            _panel_executor.submit(self._analyze, llm, state, persona, query, context_str, usage): persona
+            for persona in self.personas
+        }
+        opinions = []
+        for future in as_completed(futures):
+            opinion = self._collect(futures[future], future)
+            if opinion:
+                opinions.append(opinion)
+                writer({"expert_opinion": opinion})
+        
+        synthesis = self._synthesize(llm, state, query, opinions, usage)
+        return self._handle_result(state, opinions, synthesis, start_time, usage)
+    
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async version of run using non-blocking LLM calls.
+        
+        Args:
+            state: The current state
             
-            return {
-                **state, 
-                "consensus": consensus, 
-                "current_round": current_round,
-                "next": next_step
-            }
+        Returns:
+            Updated state with expert opinions and the panel consensus
+        """
+        check_deadline(state, "expert_panel")
+        llm = get_llm(self.model)
+        usage = TokenUsage()
+        query, context_str = self._prepare_inputs(state, usage)
+        writer = _stream_writer()
+        start_time = time.time()
+        
+        async def consult(persona: str) -> Tuple[str, Any]:
+            async with _panel_semaphore():
+                try:
+                    return persona, await self._aanalyze(llm, state, persona, query, context_str, usage)
+                except Exception as e:
+                    return persona, e
+        
+        opinions = []
+        for task in asyncio.as_completed([consult(persona) for persona in self.personas]):
+            persona, analysis = await task
+            opinion = self._collect(persona, analysis)
+            if opinion:
+                opinions.append(opinion)
+                writer({"expert_opinion": opinion})
+        
+        synthesis = await self._asynthesize(llm, state, query, opinions, usage)
+        return self._handle_result(state, opinions, synthesis, start_time, usage)
+    
+    def _prepare_inputs(self, state: Dict[str, Any], usage: Optional[TokenUsage] = None) -> Tuple[str, str]:
+        """Build the panel query and context from the state, fitted to the input budget."""
+        query = (
+            f"{state.get('topic', '')}\n"
+            f"Patient Symptoms: {state.get('symptoms', '')}\n"
+            f"Medical History: {state.get('medical_history', '')}\n"
+            f"Test Results: {state.get('test_results', '')}"
+        )
+        context_str = research_context(state) or "No research findings available."
+        inputs = fit_to_budget("expert_panel", {"query": query, "context": context_str}, self.TRIM_ORDER, usage)
+        return inputs["query"], inputs["context"]
+    
+    def _analyze(self, llm: Any, state: Dict[str, Any], persona: str, query: str, context_str: str,
+                 usage: Optional[TokenUsage] = None) -> str:
+        """Get the analysis of one persona."""
+        prompt = EXPERT_ANALYSIS_PROMPT_TEMPLATE.format(persona=persona, context_str=context_str, query=query)
+        cache_key, cached = cached_node_output("expert_panel", {"prompt": prompt}, llm, self.PROMPT_VERSION)
+        if cached is not None:
+            return cached
+        
+        remaining = time_remaining(state)
+        result = invoke_coalesced("expert_panel", cache_key, bind_timeout(llm, remaining), [HumanMessage(content=prompt)], usage, timeout=remaining)
+        store_node_output("expert_panel", cache_key, result.content, served_model_name(llm, result))
+        return result.content
+    
+    async def _aanalyze(self, llm: Any, state: Dict[str, Any], persona: str, query: str, context_str: str,
+                        usage: Optional[TokenUsage] = None) -> str:
+        """Async version of _analyze."""
+        prompt = EXPERT_ANALYSIS_PROMPT_TEMPLATE.format(persona=persona, context_str=context_str, query=query)
+        cache_key, cached = cached_node_output("expert_panel", {"prompt": prompt}, llm, self.PROMPT_VERSION)
+        if cached is not None:
+            return cached
+        
+        result = await await_before_deadline(state, "expert_panel", ainvoke_coalesced("expert_panel", cache_key, llm, [HumanMessage(content=prompt)], usage))
+        store_node_output("expert_panel", cache_key, result.content, served_model_name(llm, result))
+        return result.content
+    
+    def _collect(self, persona: str, analysis: Any) -> Optional[Dict[str, str]]:
+        """
+        Turn the outcome of a persona call into an opinion.
+        
+        Args:
+            persona: Persona that was consulted
+            analysis: Future (sync path), analysis text or exception
             
+        Returns:
+            Opinion with the persona title and analysis, or None if the call failed
+        """
+        try:
+            if hasattr(analysis, "result"):
+                analysis = analysis.result()
+            if isinstance(analysis, Exception):
+                raise analysis
+        except Exception as e:
+            print(f"Error getting expert panel opinion from {persona_title(persona)}: {str(e)}")
+            return None
+        
+        return {"persona": persona_title(persona), "analysis": filter_thinking_tags(analysis)}
+    
+    def _synthesis_prompt(self, query: str, opinions: List[Dict[str, str]]) -> str:
+        """Build the consensus synthesis prompt from the collected opinions."""
+        expert_analyses_str = "\n\n".join(
+            f"--- Analysis from {opinion['persona']} ---\n{opinion['analysis']}" for opinion in opinions
+        )
+        return CONSENSUS_SYNTHESIS_PROMPT_TEMPLATE.format(expert_analyses_str=expert_analyses_str, query=query)
+    
+    def _synthesize(self, llm: Any, state: Dict[str, Any], query: str, opinions: List[Dict[str, str]],
+                    usage: Optional[TokenUsage] = None) -> str:
+        """Synthesize the panel consensus from the opinions."""
+        if not opinions:
+            return "The expert panel could not be convened."
+        
+        prompt = self._synthesis_prompt(query, opinions)
+        cache_key, cached = cached_node_output("expert_panel_synthesis", {"prompt": prompt}, llm, self.PROMPT_VERSION)
+        if cached is not None:
+            return filter_thinking_tags(cached)
+        
+        try:
+            check_deadline(state, "expert_panel")
+            remaining = time_remaining(state)
+            result = invoke_coalesced("expert_panel_synthesis", cache_key, bind_timeout(llm, remaining), [HumanMessage(content=prompt)], usage, timeout=remaining)
+            store_node_output("expert_panel_synthesis", cache_key, result.content, served_model_name(llm, result))
+            return filter_thinking_tags(result.content)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"Error building cancer consensus: {str(e)}")
-            return {**state, "consensus": f"Unable to build cancer consensus: {str(e)}", "next": None}
+            check_deadline(state, "expert_panel")
+            print(f"Error synthesizing expert panel consensus: {str(e)}")
+            return f"Unable to synthesize expert panel consensus: {str(e)}"
+    
+    async def _asynthesize(self, llm: Any, state: Dict[str, Any], query: str, opinions: List[Dict[str, str]],
+                           usage: Optional[TokenUsage] = None) -> str:
+        """Async version of _synthesize."""
+        if not opinions:
+            return "The expert panel could not be convened."
+        
+        prompt = self._synthesis_prompt(query, opinions)
+        cache_key, cached = cached_node_output("expert_panel_synthesis", {"prompt": prompt}, llm, self.PROMPT_VERSION)
+        if cached is not None:
+            return filter_thinking_tags(cached)
+        
+        try:
+            check_deadline(state, "expert_panel")
+            result = await await_before_deadline(state, "expert_panel", ainvoke_coalesced("expert_panel_synthesis", cache_key, llm, [HumanMessage(content=prompt)], usage))
+            store_node_output("expert_panel_synthesis", cache_key, result.content, served_model_name(llm, result))
+            return filter_thinking_tags(result.content)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            check_deadline(state, "expert_panel")
+            print(f"Error synthesizing expert panel consensus: {str(e)}")
+            return f"Unable to synthesize expert panel consensus: {str(e)}"
+    
+    def _handle_result(self, state: Dict[str, Any], opinions: List[Dict[str, str]], synthesis: str,
+                       start_time: float, usage: Optional[TokenUsage] = None) -> Dict[str, Any]:
+        """Update the state with the panel outcome and its timing."""
+        panel_ms = round((time.time() - start_time) * 1000, 1)
+        print(f"Expert panel of {len(opinions)}/{len(self.personas)} specialists completed in {panel_ms / 1000:.2f}s")
+        
+        return {
+            **state,
+            "expert_opinions": opinions,
+            "panel_consensus": synthesis,
+            "run_metrics": with_metrics(state, {
+                "expert_panel_ms": panel_ms,
+                "expert_panel_opinions": len(opinions),
+                **llm_usage_update(state, "expert_panel", usage)
+            })
+        }
 
 
 class SourceVerifier:
@@ -673,6 +1890,7 @@ class SourceVerifier:
         Returns:
             Updated state with verified sources and credibility assessment
         """
+        check_deadline(state, "verify_sources")
         research_findings = state["research_findings"]
         sources = self._extract_sources(research_findings)
         
@@ -719,6 +1937,18 @@ class SourceVerifier:
             "verification_attempt": verification_attempt
         }
     
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async version of run. Verification is local and fast, so it runs inline.
+        
+        Args:
+            state: Dictionary with current workflow state
+            
+        Returns:
+            Updated state with verified sources and credibility assessment
+        """
+        return self.run(state)
+    
     def _extract_sources(self, findings: str) -> List[str]:
         """
         Extract sources from research findings.
@@ -792,6 +2022,156 @@ class SourceVerifier:
         return 5.0 
 
 
+class ResearchDigester:
+    """Agent condensing the verified research findings into one evidence digest for the downstream agents."""
+    
+    # Bump when the prompt changes to invalidate cached digests
+    PROMPT_VERSION = "1"
+    # Inputs cut to fit the input budget, lowest priority first
+    TRIM_ORDER = ["evidence"]
+    
+    def __init__(self, model: Optional[str] = None, mode: str = DIGEST_MODE,
+                 consumers: Optional[Callable[[Dict[str, Any]], int]] = None):
+        """
+        Initialize the research digester.
+        
+        Args:
+            model: LLM model condensing the digest in "llm" mode (defaults to DIGEST_MODEL)
+            mode: "extractive", "llm" or "off"
+            consumers: Function giving the number of prompts of a run that include the
+                research, used to report the tokens saved (defaults to 1)
+        """
+        self.model = model or DIGEST_MODEL
+        self.mode = mode
+        self.consumers = consumers
+        
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", """You condense research evidence for an oncology team.
+            Rewrite the evidence below as short factual bullet points. Merge points that say the same thing,
+            drop generic statements, keep every number, and keep the [S#] IDs next to the facts they support.
+            Do not add information. Return only the bullet points."""),
+            ("human", "Topic: {topic}\nSymptoms: {symptoms}\n\n{evidence}")
+        ])
+    
+    def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the evidence digest of the research findings.
+        
+        Args:
+            state: The current state
+            
+        Returns:
+            Updated state with the research digest
+        """
+        check_deadline(state, "digest_research")
+        usage = TokenUsage()
+        info = self._extract(state)
+        digest = info["digest"]
+        if digest and self.mode == "llm":
+            evidence, sources = self._split_sources(digest)
+            llm = get_llm(self.model, temperature=0)
+            inputs = fit_to_budget("digest_research", self._prepare_inputs(state, evidence), self.TRIM_ORDER, usage)
+            cache_key, cached = cached_node_output("digest_research", inputs, llm, self.PROMPT_VERSION)
+            try:
+                if cached is None:
+                    chain = self.prompt | bind_timeout(llm, time_remaining(state))
+                    result = invoke_coalesced("digest_research", cache_key, chain, inputs, usage, timeout=time_remaining(state))
+                    cached = result.content
+                    store_node_output("digest_research", cache_key, cached, served_model_name(llm, result))
+                digest = f"{filter_thinking_tags(cached)}\n\n{sources}"
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                check_deadline(state, "digest_research")
+                print(f"Error condensing research digest, using the extractive digest: {str(e)}")
+        return self._handle_result(state, info, digest, usage)
+    
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async version of run using a non-blocking LLM call.
+        
+        Args:
+            state: The current state
+            
+        Returns:
+            Updated state with the research digest
+        """
+        check_deadline(state, "digest_research")
+        usage = TokenUsage()
+        info = self._extract(state)
+        digest = info["digest"]
+        if digest and self.mode == "llm":
+            evidence, sources = self._split_sources(digest)
+            llm = get_llm(self.model, temperature=0)
+            inputs = fit_to_budget("digest_research", self._prepare_inputs(state, evidence), self.TRIM_ORDER, usage)
+            cache_key, cached = cached_node_output("digest_research", inputs, llm, self.PROMPT_VERSION)
+            try:
+                if cached is None:
+                    chain = self.prompt | llm
+                    result = await await_before_deadline(state, "digest_research",
+                                                         ainvoke_coalesced("digest_research", cache_key, chain, inputs, usage))
+                    cached = result.content
+                    store_node_output("digest_research", cache_key, cached, served_model_name(llm, result))
+                digest = f"{filter_thinking_tags(cached)}\n\n{sources}"
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                check_deadline(state, "digest_research")
+                print(f"Error condensing research digest, using the extractive digest: {str(e)}")
+        return self._handle_result(state, info, digest, usage)
+    
+    def _extract(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the extractive digest (none in "off" mode)."""
+        if self.mode == "off":
+            return {"digest": None, "sources_in": 0, "sources_kept": 0, "duplicates_removed": 0}
+        return build_digest(
+            state.get("research_findings") or "",
+            state.get("verified_sources"),
+            state["topic"],
+            state.get("symptoms", "")
+        )
+    
+    def _split_sources(self, digest: str) -> Tuple[str, str]:
+        """Split a digest into its evidence lines and its source list."""
+        evidence, _, sources = digest.partition("\n\nSources:")
+        return evidence, "Sources:" + sources
+    
+    def _prepare_inputs(self, state: Dict[str, Any], evidence: str) -> Dict[str, Any]:
+        """Collect the prompt inputs from the state."""
+        return {"topic": state["topic"], "symptoms": state.get("symptoms", ""), "evidence": evidence}
+    
+    def _handle_result(self, state: Dict[str, Any], info: Dict[str, Any], digest: Optional[str],
+                       usage: Optional[TokenUsage] = None) -> Dict[str, Any]:
+        """Store the digest and report the tokens it saves."""
+        findings_tokens = estimate_tokens(state.get("research_findings"))
+        digest_tokens = estimate_tokens(digest)
+        if not digest or digest_tokens >= findings_tokens:
+            # Nothing to gain; the agents keep reading the full findings
+            digest, digest_tokens = None, findings_tokens
+        
+        saved_per_prompt = findings_tokens - digest_tokens
+        prompts = self.consumers(state) if self.consumers else 1
+        previous = (state.get("run_metrics") or {}).get("research_digest", {})
+        print(f"Research digest: {info['sources_kept']} of {info['sources_in']} sources, "
+              f"{digest_tokens} instead of {findings_tokens} tokens per prompt")
+        
+        return {
+            **state,
+            "research_digest": digest,
+            "run_metrics": with_metrics(state, {"research_digest": {
+                "findings_tokens": findings_tokens,
+                "digest_tokens": digest_tokens,
+                "sources_in": info["sources_in"],
+                "sources_kept": info["sources_kept"],
+                "duplicates_removed": info["duplicates_removed"],
+                "tokens_saved_per_prompt": saved_per_prompt,
+                "prompts": prompts,
+                # Accumulated over the consensus rounds
+                "tokens_saved": previous.get("tokens_saved", 0) + saved_per_prompt * prompts
+            }, **llm_usage_update(state, "digest_research", usage)})
+        }
+
+
 class LungCancerSpecialistAgent:
     """Agent specialized in lung cancer diagnosis, staging, treatment, and prognosis."""
     
@@ -824,6 +2204,7 @@ class LungCancerSpecialistAgent:
         Returns:
             Updated state with lung cancer analysis
         """
+        check_deadline(state, "lung_cancer_analysis")
         topic = state["topic"]
         symptoms = state["symptoms"]
         medical_history = state.get("medical_history", "")
@@ -976,6 +2357,18 @@ class LungCancerSpecialistAgent:
             "next": "verify_sources"
         }
     
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async version of run. The rule-based modules finish in milliseconds, so it runs inline.
+        
+        Args:
+            state: Dictionary with current workflow state
+            
+        Returns:
+            Updated state with lung cancer analysis
+        """
+        return self.run(state)
+    
     def _create_detailed_diagnoses(self, 
                                   classification: Dict[str, Any],
                                   staging: Dict[str, Any],
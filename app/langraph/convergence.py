@@ -0,0 +1,107 @@
+"""
+Convergence checks between consensus rounds of the Consensus Mechanism AI Agents system.
+"""
+
+import os
+import re
+from difflib import SequenceMatcher
+from typing import Any, List, Set
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Successive rounds whose consensus and diagnoses are at least this similar are considered converged
+CONVERGENCE_THRESHOLD = float(os.getenv("CONVERGENCE_THRESHOLD", "0.9"))
+
+# Labels of the sections of a consensus report, as requested by the ConsensusBuilder prompt
+CONSENSUS_SECTIONS = [
+    "ONCOLOGICAL REASONING",
+    "CONSENSUS CANCER DIAGNOSIS",
+    "COMPREHENSIVE CANCER CARE PLAN",
+    "PATIENT GUIDANCE"
+]
+
+
+def _words(text: str) -> List[str]:
+    """Lowercase words of a text, ignoring punctuation and markdown."""
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def text_similarity(first: str, second: str) -> float:
+    """
+    Similarity of two texts based on a word-level diff.
+
+    Args:
+        first: First text
+        second: Second text
+
+    Returns:
+        Similarity between 0.0 (nothing in common) and 1.0 (same words)
+    """
+    first_words, second_words = _words(first or ""), _words(second or "")
+    if not first_words and not second_words:
+        return 1.0
+    return SequenceMatcher(None, first_words, second_words, autojunk=False).ratio()
+
+
+def _split_sections(report: str) -> List[str]:
+    """Split a consensus report into its labeled sections (empty if the labels are missing)."""
+    positions = []
+    for label in CONSENSUS_SECTIONS:
+        index = report.upper().find(label)
+        if index == -1:
+            return []
+        positions.append(index)
+    if positions != sorted(positions):
+        return []
+    return [report[start:end] for start, end in zip(positions, positions[1:] + [len(report)])]
+
+
+def consensus_similarity(previous: str, current: str) -> float:
+    """
+    Similarity of two consensus reports, compared section by section when possible.
+
+    The least similar section decides, so a changed diagnosis or care plan is not hidden by
+    an unchanged patient guidance section.
+
+    Args:
+        previous: Consensus report of the previous round
+        current: Consensus report of the current round
+
+    Returns:
+        Similarity between 0.0 and 1.0
+    """
+    previous_sections, current_sections = _split_sections(previous or ""), _split_sections(current or "")
+    if previous_sections and current_sections:
+        return min(text_similarity(a, b) for a, b in zip(previous_sections, current_sections))
+    return text_similarity(previous, current)
+
+
+def _diagnosis_names(diagnoses: Any) -> Set[str]:
+    """Names of the diagnoses, taken from their markdown headings."""
+    text = "\n".join(diagnoses) if isinstance(diagnoses, list) else str(diagnoses or "")
+    return {" ".join(_words(name)) for name in re.findall(r"^#+\s*(.+)$", text, flags=re.MULTILINE)}
+
+
+def diagnoses_similarity(previous: Any, current: Any) -> float:
+    """
+    Similarity of two diagnosis sets.
+
+    Diagnoses with headings are compared as sets of names (Jaccard index), others as text.
+
+    Args:
+        previous: Diagnoses of the previous round (string or list of strings)
+        current: Diagnoses of the current round (string or list of strings)
+
+    Returns:
+        Similarity between 0.0 and 1.0
+    """
+    previous_names, current_names = _diagnosis_names(previous), _diagnosis_names(current)
+    if previous_names and current_names:
+        return len(previous_names & current_names) / len(previous_names | current_names)
+
+    def as_text(diagnoses: Any) -> str:
+        return "\n".join(diagnoses) if isinstance(diagnoses, list) else str(diagnoses or "")
+
+    return text_similarity(as_text(previous), as_text(current))
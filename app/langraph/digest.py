@@ -0,0 +1,149 @@
+"""
+Extractive digest of the research findings shared by the downstream agents.
+"""
+
+import os
+import re
+from typing import Dict, Any, List, Optional, Set
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of sources and characters kept in the digest
+DIGEST_MAX_SOURCES = int(os.getenv("DIGEST_MAX_SOURCES", "12"))
+DIGEST_MAX_CHARS = int(os.getenv("DIGEST_MAX_CHARS", "4000"))
+# Findings whose words overlap at least this much with an earlier finding are dropped as duplicates
+DIGEST_DUPLICATE_THRESHOLD = float(os.getenv("DIGEST_DUPLICATE_THRESHOLD", "0.6"))
+# Longest summary kept per source
+DIGEST_SUMMARY_CHARS = 300
+
+ITEM_PATTERN = re.compile(r"^\s*\d+\.\s+(.+)$")
+CREDIBILITY_PATTERN = re.compile(r"^(.*?)\s*\(Credibility:\s*([\d.]+)/10\)\s*$")
+
+
+def _words(text: str) -> Set[str]:
+    """Lowercase words of a text, ignoring punctuation and very short words."""
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower()) if len(word) > 2}
+
+
+def parse_findings(findings: str) -> List[Dict[str, str]]:
+    """
+    Parse research findings into their sources.
+
+    Understands the numbered "title / Summary: / Source:" entries written by the researcher.
+    Findings in another format (e.g. simulated research) yield no entries.
+
+    Args:
+        findings: Research findings text
+
+    Returns:
+        List of entries with title, summary and link
+    """
+    entries = []
+    current = None
+    for line in (findings or "").splitlines():
+        stripped = line.strip()
+        if stripped.startswith("Summary:") and current is not None:
+            current["summary"] = stripped[len("Summary:"):].strip()
+        elif stripped.startswith("Source:") and current is not None:
+            current["link"] = stripped[len("Source:"):].strip()
+            entries.append(current)
+            current = None
+        else:
+            match = ITEM_PATTERN.match(line)
+            if match:
+                current = {"title": match.group(1).strip(), "summary": "", "link": ""}
+    return entries
+
+
+def _source_credibility(verified_sources: Optional[List[str]]) -> Dict[str, float]:
+    """Map the verified sources to their credibility scores."""
+    credibility = {}
+    for source in verified_sources or []:
+        match = CREDIBILITY_PATTERN.match(source)
+        if match:
+            credibility[match.group(1).strip()] = float(match.group(2))
+    return credibility
+
+
+def _truncate(text: str, limit: int) -> str:
+    """Shorten a text to at most limit characters, cutting at a word boundary."""
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0].rstrip(",;:") + "..."
+
+
+def build_digest(findings: str, verified_sources: Optional[List[str]], topic: str, symptoms: str = "",
+                 max_sources: int = DIGEST_MAX_SOURCES, max_chars: int = DIGEST_MAX_CHARS) -> Dict[str, Any]:
+    """
+    Build a compact, deduplicated evidence digest from the research findings.
+
+    Sources that passed verification are kept first, ranked by credibility and by word
+    overlap with the topic and symptoms; sources repeating an earlier source's link or
+    most of its words are dropped. Each kept source gets an ID ([S1], [S2], ...) that the
+    agents can cite.
+
+    Args:
+        findings: Research findings text
+        verified_sources: Verified sources with their credibility
+        topic: Topic of the run
+        symptoms: Patient symptoms
+        max_sources: Maximum number of sources kept
+        max_chars: Maximum length of the digest
+
+    Returns:
+        Dictionary with digest (None if the findings could not be parsed), sources_in,
+        sources_kept and duplicates_removed
+    """
+    entries = parse_findings(findings)
+    if not entries:
+        return {"digest": None, "sources_in": 0, "sources_kept": 0, "duplicates_removed": 0}
+
+    credibility = _source_credibility(verified_sources)
+    query_words = _words(f"{topic} {symptoms}")
+
+    def rank(indexed_entry):
+        index, entry = indexed_entry
+        relevance = len(query_words & _words(f"{entry['title']} {entry['summary']}"))
+        # Verified sources first, then by credibility, relevance and original order
+        return (entry["link"] not in credibility, -credibility.get(entry["link"], 0.0), -relevance, index)
+
+    kept = []
+    kept_words: List[Set[str]] = []
+    seen_links = set()
+    duplicates = 0
+    for _, entry in sorted(enumerate(entries), key=rank):
+        words = _words(f"{entry['title']} {entry['summary']}")
+        if entry["link"] in seen_links or any(
+            words and len(words & other) / len(words | other) >= DIGEST_DUPLICATE_THRESHOLD for other in kept_words
+        ):
+            duplicates += 1
+            continue
+        seen_links.add(entry["link"])
+        kept_words.append(words)
+        kept.append(entry)
+
+    lines = [f"Evidence digest for {topic} (cite sources by ID):"]
+    source_lines = ["Sources:"]
+    length = len(lines[0]) + len(source_lines[0])
+    kept_count = 0
+    for entry in kept[:max_sources]:
+        source_id = f"S{kept_count + 1}"
+        summary = _truncate(entry["summary"], DIGEST_SUMMARY_CHARS)
+        line = f"[{source_id}] {entry['title']}: {summary}" if summary else f"[{source_id}] {entry['title']}"
+        score = credibility.get(entry["link"])
+        source_line = f"[{source_id}] {entry['link']}" + (f" (credibility {score}/10)" if score is not None else "")
+        if kept_count and length + len(line) + len(source_line) + 2 > max_chars:
+            break
+        lines.append(line)
+        source_lines.append(source_line)
+        length += len(line) + len(source_line) + 2
+        kept_count += 1
+
+    return {
+        "digest": "\n".join(lines) + "\n\n" + "\n".join(source_lines),
+        "sources_in": len(entries),
+        "sources_kept": kept_count,
+        "duplicates_removed": duplicates
+    }
@@ -3,18 +3,49 @@ LangGraph implementation of the Consensus Mechanism AI Agents system.
 """
 
 import os
-from typing import Dict, List, Any, Tuple, Optional, Annotated, TypedDict, Literal
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from typing import Dict, List, Any, Tuple, Optional, Annotated, TypedDict, Literal, Iterator
 from dotenv import load_dotenv
 
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda, RunnableConfig
 from langgraph.graph import StateGraph, END, START
 from langgraph.prebuilt import ToolNode
 
-from app.langraph.agents import ResearcherAgent, SourceVerifier, Diagnostician, TreatmentAdvisor, ConsensusBuilder, LungCancerSpecialistAgent
+from app.langraph.agents import ResearcherAgent, SourceVerifier, Diagnostician, TreatmentAdvisor, ConsensusBuilder, LungCancerSpecialistAgent, ExpertPanel, ResearchDigester, DeadlineExceeded, EXPERT_PANEL_SIZE
+from app.langraph.metrics import merge_run_metrics
+from app.tools.web_search import create_default_session
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    SQLITE_CHECKPOINTS_AVAILABLE = True
+except ImportError:
+    SQLITE_CHECKPOINTS_AVAILABLE = False
+    print("Warning: langgraph-checkpoint-sqlite not available. Diagnosis runs cannot be resumed.")
 
 # Load environment variables
 load_dotenv()
 
+# SQLite file holding the checkpoints of diagnosis runs (empty to disable checkpointing)
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "diagnosis_checkpoints.sqlite")
+# Checkpoints of runs not resumed or completed within this many seconds are deleted
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", "604800"))
+# Maximum number of resumable runs kept (the least recently started are deleted first)
+CHECKPOINT_MAX_RUNS = int(os.getenv("CHECKPOINT_MAX_RUNS", "1000"))
+
+# Run the lung cancer specialist alongside the LLM diagnosis path instead of replacing it
+PARALLEL_LUNG_SPECIALIST = os.getenv("PARALLEL_LUNG_SPECIALIST", "false").lower() in ("1", "true", "yes")
+
+# Maximum number of research-to-consensus rounds (later rounds stop early once the consensus converges)
+MAX_CONSENSUS_ROUNDS = int(os.getenv("MAX_CONSENSUS_ROUNDS", "1"))
+
+# Convene the multidisciplinary expert panel alongside the LLM diagnosis path
+EXPERT_PANEL_ENABLED = os.getenv("EXPERT_PANEL_ENABLED", "false").lower() in ("1", "true", "yes")
+
 # Define state types
 class MedicalDiagnosisState(TypedDict):
     """State for the medical diagnosis graph."""
@@ -23,6 +54,7 @@ class MedicalDiagnosisState(TypedDict):
     medical_history: str
     test_results: str
     research_findings: Optional[str]
+    research_digest: Optional[str]
     verified_sources: Optional[List[str]]
     source_credibility: Optional[float]
     diagnoses: List[str]
@@ -34,14 +66,129 @@ class MedicalDiagnosisState(TypedDict):
     research_attempt: int
     verification_attempt: int
     lung_cancer_analysis: Optional[Dict[str, Any]]
+    specialist_diagnoses: Optional[List[str]]
+    specialist_treatments: Optional[List[str]]
+    expert_opinions: Optional[List[Dict[str, str]]]
+    panel_consensus: Optional[str]
+    previous_round: Optional[Dict[str, Any]]
+    research_queries: Optional[List[str]]
+    deadline: Optional[float]
+    stream_consensus: bool
+    run_metrics: Annotated[Dict[str, Any], merge_run_metrics]
+
+
+def _node_update(before: Dict[str, Any], output: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce the full state returned by an agent to the keys it changed.
+    
+    Agents return {**state, ...}. Writing back only the changed keys lets nodes in parallel
+    branches update the state in the same step without conflicting on untouched keys.
+    
+    Args:
+        before: Copy of the state the agent received
+        output: State returned by the agent
+        
+    Returns:
+        State update of the node
+    """
+    return {key: value for key, value in output.items() if key not in before or before[key] is not value}
 
 
-def create_medical_diagnosis_graph(researcher: ResearcherAgent) -> StateGraph:
+def _with_config_deadline(state: Dict[str, Any], config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Apply a deadline passed in the run config over the one in the state.
+    
+    Resumed runs get their fresh time budget through config["configurable"]["deadline"]
+    instead of a state update, which would add a checkpoint and re-run a node's edges.
+    
+    Args:
+        state: The current state
+        config: Config of the node call
+        
+    Returns:
+        The state, with the deadline of the config if one was given
+    """
+    deadline = ((config or {}).get("configurable") or {}).get("deadline")
+    if deadline is None:
+        return state
+    return {**state, "deadline": deadline}
+
+
+def _agent_node(agent: Any, name: str) -> RunnableLambda:
+    """
+    Wrap an agent as a graph node usable from both invoke and ainvoke.
+    
+    Args:
+        agent: Agent with run and arun methods
+        name: Name of the node
+        
+    Returns:
+        Runnable calling agent.run synchronously and agent.arun asynchronously
+    """
+    def run(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        state = _with_config_deadline(state, config)
+        before = dict(state)
+        return _node_update(before, agent.run(state))
+    
+    async def arun(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        state = _with_config_deadline(state, config)
+        before = dict(state)
+        return _node_update(before, await agent.arun(state))
+    
+    return RunnableLambda(run, afunc=arun, name=name)
+
+
+def _specialist_branch_node(agent: LungCancerSpecialistAgent, name: str) -> RunnableLambda:
+    """
+    Wrap the lung cancer specialist as a branch running alongside the LLM diagnosis path.
+    
+    The branch only writes the specialist keys, so the LLM diagnoses and treatments are kept
+    and both perspectives reach the consensus builder.
+    
+    Args:
+        agent: Lung cancer specialist agent
+        name: Name of the node
+        
+    Returns:
+        Runnable returning the specialist analysis, diagnoses and treatments
+    """
+    def branch_update(output: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "lung_cancer_analysis": output.get("lung_cancer_analysis"),
+            "specialist_diagnoses": output.get("diagnoses"),
+            "specialist_treatments": output.get("treatments")
+        }
+    
+    def run(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        return branch_update(agent.run(_with_config_deadline(state, config)))
+    
+    async def arun(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        return branch_update(await agent.arun(_with_config_deadline(state, config)))
+    
+    return RunnableLambda(run, afunc=arun, name=name)
+
+
+def _is_lung_cancer_topic(state: Dict[str, Any]) -> bool:
+    """Whether the lung cancer specialist applies to the topic of the run."""
+    topic = state["topic"].lower()
+    return "lung" in topic and "cancer" in topic
+
+
+def create_medical_diagnosis_graph(researcher: ResearcherAgent, model: Optional[str] = None, checkpointer: Optional[Any] = None,
+                                   parallel_specialist: bool = False, expert_panel: bool = False) -> StateGraph:
     """
     Create a graph for medical diagnosis workflow.
     
     Args:
         researcher: A ResearcherAgent instance
+        model: LLM model used by the LLM-backed agents (defaults to the provider model)
+        checkpointer: Optional checkpointer saving the state after every node. Runs of a
+            checkpointed graph must pass a thread_id in their config.
+        parallel_specialist: For lung cancer topics, run the lung cancer specialist and the
+            LLM diagnosis path concurrently and join them before building consensus, instead
+            of sending the case to the specialist only.
+        expert_panel: Run the multidisciplinary expert panel concurrently with the diagnosis
+            path and hand its consensus to the consensus builder.
     
     Returns:
         A StateGraph instance representing the medical diagnosis workflow
@@ -50,42 +197,84 @@ def create_medical_diagnosis_graph(researcher: ResearcherAgent) -> StateGraph:
     workflow = StateGraph(state_schema=MedicalDiagnosisState)
     
     # Add nodes to the graph
-    workflow.add_node("research", researcher.run)
+    workflow.add_node("research", _agent_node(researcher, "research"))
     
     source_verifier = SourceVerifier()
-    workflow.add_node("verify_sources", source_verifier.run)
+    workflow.add_node("verify_sources", _agent_node(source_verifier, "verify_sources"))
+    
+    def digest_consumers(x: Dict[str, Any]) -> int:
+        # Prompts of a consensus round built from the research: consensus, the LLM
+        # diagnosis path (diagnose and treatment) and one per expert
+        prompts = 1
+        if parallel_specialist or not _is_lung_cancer_topic(x):
+            prompts += 2
+        if expert_panel:
+            prompts += EXPERT_PANEL_SIZE
+        return prompts
+    
+    research_digester = ResearchDigester(consumers=digest_consumers)
+    workflow.add_node("digest_research", _agent_node(research_digester, "digest_research"))
         
     # Add lung cancer specialist agent
     lung_cancer_specialist = LungCancerSpecialistAgent(realtime=researcher.realtime, min_sources=researcher.min_sources)
-    workflow.add_node("lung_cancer_analysis", lung_cancer_specialist.run)
+    if parallel_specialist:
+        workflow.add_node("lung_cancer_analysis", _specialist_branch_node(lung_cancer_specialist, "lung_cancer_analysis"))
+    else:
+        workflow.add_node("lung_cancer_analysis", _agent_node(lung_cancer_specialist, "lung_cancer_analysis"))
+    
+    diagnostician = Diagnostician(model=model)
+    workflow.add_node("diagnose", _agent_node(diagnostician, "diagnose"))
     
-    diagnostician = Diagnostician()
-    workflow.add_node("diagnose", diagnostician.run)
+    treatment_advisor = TreatmentAdvisor(model=model)
+    workflow.add_node("recommend_treatment", _agent_node(treatment_advisor, "recommend_treatment"))
     
-    treatment_advisor = TreatmentAdvisor()
-    workflow.add_node("recommend_treatment", treatment_advisor.run)
+    if expert_panel:
+        panel = ExpertPanel(model=model)
+        workflow.add_node("expert_panel", _agent_node(panel, "expert_panel"))
     
-    consensus_builder = ConsensusBuilder()
-    workflow.add_node("build_consensus", consensus_builder.run)
+    consensus_builder = ConsensusBuilder(model=model)
+    # When branches run in parallel, defer consensus until every branch has finished
+    fan_out = parallel_specialist or expert_panel
+    workflow.add_node("build_consensus", _agent_node(consensus_builder, "build_consensus"), defer=fan_out)
     
     # Add edges to connect the nodes
     workflow.add_edge("research", "verify_sources")
+    workflow.add_edge("verify_sources", "digest_research")
     
-    # Add conditional edge to route to lung cancer specialist if topic is related to lung cancer
-    workflow.add_conditional_edges(
-        "verify_sources",
-        lambda x: "lung_cancer_analysis" if "lung" in x["topic"].lower() and "cancer" in x["topic"].lower() else "diagnose",
-        {
-            "lung_cancer_analysis": "lung_cancer_analysis",
-            "diagnose": "diagnose"
-        }
-    )
+    if fan_out:
+        def route_after_digest(x: Dict[str, Any]) -> List[str]:
+            if _is_lung_cancer_topic(x):
+                # Fan out to both the specialist and the LLM path for lung cancer topics
+                branches = ["lung_cancer_analysis", "diagnose"] if parallel_specialist else ["lung_cancer_analysis"]
+            else:
+                branches = ["diagnose"]
+            if expert_panel:
+                branches.append("expert_panel")
+            return branches
+        
+        workflow.add_conditional_edges(
+            "digest_research",
+            route_after_digest,
+            ["lung_cancer_analysis", "diagnose", "expert_panel"] if expert_panel else ["lung_cancer_analysis", "diagnose"]
+        )
+    else:
+        # Add conditional edge to route to lung cancer specialist if topic is related to lung cancer
+        workflow.add_conditional_edges(
+            "digest_research",
+            lambda x: "lung_cancer_analysis" if _is_lung_cancer_topic(x) else "diagnose",
+            {
+                "lung_cancer_analysis": "lung_cancer_analysis",
+                "diagnose": "diagnose"
+            }
+        )
     
     # Connect lung cancer specialist back to the main flow
     workflow.add_edge("lung_cancer_analysis", "build_consensus")
     
     workflow.add_edge("diagnose", "recommend_treatment")
     workflow.add_edge("recommend_treatment", "build_consensus")
+    if expert_panel:
+        workflow.add_edge("expert_panel", "build_consensus")
     
     # Add conditional edges for multi-round consensus
     workflow.add_conditional_edges(
@@ -101,7 +290,292 @@ def create_medical_diagnosis_graph(researcher: ResearcherAgent) -> StateGraph:
     workflow.set_entry_point("research")
     
     # Compile the graph
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer():
+    """
+    Get the process-wide SQLite checkpointer used to resume diagnosis runs.
+    
+    Stale checkpoints of failed or timed-out runs are pruned when the checkpointer is opened.
+    
+    Returns:
+        SqliteSaver writing to CHECKPOINT_DB_PATH, or None if checkpointing is unavailable
+    """
+    global _checkpointer
+    if not SQLITE_CHECKPOINTS_AVAILABLE or not CHECKPOINT_DB_PATH:
+        return None
+    
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            # The saver serialises access to the connection with its own lock
+            connection = sqlite3.connect(CHECKPOINT_DB_PATH, check_same_thread=False)
+            checkpointer = SqliteSaver(connection)
+            checkpointer.setup()
+            with checkpointer.cursor() as cur:
+                cur.execute(
+                    "CREATE TABLE IF NOT EXISTS checkpoint_runs (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+                )
+            _prune_checkpoints(checkpointer)
+            _checkpointer = checkpointer
+    return _checkpointer
+
+
+def _prune_checkpoints(checkpointer: Any) -> int:
+    """
+    Delete the checkpoints of runs older than CHECKPOINT_TTL_SECONDS and of the least
+    recently started runs beyond CHECKPOINT_MAX_RUNS.
+    
+    Checkpoint threads without a recorded start time (left by older versions) are deleted too.
+    
+    Args:
+        checkpointer: SqliteSaver to prune
+        
+    Returns:
+        Number of runs deleted
+    """
+    try:
+        with checkpointer.cursor() as cur:
+            cur.execute("SELECT thread_id FROM checkpoint_runs WHERE updated_at < ?", (time.time() - CHECKPOINT_TTL_SECONDS,))
+            stale = {row[0] for row in cur.fetchall()}
+            cur.execute(
+                "SELECT thread_id FROM checkpoint_runs ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+                (max(0, CHECKPOINT_MAX_RUNS),)
+            )
+            stale.update(row[0] for row in cur.fetchall())
+            cur.execute(
+                "SELECT DISTINCT thread_id FROM checkpoints WHERE thread_id NOT IN (SELECT thread_id FROM checkpoint_runs)"
+            )
+            stale.update(row[0] for row in cur.fetchall())
+        for thread_id in stale:
+            _delete_thread(checkpointer, thread_id)
+        if stale:
+            print(f"Pruned the checkpoints of {len(stale)} stale diagnosis runs")
+        return len(stale)
+    except Exception as e:
+        print(f"Warning: Could not prune stale checkpoints: {e}")
+        return 0
+
+
+def _delete_thread(checkpointer: Any, run_id: str) -> None:
+    """Delete the checkpoints of a run and its start time record."""
+    checkpointer.delete_thread(run_id)
+    with checkpointer.cursor() as cur:
+        cur.execute("DELETE FROM checkpoint_runs WHERE thread_id = ?", (run_id,))
+
+
+def _record_run(run_id: str) -> None:
+    """
+    Record that a run was started or resumed, so its checkpoints expire CHECKPOINT_TTL_SECONDS later.
+    
+    Args:
+        run_id: Run id (checkpoint thread id)
+    """
+    checkpointer = get_checkpointer()
+    if checkpointer is None:
+        return
+    try:
+        with checkpointer.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO checkpoint_runs (thread_id, updated_at) VALUES (?, ?)",
+                (run_id, time.time())
+            )
+    except Exception as e:
+        print(f"Warning: Could not record run {run_id}: {e}")
+
+
+def delete_checkpoints(run_id: str) -> None:
+    """
+    Delete the checkpoints of a run, once it completed and no longer needs resuming.
+    
+    Args:
+        run_id: Run id (checkpoint thread id)
+    """
+    checkpointer = get_checkpointer()
+    if checkpointer is None:
+        return
+    try:
+        _delete_thread(checkpointer, run_id)
+    except Exception as e:
+        print(f"Warning: Could not delete the checkpoints of run {run_id}: {e}")
+
+
+# Process-wide registry of compiled graphs, keyed by (realtime, min_sources, model, checkpointed, parallel_specialist, expert_panel)
+_graph_registry: Dict[Tuple[bool, int, Optional[str], bool, bool, bool], Any] = {}
+_graph_registry_lock = threading.Lock()
+
+
+def get_medical_diagnosis_graph(realtime: bool = False, min_sources: int = 10, model: Optional[str] = None, checkpointed: bool = False,
+                                parallel_specialist: Optional[bool] = None, expert_panel: Optional[bool] = None):
+    """
+    Get the compiled medical diagnosis graph for a configuration, building it on first use.
+    
+    The graph and its agents (including the lung cancer rule engines) are created once per
+    configuration and shared by every request in the process.
+    
+    Args:
+        realtime: Whether to use real-time web search
+        min_sources: Minimum number of sources to include in research
+        model: LLM model used by the LLM-backed agents (defaults to the provider model)
+        checkpointed: Whether to save the state to the SQLite checkpointer after every node.
+            Ignored when checkpointing is unavailable.
+        parallel_specialist: Whether lung cancer topics run the specialist and the LLM path
+            concurrently (defaults to PARALLEL_LUNG_SPECIALIST)
+        expert_panel: Whether to convene the expert panel (defaults to EXPERT_PANEL_ENABLED)
+        
+    Returns:
+        Compiled medical diagnosis graph
+    """
+    if parallel_specialist is None:
+        parallel_specialist = PARALLEL_LUNG_SPECIALIST
+    if expert_panel is None:
+        expert_panel = EXPERT_PANEL_ENABLED
+    checkpointer = get_checkpointer() if checkpointed else None
+    key = (bool(realtime), int(min_sources), model, checkpointer is not None, bool(parallel_specialist), bool(expert_panel))
+    graph = _graph_registry.get(key)
+    if graph is not None:
+        return graph
+    
+    with _graph_registry_lock:
+        graph = _graph_registry.get(key)
+        if graph is None:
+            print(f"Compiling medical diagnosis graph for realtime={realtime}, min_sources={min_sources}, model={model or 'default'}, "
+                  f"checkpointed={checkpointer is not None}, parallel_specialist={parallel_specialist}, expert_panel={expert_panel}")
+            researcher = ResearcherAgent(realtime=realtime, min_sources=min_sources)
+            researcher.session = create_default_session()
+            graph = create_medical_diagnosis_graph(researcher, model=model, checkpointer=checkpointer,
+                                                   parallel_specialist=parallel_specialist, expert_panel=expert_panel)
+            _graph_registry[key] = graph
+    return graph
+
+
+def warm_up_graphs(configs: Optional[List[Tuple[bool, int, Optional[str]]]] = None) -> int:
+    """
+    Pre-compile medical diagnosis graphs so the first request does not pay for it.
+    
+    Args:
+        configs: List of (realtime, min_sources, model) tuples to compile.
+            Defaults to the simulated and real-time configurations used by the UI.
+        
+    Returns:
+        Number of compiled graphs in the registry
+    """
+    if configs is None:
+        configs = [(False, 10, None), (True, 10, None)]
+    
+    for realtime, min_sources, model in configs:
+        try:
+            get_medical_diagnosis_graph(realtime=realtime, min_sources=min_sources, model=model)
+        except Exception as e:
+            print(f"Warning: Failed to warm up graph for realtime={realtime}, min_sources={min_sources}: {e}")
+    
+    return len(_graph_registry)
+
+
+def clear_graph_registry() -> None:
+    """Drop all compiled graphs, e.g. after changing provider configuration."""
+    with _graph_registry_lock:
+        _graph_registry.clear()
+
+
+def _initial_state(
+    topic: str,
+    symptoms: str,
+    medical_history: str,
+    test_results: str,
+    min_sources: int,
+    deadline: Optional[float] = None,
+    stream_consensus: bool = False
+) -> Dict[str, Any]:
+    """
+    Build the input state for a diagnosis run.
+    
+    Args:
+        topic: The medical topic to research
+        symptoms: Patient symptoms
+        medical_history: Patient medical history
+        test_results: Patient test results
+        min_sources: Minimum number of sources to include in research
+        deadline: Absolute time (time.time()) by which the run must finish
+        stream_consensus: Whether the consensus builder streams its tokens
+        
+    Returns:
+        Input state for the medical diagnosis graph
+    """
+    return {
+        "topic": topic,
+        "symptoms": symptoms,
+        "medical_history": medical_history,
+        "test_results": test_results,
+        "diagnoses": [],
+        "treatments": [],
+        "research_findings": None,
+        "research_digest": None,
+        "verified_sources": None,
+        "source_credibility": None,
+        "consensus": None,
+        "current_round": 1,
+        "max_rounds": MAX_CONSENSUS_ROUNDS,
+        "next": None,
+        "research_attempt": 0,  # Initialize research attempt counter
+        "verification_attempt": 0,  # Initialize verification attempt counter
+        "min_sources": min_sources,  # Pass minimum sources parameter
+        "lung_cancer_analysis": None,  # Initialize lung cancer analysis
+        "specialist_diagnoses": None,
+        "specialist_treatments": None,
+        "expert_opinions": None,
+        "panel_consensus": None,
+        "previous_round": None,  # Consensus and diagnoses of the last round, to detect convergence
+        "research_queries": None,  # Gap queries already searched in later rounds
+        "deadline": deadline,  # Every agent and HTTP/LLM call honours this
+        "stream_consensus": stream_consensus,
+        "run_metrics": {}
+    }
+
+
+def _timeout_result(partial_state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Result returned when the diagnosis workflow hits its deadline.
+    
+    Args:
+        partial_state: Last state produced before the deadline
+        
+    Returns:
+        The partial results gathered so far, with placeholders for missing parts
+    """
+    result = dict(partial_state)
+    if not result.get("research_findings"):
+        result["research_findings"] = "Diagnosis process timed out. Please try again later."
+    if not result.get("diagnoses"):
+        result["diagnoses"] = ["Diagnosis could not be completed due to timeout."]
+    if not result.get("treatments"):
+        result["treatments"] = ["Treatment recommendations could not be generated."]
+    if not result.get("consensus"):
+        result["consensus"] = "The diagnosis workflow timed out before completion."
+    if not result.get("verified_sources"):
+        result["verified_sources"] = []
+    if not result.get("source_credibility"):
+        result["source_credibility"] = 0.0
+    result["timed_out"] = True
+    return result
+
+
+def _error_result(topic: str, e: Exception) -> Dict[str, Any]:
+    """Result returned when the diagnosis workflow fails."""
+    return {
+        "topic": topic,
+        "error": str(e),
+        "consensus": "Unable to complete diagnosis due to technical issues.",
+        "diagnoses": [],
+        "treatments": [],
+        "research_findings": f"Error: {str(e)}",
+        "verified_sources": [],
+        "source_credibility": 0.0
+    }
 
 
 def run_medical_diagnosis(
@@ -110,11 +584,19 @@ def run_medical_diagnosis(
     medical_history: str = "No medical history provided.",
     test_results: str = "No test results provided.",
     realtime: bool = False,
-    min_sources: int = 10
+    min_sources: int = 10,
+    model: Optional[str] = None,
+    timeout_seconds: float = 300,
+    resume_run_id: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Run the medical diagnosis workflow.
     
+    The state is checkpointed to SQLite after every node under the run id returned in the
+    result, so a run that failed or timed out can be resumed without redoing the searches
+    and LLM calls of the nodes that already completed. The checkpoints of a run are deleted
+    once it completes, and those of runs not resumed within CHECKPOINT_TTL_SECONDS are pruned.
+    
     Args:
         topic: The medical topic to research
         symptoms: Patient symptoms
@@ -122,108 +604,224 @@ def run_medical_diagnosis(
         test_results: Patient test results
         realtime: Whether to use real-time web search
         min_sources: Minimum number of sources to include in research
+        model: LLM model used by the LLM-backed agents (defaults to the provider model)
+        timeout_seconds: Time budget for the run. Work still running at the deadline is
+            aborted and the partial results gathered so far are returned.
+        resume_run_id: Run id of an earlier run to continue from its last completed node.
+            The patient inputs are taken from the checkpoint and a fresh time budget applies.
         
     Returns:
-        Dictionary with diagnosis results
+        Dictionary with diagnosis results, including the run_id
     """
+    run_id = resume_run_id or uuid.uuid4().hex
+    
     try:
-        # Setup timeout toàn cục cho các requests
-        import requests
-        from requests.adapters import HTTPAdapter
-        from urllib3.util.retry import Retry
-        
-        # Cấu hình retry và timeout cho requests
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session = requests.Session()
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
+        # Reuse the compiled graph for this configuration
+        graph = get_medical_diagnosis_graph(realtime=realtime, min_sources=min_sources, model=model, checkpointed=True)
+        config = {"configurable": {"thread_id": run_id}}
+    
+        # Define input state with the run deadline
+        start_time = time.time()
+        deadline = start_time + timeout_seconds
+        input_state = _initial_state(topic, symptoms, medical_history, test_results, min_sources, deadline=deadline)
+        partial_state = input_state
+        
+        if resume_run_id:
+            if graph.checkpointer is None:
+                raise ValueError("Cannot resume a run because checkpointing is unavailable")
+            
+            snapshot = graph.get_state(config)
+            if not snapshot.values:
+                raise ValueError(f"No checkpoint found for run {resume_run_id} (completed runs are not kept)")
+            
+            partial_state = dict(snapshot.values)
+            if not snapshot.next:
+                print(f"Run {run_id} already completed. Returning its results.")
+                delete_checkpoints(run_id)
+                partial_state["run_id"] = run_id
+                return partial_state
+            
+            # Give the remaining nodes a fresh time budget through the config and continue
+            # from the checkpoint (a state update would add a checkpoint of its own)
+            config["configurable"]["deadline"] = deadline
+            input_state = None
+            print(f"Resuming medical diagnosis run {run_id} at {', '.join(snapshot.next)}")
+        else:
+            print(f"Starting medical diagnosis for {topic} (run {run_id})")
+        if graph.checkpointer is not None:
+            _record_run(run_id)
         
-        # Không thiết lập requests.defaults.timeout vì thuộc tính này không tồn tại
-        # Thay vào đó, sử dụng timeout trong mỗi request
+        # Stream the workflow to keep the partial state. Nodes refuse to start after the
+        # deadline and every HTTP and LLM call inside a node is bounded by it.
+        try:
+            for state in graph.stream(input_state, config, stream_mode="values"):
+                partial_state = state
+        except DeadlineExceeded:
+            print(f"Medical diagnosis workflow timed out. Returning partial results (resume with run {run_id}).")
+            result = _timeout_result(partial_state)
+            result["run_id"] = run_id
+            return result
         
-        # Setup researcher agent
-        print(f"Set realtime={realtime} for ResearcherAgent with min_sources={min_sources}")
-        researcher = ResearcherAgent(realtime=realtime, min_sources=min_sources)
-        researcher.session = session  # Truyền session đã cấu hình
+        print(f"Workflow completed in {time.time() - start_time:.2f} seconds.")
+        delete_checkpoints(run_id)
+        result = dict(partial_state)
+        result["run_id"] = run_id
+        return result
         
-        # Create and run the graph
-        graph = create_medical_diagnosis_graph(researcher)
+    except Exception as e:
+        print(f"Error during diagnosis: {str(e)}")
+        result = _error_result(topic, e)
+        result["run_id"] = run_id
+        return result
+
+
+async def arun_medical_diagnosis(
+    topic: str,
+    symptoms: str = "No symptoms provided.",
+    medical_history: str = "No medical history provided.",
+    test_results: str = "No test results provided.",
+    realtime: bool = False,
+    min_sources: int = 10,
+    model: Optional[str] = None,
+    timeout_seconds: float = 300
+) -> Dict[str, Any]:
+    """
+    Run the medical diagnosis workflow asynchronously.
     
-        # Define input state
-        input_state = {
-        "topic": topic,
-        "symptoms": symptoms,
-        "medical_history": medical_history,
-        "test_results": test_results,
-            "diagnoses": [],
-            "treatments": [],
-        "research_findings": None,
-        "verified_sources": None,
-        "source_credibility": None,
-        "consensus": None,
-            "current_round": 1,
-        "max_rounds": 1,
-            "next": None,
-            "research_attempt": 0,  # Initialize research attempt counter
-            "verification_attempt": 0,  # Initialize verification attempt counter
-            "min_sources": min_sources,  # Pass minimum sources parameter
-            "lung_cancer_analysis": None  # Initialize lung cancer analysis
-        }
+    Every agent runs its async path (async LLM calls and async web search), so a single
+    event loop can serve many cases at once.
+    
+    Args:
+        topic: The medical topic to research
+        symptoms: Patient symptoms
+        medical_history: Patient medical history
+        test_results: Patient test results
+        realtime: Whether to use real-time web search
+        min_sources: Minimum number of sources to include in research
+        model: LLM model used by the LLM-backed agents (defaults to the provider model)
+        timeout_seconds: Time budget for the run. Work still running at the deadline is
+            aborted and the partial results gathered so far are returned.
+        
+    Returns:
+        Dictionary with diagnosis results
+    """
+    try:
+        graph = get_medical_diagnosis_graph(realtime=realtime, min_sources=min_sources, model=model)
+        
+        start_time = time.time()
+        deadline = start_time + timeout_seconds
+        input_state = _initial_state(topic, symptoms, medical_history, test_results, min_sources, deadline=deadline)
         
         print(f"Starting medical diagnosis for {topic}")
         
-        # Run the workflow with timeout - sử dụng threading.Timer thay vì signal
-        # vì signal.SIGALRM không được hỗ trợ trên Windows
-        import threading
-        import time
+        partial_state = input_state
+        
+        async def consume():
+            nonlocal partial_state
+            async for state in graph.astream(input_state, stream_mode="values"):
+                partial_state = state
         
-        timeout_seconds = 300  # 5 phút
-        timeout_happened = False
+        # Cancelling the stream aborts the in-flight node, including its LLM and HTTP calls
+        try:
+            await asyncio.wait_for(consume(), timeout=timeout_seconds)
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            print("Medical diagnosis workflow timed out. Returning partial results.")
+            return _timeout_result(partial_state)
+        
+        print(f"Workflow completed in {time.time() - start_time:.2f} seconds.")
+        return partial_state
+        
+    except Exception as e:
+        print(f"Error during diagnosis: {str(e)}")
+        return _error_result(topic, e)
+
+
+# Node name used for consensus token events in stream_medical_diagnosis
+CONSENSUS_TOKEN_EVENT = "consensus_token"
+
+# Node name used for expert panel opinions in stream_medical_diagnosis
+EXPERT_OPINION_EVENT = "expert_opinion"
+
+
+def _apply_node_output(state: Dict[str, Any], node_output: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply a node's update to a state the way the graph does, merging run_metrics with its reducer."""
+    updated = {**state, **node_output}
+    if "run_metrics" in node_output:
+        updated["run_metrics"] = merge_run_metrics(state.get("run_metrics"), node_output["run_metrics"])
+    return updated
+
+
+def stream_medical_diagnosis(
+    topic: str,
+    symptoms: str = "No symptoms provided.",
+    medical_history: str = "No medical history provided.",
+    test_results: str = "No test results provided.",
+    realtime: bool = False,
+    min_sources: int = 10,
+    model: Optional[str] = None,
+    timeout_seconds: float = 300,
+    stream_tokens: bool = True
+) -> Iterator[Tuple[str, Dict[str, Any], float]]:
+    """
+    Run the medical diagnosis workflow, yielding progress as each node completes.
+    
+    Args:
+        topic: The medical topic to research
+        symptoms: Patient symptoms
+        medical_history: Patient medical history
+        test_results: Patient test results
+        realtime: Whether to use real-time web search
+        min_sources: Minimum number of sources to include in research
+        model: LLM model used by the LLM-backed agents (defaults to the provider model)
+        timeout_seconds: Time budget for the run
+        stream_tokens: Whether to emit consensus tokens while the report is generated
         
-        def timeout_handler():
-            nonlocal timeout_happened
-            timeout_happened = True
-            print("Medical diagnosis workflow timed out")
+    Yields:
+        (node, partial_state, elapsed_ms) after every completed node. While the consensus is
+        generated, (CONSENSUS_TOKEN_EVENT, {"consensus_delta": text}, elapsed_ms) events carry
+        the report text as it streams in, and (EXPERT_OPINION_EVENT, {"expert_opinion": opinion},
+        elapsed_ms) events carry each expert panel opinion as it completes. The last event has
+        node END and carries the final result (partial if timed out, an error result on failure).
+    """
+    start_time = time.time()
+    state: Dict[str, Any] = {}
+    
+    def elapsed_ms() -> float:
+        return round((time.time() - start_time) * 1000, 1)
+    
+    try:
+        graph = get_medical_diagnosis_graph(realtime=realtime, min_sources=min_sources, model=model)
+        state = _initial_state(topic, symptoms, medical_history, test_results, min_sources,
+                               deadline=start_time + timeout_seconds, stream_consensus=stream_tokens)
         
-        timer = threading.Timer(timeout_seconds, timeout_handler)
+        print(f"Starting medical diagnosis for {topic}")
         
         try:
-            timer.start()
-            start_time = time.time()
-            result = graph.invoke(input_state)
-            timer.cancel()
-            
-            if timeout_happened:
-                print("Medical diagnosis workflow timed out. Returning partial results.")
-                return {
-                    "research_findings": "Diagnosis process timed out. Please try again later.",
-                    "diagnoses": ["Diagnosis could not be completed due to timeout."],
-                    "treatments": ["Treatment recommendations could not be generated."],
-                    "consensus": "The diagnosis workflow timed out before completion.",
-                    "verified_sources": [],
-                    "source_credibility": 0.0
-                }
-            
-            print(f"Workflow completed in {time.time() - start_time:.2f} seconds.")
-            return result
-            
-        finally:
-            timer.cancel()
+            for mode, chunk in graph.stream(state, stream_mode=["updates", "values", "custom"]):
+                if mode == "custom":
+                    if isinstance(chunk, dict) and "consensus_delta" in chunk:
+                        yield CONSENSUS_TOKEN_EVENT, chunk, elapsed_ms()
+                    elif isinstance(chunk, dict) and "expert_opinion" in chunk:
+                        yield EXPERT_OPINION_EVENT, chunk, elapsed_ms()
+                    continue
+                
+                if mode == "values":
+                    # The graph's own state after each step, with the reducers applied
+                    state = dict(chunk)
+                    continue
+                
+                for node, node_output in chunk.items():
+                    if node_output:
+                        state = _apply_node_output(state, node_output)
+                    yield node, dict(state), elapsed_ms()
+        except DeadlineExceeded:
+            print("Medical diagnosis workflow timed out. Returning partial results.")
+            yield END, _timeout_result(state), elapsed_ms()
+            return
+        
+        print(f"Workflow completed in {time.time() - start_time:.2f} seconds.")
+        yield END, state, elapsed_ms()
         
     except Exception as e:
         print(f"Error during diagnosis: {str(e)}")
-        return {
-            "topic": topic,
-            "error": str(e),
-            "consensus": "Unable to complete diagnosis due to technical issues.",
-            "diagnoses": [],
-            "treatments": [],
-            "research_findings": f"Error: {str(e)}",
-            "verified_sources": [],
-            "source_credibility": 0.0
-        } 
\ No newline at end of file
+        yield END, _error_result(topic, e), elapsed_ms()
@@ -3,17 +3,22 @@ Main entry point for the LangGraph implementation of the Cancer Consensus AI Age
 """
 
 import os
+import time
+import asyncio
 import argparse
 from datetime import datetime
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Optional, Iterator, AsyncIterator
 import json
 from dotenv import load_dotenv
 
-from langgraph.graph import StateGraph
+from langgraph.graph import StateGraph, END
 from langchain_core.runnables import Runnable, RunnableConfig
-from app.langraph.graph import run_medical_diagnosis
+from app.langraph.graph import run_medical_diagnosis, arun_medical_diagnosis, stream_medical_diagnosis
 from app.langraph.agents import ResearcherAgent, SourceVerifier, Diagnostician, TreatmentAdvisor, ConsensusBuilder
+from app.langraph.metrics import token_usage_totals
 from app.agents.translation_agent import translate_medical_consensus, SUPPORTED_LANGUAGES
+from app.tools.web_search import close_async_session
+from app.models.llm_client import get_llm_manager
 
 # Load environment variables
 load_dotenv()
@@ -50,7 +55,8 @@ def get_medical_diagnosis(
     medical_history: str = "No medical history provided.",
     test_results: str = "No test results provided.",
     realtime: bool = False,
-    min_sources: int = 10
+    min_sources: int = 10,
+    resume_run_id: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Get cancer diagnosis for a given topic and symptoms.
@@ -62,6 +68,7 @@ def get_medical_diagnosis(
         test_results: Cancer-related test results
         realtime: Whether to use real-time web search
         min_sources: Minimum number of sources to include in research
+        resume_run_id: Run id of a failed or timed-out run to continue instead of restarting
         
     Returns:
         Dictionary with cancer diagnosis results
@@ -74,42 +81,228 @@ def get_medical_diagnosis(
             medical_history=medical_history,
             test_results=test_results,
             realtime=realtime,
-            min_sources=min_sources
-    )
+            min_sources=min_sources,
+            resume_run_id=resume_run_id
+        )
+        return _format_diagnosis_result(topic, result, min_sources)
+    except Exception as e:
+        print(f"Error during cancer diagnosis: {str(e)}")
+        return _diagnosis_error_result(topic, e)
+
+def _format_diagnosis_result(topic: str, result: Dict[str, Any], min_sources: int) -> Dict[str, Any]:
+    """
+    Extract the cancer diagnosis results from the final workflow state.
     
-        # Extract results
-        consensus = result.get("consensus", "No cancer consensus reached.")
-        diagnoses = result.get("diagnoses", [])
-        treatments = result.get("treatments", [])
-        research_findings = result.get("research_findings", "No cancer research findings.")
-        verified_sources = result.get("verified_sources", [])
-        source_credibility = result.get("source_credibility", 0.0)
+    Args:
+        topic: Cancer type or concern that was researched
+        result: Final state of the diagnosis workflow
+        min_sources: Minimum number of sources requested
         
-        # Ensure we have enough sources
-        if verified_sources and len(verified_sources) < min_sources:
-            print(f"Warning: Only found {len(verified_sources)} sources, which is less than the minimum {min_sources}")
+    Returns:
+        Dictionary with cancer diagnosis results
+    """
+    # Extract results
+    consensus = result.get("consensus", "No cancer consensus reached.")
+    diagnoses = result.get("diagnoses", [])
+    treatments = result.get("treatments", [])
+    research_findings = result.get("research_findings", "No cancer research findings.")
+    verified_sources = result.get("verified_sources", [])
+    source_credibility = result.get("source_credibility", 0.0)
+    
+    # Ensure we have enough sources
+    if verified_sources and len(verified_sources) < min_sources:
+        print(f"Warning: Only found {len(verified_sources)} sources, which is less than the minimum {min_sources}")
+    
+    return {
+        "topic": topic,
+        "consensus": consensus,
+        "diagnoses": diagnoses,
+        "treatments": treatments,
+        "research_findings": research_findings,
+        "verified_sources": verified_sources,
+        "source_credibility": source_credibility,
+        "timed_out": result.get("timed_out", False),
+        "run_metrics": result.get("run_metrics", {}),
+        "token_usage": token_usage_totals(result.get("run_metrics")),
+        "run_id": result.get("run_id"),
+        "expert_opinions": result.get("expert_opinions"),
+        "panel_consensus": result.get("panel_consensus")
+    }
+
+def _diagnosis_error_result(topic: str, e: Exception) -> Dict[str, Any]:
+    """Result returned when a cancer diagnosis fails."""
+    return {
+        "topic": topic,
+        "error": str(e),
+        "consensus": "Could not generate a cancer consensus due to an error.",
+        "diagnoses": [],
+        "treatments": [],
+        "research_findings": "Error during cancer research.",
+        "verified_sources": [],
+        "source_credibility": 0.0
+    }
+
+async def aget_medical_diagnosis(
+    topic: str,
+    symptoms: str = "No symptoms provided.",
+    medical_history: str = "No medical history provided.",
+    test_results: str = "No test results provided.",
+    realtime: bool = False,
+    min_sources: int = 10
+) -> Dict[str, Any]:
+    """
+    Async version of get_medical_diagnosis.
+    
+    Args:
+        topic: Cancer type or concern to research
+        symptoms: Patient cancer-related symptoms
+        medical_history: Patient medical history relevant to cancer
+        test_results: Cancer-related test results
+        realtime: Whether to use real-time web search
+        min_sources: Minimum number of sources to include in research
         
-        return {
-            "topic": topic,
-            "consensus": consensus,
-            "diagnoses": diagnoses,
-            "treatments": treatments,
-            "research_findings": research_findings,
-            "verified_sources": verified_sources,
-            "source_credibility": source_credibility
-        }
+    Returns:
+        Dictionary with cancer diagnosis results
+    """
+    try:
+        result = await arun_medical_diagnosis(
+            topic=topic,
+            symptoms=symptoms,
+            medical_history=medical_history,
+            test_results=test_results,
+            realtime=realtime,
+            min_sources=min_sources
+        )
+        return _format_diagnosis_result(topic, result, min_sources)
     except Exception as e:
         print(f"Error during cancer diagnosis: {str(e)}")
-        return {
-            "topic": topic,
-            "error": str(e),
-            "consensus": "Could not generate a cancer consensus due to an error.",
-            "diagnoses": [],
-            "treatments": [],
-            "research_findings": "Error during cancer research.",
-            "verified_sources": [],
-            "source_credibility": 0.0
-        }
+        return _diagnosis_error_result(topic, e)
+
+async def aget_medical_diagnosis_batch(
+    cases: List[Dict[str, Any]],
+    max_concurrency: int = 5,
+    realtime: bool = False,
+    min_sources: int = 10,
+    requests_per_minute: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Diagnose many cases concurrently on one event loop.
+    
+    Cases share the compiled graph, its agents and the async search session. At most
+    max_concurrency cases are in flight at once, and requests_per_minute spaces out case
+    starts to stay under provider quotas. A failing case is reported in its own result and
+    does not abort the batch. The pooled clients of the running loop are left open, since
+    other work on the same loop may be using them.
+    
+    Args:
+        cases: List of cases with topic, symptoms, medical_history and test_results keys.
+            A case may also override realtime and min_sources, and carry an id.
+        max_concurrency: Maximum number of cases processed at the same time
+        realtime: Whether to use real-time web search
+        min_sources: Minimum number of sources to include in research
+        requests_per_minute: Maximum number of case starts per minute (optional)
+        
+    Yields:
+        Dictionary with cancer diagnosis results per case, in completion order
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    start_lock = asyncio.Lock()
+    start_interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+    next_start = time.monotonic()
+    
+    async def wait_for_start_slot():
+        nonlocal next_start
+        if not start_interval:
+            return
+        async with start_lock:
+            delay = next_start - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_start = max(next_start, time.monotonic()) + start_interval
+    
+    async def run_case(index: int, case: Dict[str, Any]) -> Dict[str, Any]:
+        topic = case.get("topic", "")
+        case_min_sources = case.get("min_sources", min_sources)
+        async with semaphore:
+            await wait_for_start_slot()
+            start_time = time.time()
+            try:
+                result = await arun_medical_diagnosis(
+                    topic=topic,
+                    symptoms=case.get("symptoms", "No symptoms provided."),
+                    medical_history=case.get("medical_history", "No medical history provided."),
+                    test_results=case.get("test_results", "No test results provided."),
+                    realtime=case.get("realtime", realtime),
+                    min_sources=case_min_sources
+                )
+                if "error" in result:
+                    result = _diagnosis_error_result(topic, Exception(result["error"]))
+                else:
+                    result = _format_diagnosis_result(topic, result, case_min_sources)
+            except Exception as e:
+                print(f"Error during cancer diagnosis for case {index}: {str(e)}")
+                result = _diagnosis_error_result(topic, e)
+        
+        result["case_index"] = index
+        result["case_id"] = case.get("id", index)
+        result["elapsed_seconds"] = round(time.time() - start_time, 2)
+        return result
+    
+    tasks = [asyncio.create_task(run_case(i, case)) for i, case in enumerate(cases)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # Stop outstanding cases if the consumer stops early
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def get_medical_diagnosis_batch(
+    cases: List[Dict[str, Any]],
+    max_concurrency: int = 5,
+    realtime: bool = False,
+    min_sources: int = 10,
+    requests_per_minute: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Diagnose many cases concurrently, yielding results as they complete.
+    
+    Synchronous wrapper around aget_medical_diagnosis_batch that drives a private event loop.
+    
+    Args:
+        cases: List of cases with topic, symptoms, medical_history and test_results keys
+        max_concurrency: Maximum number of cases processed at the same time
+        realtime: Whether to use real-time web search
+        min_sources: Minimum number of sources to include in research
+        requests_per_minute: Maximum number of case starts per minute (optional)
+        
+    Yields:
+        Dictionary with cancer diagnosis results per case, in completion order.
+        Failed cases contain an "error" key.
+    """
+    loop = asyncio.new_event_loop()
+    batch = aget_medical_diagnosis_batch(
+        cases,
+        max_concurrency=max_concurrency,
+        realtime=realtime,
+        min_sources=min_sources,
+        requests_per_minute=requests_per_minute
+    )
+    try:
+        while True:
+            try:
+                result = loop.run_until_complete(batch.__anext__())
+            except StopAsyncIteration:
+                break
+            yield result
+    finally:
+        loop.run_until_complete(batch.aclose())
+        # The pooled clients of the private loop cannot be reused once it is closed
+        loop.run_until_complete(close_async_session())
+        loop.run_until_complete(get_llm_manager().aclose_loop_clients())
+        loop.close()
 
 def get_medical_diagnosis_with_translation(
     topic: str,
@@ -163,6 +356,62 @@ def get_medical_diagnosis_with_translation(
     
     return result
 
+def get_medical_diagnosis_stream(
+    topic: str,
+    symptoms: str = "No symptoms provided.",
+    medical_history: str = "No medical history provided.",
+    test_results: str = "No test results provided.",
+    realtime: bool = False,
+    min_sources: int = 10,
+    target_language: str = None
+) -> Iterator[Tuple[str, Dict[str, Any], float]]:
+    """
+    Get cancer diagnosis, yielding progress events as each workflow node completes.
+    
+    Args:
+        topic: Cancer type or concern to research
+        symptoms: Patient cancer-related symptoms
+        medical_history: Patient medical history relevant to cancer
+        test_results: Cancer-related test results
+        realtime: Whether to use real-time web search
+        min_sources: Minimum number of sources to include in research
+        target_language: Target language for translation (optional)
+        
+    Yields:
+        (node, partial_state, elapsed_ms) for every completed node and consensus token events,
+        followed by (END, result, elapsed_ms) where result has the same shape as
+        get_medical_diagnosis_with_translation
+    """
+    for node, state, elapsed_ms in stream_medical_diagnosis(
+        topic=topic,
+        symptoms=symptoms,
+        medical_history=medical_history,
+        test_results=test_results,
+        realtime=realtime,
+        min_sources=min_sources
+    ):
+        if node != END:
+            yield node, state, elapsed_ms
+            continue
+        
+        if "error" in state:
+            result = _diagnosis_error_result(topic, Exception(state["error"]))
+        else:
+            result = _format_diagnosis_result(topic, state, min_sources)
+        
+        # Translate if target language is specified
+        if target_language and target_language in SUPPORTED_LANGUAGES:
+            try:
+                print(f"Attempting to translate to {target_language}...")
+                result = translate_medical_consensus(result, target_language)
+            except Exception as e:
+                print(f"Translation failed: {e}")
+                result["translation_error"] = str(e)
+        elif target_language:
+            result["translation_error"] = f"Language '{target_language}' not supported"
+        
+        yield END, result, elapsed_ms
+
 if __name__ == "__main__":
     # Example usage
     result = get_medical_diagnosis(
@@ -191,4 +440,9 @@ if __name__ == "__main__":
     print(f"\nNumber of sources: {len(result['verified_sources'])}")
     print("\nSources:")
     for i, source in enumerate(result['verified_sources']):
-        print(f"{i+1}. {source}") 
\ No newline at end of file
+        print(f"{i+1}. {source}")
+    
+    usage = result.get("token_usage")
+    if usage:
+        print(f"\nLLM tokens: {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion = "
+              f"{usage['total_tokens']} in {usage['calls']} calls ({usage['latency_seconds']}s)") 
\ No newline at end of file
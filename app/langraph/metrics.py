@@ -0,0 +1,89 @@
+"""
+Run metrics collected by the agents of the Consensus Mechanism AI Agents system.
+"""
+
+from typing import Dict, Any, Optional
+
+
+def merge_run_metrics(left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge two run metrics dictionaries.
+
+    Nested dictionaries are merged recursively and other values from right win. Merging a
+    dictionary into itself is a no-op, so nodes may return the full state safely.
+
+    Args:
+        left: Current run metrics
+        right: Run metrics reported by a node
+
+    Returns:
+        Merged run metrics
+    """
+    merged = dict(left or {})
+    for key, value in (right or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_run_metrics(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def with_metrics(state: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get the run metrics of a state extended with new values.
+
+    Args:
+        state: The current state
+        updates: Metrics to add
+
+    Returns:
+        Run metrics to store back into the state
+    """
+    return merge_run_metrics(state.get("run_metrics"), updates)
+
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    # tiktoken is missing or cannot load its encoding offline; fall back to a character estimate
+    _encoding = None
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Estimate the number of tokens of a text.
+
+    Uses the cl100k_base tokenizer when tiktoken is available, else about 4 characters per token.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated number of tokens
+    """
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def token_usage_totals(run_metrics: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Sum the LLM token usage recorded by the nodes of a run.
+
+    Args:
+        run_metrics: Run metrics of the final state
+
+    Returns:
+        Dictionary with calls, prompt_tokens, completion_tokens, total_tokens,
+        latency_seconds, estimated_calls and trimmed_tokens over all nodes
+    """
+    totals = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+              "latency_seconds": 0.0, "estimated_calls": 0, "trimmed_tokens": 0}
+    for usage in ((run_metrics or {}).get("llm_usage") or {}).values():
+        for key in totals:
+            totals[key] += usage.get(key, 0)
+    totals["latency_seconds"] = round(totals["latency_seconds"], 3)
+    return totals
@@ -0,0 +1,143 @@
+"""
+Content-addressed cache of graph node outputs for the Consensus Mechanism AI Agents system.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+
+from app.models.sqlite_cache import SQLiteTTLStore, open_with_fallback
+
+# Load environment variables
+load_dotenv()
+
+# SQLite file holding cached node outputs (":memory:" keeps them for the process only)
+NODE_CACHE_PATH = os.getenv("NODE_CACHE_PATH", "node_cache.sqlite")
+NODE_CACHE_TTL_SECONDS = float(os.getenv("NODE_CACHE_TTL_SECONDS", "86400"))
+NODE_CACHE_MAX_ENTRIES = int(os.getenv("NODE_CACHE_MAX_ENTRIES", "1000"))
+NODE_CACHE_ENABLED = os.getenv("NODE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+class NodeCache:
+    """
+    Cache of node outputs keyed by a hash of the node inputs, model, temperature and prompt version.
+
+    Entries expire after a TTL and the least recently used entries are evicted once the
+    cache holds more than max_entries. Hits and misses are counted per node.
+    """
+
+    def __init__(self, path: str = ":memory:", ttl_seconds: float = 86400, max_entries: int = 1000):
+        """
+        Initialize the node cache.
+
+        Args:
+            path: SQLite file storing the entries
+            ttl_seconds: Time after which an entry is no longer served
+            max_entries: Maximum number of entries kept
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._store = SQLiteTTLStore(path, "node_cache", ttl_seconds, max_entries=max_entries)
+
+    @staticmethod
+    def make_key(node: str, inputs: Dict[str, Any], model: str, prompt_version: str,
+                 temperature: Optional[float] = None) -> str:
+        """
+        Compute the cache key of a node call.
+
+        Args:
+            node: Name of the node
+            inputs: Input fields the node output depends on
+            model: Model producing the output
+            prompt_version: Version of the node prompt
+            temperature: Sampling temperature of the model
+
+        Returns:
+            Hex digest identifying the call
+        """
+        payload = json.dumps(
+            {"node": node, "model": model, "temperature": temperature, "prompt_version": prompt_version, "inputs": inputs},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, node: str, key: str) -> Optional[str]:
+        """
+        Get a cached node output.
+
+        Args:
+            node: Name of the node (used for the hit statistics)
+            key: Cache key from make_key
+
+        Returns:
+            Cached output, or None on a miss or expired entry
+        """
+        value = self._store.get(key)
+        with self._lock:
+            stats = self._stats.setdefault(node, {"hits": 0, "misses": 0})
+            stats["misses" if value is None else "hits"] += 1
+        return value
+
+    def set(self, node: str, key: str, value: str) -> None:
+        """
+        Store a node output, evicting the least recently used entries if the cache is full.
+
+        Args:
+            node: Name of the node
+            key: Cache key from make_key
+            value: Output to store
+        """
+        self._store.set(key, value)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the hit statistics of every node.
+
+        Returns:
+            Dictionary mapping node names to hits, misses and hit_rate
+        """
+        with self._lock:
+            result = {}
+            for node, stats in self._stats.items():
+                lookups = stats["hits"] + stats["misses"]
+                result[node] = {
+                    **stats,
+                    "hit_rate": round(stats["hits"] / lookups, 3) if lookups else 0.0
+                }
+            return result
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        self._store.clear()
+        with self._lock:
+            self._stats.clear()
+
+
+_node_cache: Optional[NodeCache] = None
+_node_cache_lock = threading.Lock()
+
+
+def get_node_cache() -> Optional[NodeCache]:
+    """
+    Get the process-wide node cache.
+
+    Returns:
+        NodeCache configured from the environment, or None if node caching is disabled
+    """
+    global _node_cache
+    if not NODE_CACHE_ENABLED:
+        return None
+
+    with _node_cache_lock:
+        if _node_cache is None:
+            _node_cache = open_with_fallback(
+                lambda path: NodeCache(path, NODE_CACHE_TTL_SECONDS, NODE_CACHE_MAX_ENTRIES), NODE_CACHE_PATH, "node cache"
+            )
+    return _node_cache
@@ -0,0 +1,327 @@
+"""
+Semantic cache of graph node outputs for near-duplicate clinical prompts.
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional, Callable
+import numpy as np
+from dotenv import load_dotenv
+
+from app.models.embedding_store import get_embedding_store
+
+# Load environment variables
+load_dotenv()
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+# "auto" uses the IO.net Intelligence embeddings if a key is set, else disables the cache;
+# "local" loads a sentence-transformers model (downloaded on first use)
+SEMANTIC_CACHE_EMBEDDER = os.getenv("SEMANTIC_CACHE_EMBEDDER", "auto")
+SEMANTIC_CACHE_LOCAL_MODEL = os.getenv("SEMANTIC_CACHE_LOCAL_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+# Minimum cosine similarity for reusing an output, per node. Nodes without a threshold are not cached.
+DEFAULT_SIMILARITY_THRESHOLDS = {
+    "diagnose": 0.97,
+    "recommend_treatment": 0.97,
+    "build_consensus": 0.98
+}
+
+# Patient-specific inputs compared by embedding similarity. Every other input (test results
+# and retrieved evidence such as findings, sources and earlier node outputs) must match exactly.
+EMBEDDED_FIELDS = ("topic", "symptoms", "medical_history")
+
+STAGING_PATTERN = re.compile(
+    r"\b(stage\s+[0IV]+[ABC]?[0-9]?|c?T[0-4][abc]?|N[0-3][abc]?|M[01][abc]?|limited|extensive)\b",
+    re.IGNORECASE
+)
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _parse_thresholds(value: str) -> Dict[str, float]:
+    """Parse thresholds written as "node=0.97,node=0.98"."""
+    thresholds = dict(DEFAULT_SIMILARITY_THRESHOLDS)
+    for item in value.split(","):
+        if "=" in item:
+            node, threshold = item.split("=", 1)
+            thresholds[node.strip()] = float(threshold)
+    return thresholds
+
+
+SIMILARITY_THRESHOLDS = _parse_thresholds(os.getenv("SEMANTIC_CACHE_THRESHOLDS", ""))
+
+
+def _normalize(text: Any) -> str:
+    """Collapse case and whitespace so trivial formatting differences do not matter."""
+    return " ".join(str(text or "").lower().split())
+
+
+def guard_key(node: str, inputs: Dict[str, Any], model: str, prompt_version: str,
+              temperature: Optional[float] = None) -> str:
+    """
+    Compute the part of a node call that must match exactly before an output is reused.
+
+    Besides the node, model, temperature and prompt version, this covers every input that is not embedded
+    (test results and the evidence, which would otherwise dominate the embedding) and every
+    staging term (stage, TNM categories) and number in the embedded patient fields, so an
+    answer is never reused across different evidence, test results or staging data.
+
+    Args:
+        node: Name of the node
+        inputs: Prompt inputs of the node
+        model: Model producing the output
+        prompt_version: Version of the node prompt
+        temperature: Sampling temperature of the model
+
+    Returns:
+        Hex digest of the guarded fields
+    """
+    patient_text = " ".join(str(inputs[field]) for field in EMBEDDED_FIELDS if field in inputs)
+    guard = {
+        "node": node,
+        "model": model,
+        "temperature": temperature,
+        "prompt_version": prompt_version,
+        "exact": {field: _normalize(value) for field, value in inputs.items() if field not in EMBEDDED_FIELDS},
+        "staging": sorted({term.lower() for term in STAGING_PATTERN.findall(patient_text)}),
+        "numbers": sorted(set(NUMBER_PATTERN.findall(patient_text)))
+    }
+    return hashlib.sha256(json.dumps(guard, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def embedding_text(inputs: Dict[str, Any]) -> str:
+    """Text embedded for a node call: only the patient fields, so patient differences are not drowned out."""
+    return "\n".join(f"{field}: {_normalize(inputs[field])}" for field in EMBEDDED_FIELDS if field in inputs)
+
+
+class SemanticCache:
+    """
+    Cache of node outputs looked up by embedding similarity of the node inputs.
+
+    Entries are partitioned by guard key and each partition keeps a matrix of normalized
+    embeddings, so a lookup is one matrix-vector product over the candidates that share
+    the guarded fields.
+    """
+
+    def __init__(self, embed: Callable[[str], List[float]], max_entries: int = 1000):
+        """
+        Initialize the semantic cache.
+
+        Args:
+            embed: Function returning the embedding of a text
+            max_entries: Maximum number of entries kept (oldest are evicted first)
+        """
+        self.embed = embed
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._outputs: Dict[str, List[str]] = {}
+        self._order: List[str] = []
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed and normalize a text, or None if the embedder failed."""
+        try:
+            vector = np.asarray(self.embed(text), dtype=np.float32)
+        except Exception as e:
+            print(f"Warning: Semantic cache embedding failed: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        if vector.ndim != 1 or not vector.size or norm == 0:
+            return None
+        return vector / norm
+
+    def lookup(self, node: str, inputs: Dict[str, Any], model: str, prompt_version: str,
+               temperature: Optional[float] = None) -> Optional[str]:
+        """
+        Find the output of a near-duplicate node call.
+
+        Args:
+            node: Name of the node
+            inputs: Prompt inputs of the node
+            model: Model producing the output
+            prompt_version: Version of the node prompt
+            temperature: Sampling temperature of the model
+
+        Returns:
+            Cached output of the most similar call above the node threshold, or None
+        """
+        threshold = SIMILARITY_THRESHOLDS.get(node)
+        if threshold is None:
+            return None
+
+        guard = guard_key(node, inputs, model, prompt_version, temperature)
+        with self._lock:
+            candidates = self._vectors.get(guard)
+        if candidates is None:
+            self._count_miss(node)
+            return None
+
+        query = self._embed(embedding_text(inputs))
+        if query is None:
+            self._count_miss(node)
+            return None
+
+        with self._lock:
+            stats = self._stats.setdefault(node, {"hits": 0, "misses": 0})
+            candidates = self._vectors.get(guard)
+            if candidates is None or candidates.shape[1] != query.shape[0]:
+                stats["misses"] += 1
+                return None
+            similarities = candidates @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < threshold:
+                stats["misses"] += 1
+                return None
+            stats["hits"] += 1
+            print(f"Semantic cache hit for {node} (similarity {similarities[best]:.3f})")
+            return self._outputs[guard][best]
+
+    def _count_miss(self, node: str) -> None:
+        """Count a missed lookup of a node."""
+        with self._lock:
+            self._stats.setdefault(node, {"hits": 0, "misses": 0})["misses"] += 1
+
+    def store(self, node: str, inputs: Dict[str, Any], model: str, prompt_version: str, output: str,
+              temperature: Optional[float] = None) -> None:
+        """
+        Store the output of a node call.
+
+        Args:
+            node: Name of the node
+            inputs: Prompt inputs of the node
+            model: Model producing the output
+            prompt_version: Version of the node prompt
+            output: Output to store
+            temperature: Sampling temperature of the model
+        """
+        if node not in SIMILARITY_THRESHOLDS or not output:
+            return
+
+        vector = self._embed(embedding_text(inputs))
+        if vector is None:
+            return
+
+        guard = guard_key(node, inputs, model, prompt_version, temperature)
+        with self._lock:
+            vectors = self._vectors.get(guard)
+            if vectors is not None and vectors.shape[1] != vector.shape[0]:
+                # The embedder changed; drop entries of the old dimension
+                vectors = None
+                self._outputs[guard] = []
+                self._order = [key for key in self._order if key != guard]
+            self._vectors[guard] = vector[np.newaxis, :] if vectors is None else np.vstack([vectors, vector])
+            self._outputs.setdefault(guard, []).append(output)
+            self._order.append(guard)
+
+            while len(self._order) > self.max_entries:
+                self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        """Remove the oldest entry (its partition stores entries in insertion order)."""
+        guard = self._order.pop(0)
+        self._vectors[guard] = self._vectors[guard][1:]
+        self._outputs[guard].pop(0)
+        if not self._outputs[guard]:
+            del self._vectors[guard]
+            del self._outputs[guard]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the hit statistics of every node.
+
+        Returns:
+            Dictionary mapping node names to hits, misses and hit_rate
+        """
+        with self._lock:
+            snapshot = {node: dict(stats) for node, stats in self._stats.items()}
+        result = {}
+        for node, stats in snapshot.items():
+            lookups = stats["hits"] + stats["misses"]
+            result[node] = {**stats, "hit_rate": round(stats["hits"] / lookups, 3) if lookups else 0.0}
+        return result
+
+
+def _create_embedder() -> Optional[Callable[[str], List[float]]]:
+    """
+    Create the embedding function configured by SEMANTIC_CACHE_EMBEDDER.
+
+    Returns:
+        Embedding function, or None if no embedder is available
+    """
+    embedder = SEMANTIC_CACHE_EMBEDDER.lower()
+    if embedder in ("auto", "iointelligence") and os.getenv("IOINTELLIGENCE_API_KEY"):
+        from app.models.llm_client import IOIntelligenceClient, DEFAULT_EMBEDDING_MODEL
+        client = IOIntelligenceClient()
+        print("Semantic cache: using IO.net Intelligence embeddings")
+        return _stored_embedder(client.get_embeddings, f"iointelligence-{DEFAULT_EMBEDDING_MODEL}")
+
+    if embedder == "local":
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            print("Warning: sentence-transformers not available. Semantic cache is disabled.")
+            return None
+        model = SentenceTransformer(SEMANTIC_CACHE_LOCAL_MODEL)
+        print(f"Semantic cache: using local embeddings ({SEMANTIC_CACHE_LOCAL_MODEL})")
+        return _stored_embedder(lambda texts: model.encode(texts), f"local-{SEMANTIC_CACHE_LOCAL_MODEL}")
+
+    print("Warning: No embedder for the semantic cache (set IOINTELLIGENCE_API_KEY or SEMANTIC_CACHE_EMBEDDER=local). "
+          "Semantic cache is disabled.")
+    return None
+
+
+def _stored_embedder(embed_many: Callable[[List[str]], Any], name: str) -> Callable[[str], Any]:
+    """
+    Turn a batch embedding function into a single-text embedder backed by the embedding store.
+
+    Texts embedded before, by this or another process, are read from the store instead
+    of being embedded again.
+
+    Args:
+        embed_many: Function returning the embedding matrix of a list of texts
+        name: Embedding store name (one per embedding model)
+
+    Returns:
+        Function returning the embedding of a text
+    """
+    try:
+        store = get_embedding_store(name)
+    except Exception as e:
+        print(f"Warning: Could not open embedding store {name}: {e}")
+        store = None
+    if store is None:
+        return lambda text: np.asarray(embed_many([text]), dtype=np.float32)[0]
+    return lambda text: store.embed([text], embed_many)[0]
+
+
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_initialized = False
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Get the process-wide semantic cache.
+
+    Returns:
+        SemanticCache, or None if semantic caching is disabled or no embedder is available
+    """
+    global _semantic_cache, _semantic_cache_initialized
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+
+    with _semantic_cache_lock:
+        if not _semantic_cache_initialized:
+            _semantic_cache_initialized = True
+            try:
+                embed = _create_embedder()
+            except Exception as e:
+                print(f"Warning: Could not create semantic cache embedder: {e}")
+                embed = None
+            if embed is not None:
+                _semantic_cache = SemanticCache(embed, SEMANTIC_CACHE_MAX_ENTRIES)
+    return _semantic_cache
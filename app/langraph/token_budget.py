@@ -0,0 +1,126 @@
+"""
+Per-agent token budgets of the prompt inputs.
+"""
+
+import os
+from typing import Dict, Any, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.langraph.metrics import estimate_tokens
+from app.models.token_usage import TokenUsage
+
+# Load environment variables
+load_dotenv()
+
+# Marker left where content was cut to fit a budget
+TRIM_MARKER = "[... trimmed to fit the token budget]"
+
+
+def _parse_budgets(value: str) -> Dict[str, int]:
+    """Parse budgets written as "node=tokens,node=tokens"."""
+    budgets = {}
+    for item in value.split(","):
+        if "=" in item:
+            node, tokens = item.split("=", 1)
+            budgets[node.strip()] = int(tokens)
+    return budgets
+
+
+# Maximum tokens of the inputs filled into each agent's prompt (0 or unset: unlimited)
+AGENT_INPUT_BUDGET = int(os.getenv("AGENT_INPUT_BUDGET", "0"))
+AGENT_INPUT_BUDGETS = _parse_budgets(os.getenv("AGENT_INPUT_BUDGETS", ""))
+
+
+def input_budget(node: str) -> Optional[int]:
+    """
+    Get the input token budget of a node.
+
+    Args:
+        node: Name of the node
+
+    Returns:
+        Budget in tokens, or None if the node's inputs are not limited
+    """
+    budget = AGENT_INPUT_BUDGETS.get(node, AGENT_INPUT_BUDGET)
+    return budget if budget > 0 else None
+
+
+def _trim_text(text: str, max_tokens: int) -> str:
+    """Keep the leading lines of a text that fit in max_tokens, cutting the last line at a word if needed."""
+    if max_tokens <= estimate_tokens(TRIM_MARKER):
+        return ""
+    max_tokens -= estimate_tokens(TRIM_MARKER) + 1
+    lines = text.splitlines()
+
+    # Largest number of leading lines that fits
+    low, high = 0, len(lines)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens("\n".join(lines[:middle])) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    kept = "\n".join(lines[:low])
+
+    # Fill the rest of the budget with the words of the next line
+    if low < len(lines):
+        words = lines[low].split(" ")
+        low_words, high_words = 0, len(words)
+        while low_words < high_words:
+            middle = (low_words + high_words + 1) // 2
+            candidate = f"{kept}\n{' '.join(words[:middle])}" if kept else " ".join(words[:middle])
+            if estimate_tokens(candidate) <= max_tokens:
+                low_words = middle
+            else:
+                high_words = middle - 1
+        if low_words:
+            partial = " ".join(words[:low_words])
+            kept = f"{kept}\n{partial}" if kept else partial
+
+    return f"{kept}\n{TRIM_MARKER}" if kept else TRIM_MARKER
+
+
+def fit_to_budget(node: str, inputs: Dict[str, Any], trim_order: List[str],
+                  usage: Optional[TokenUsage] = None) -> Dict[str, Any]:
+    """
+    Trim the prompt inputs of a node to its token budget.
+
+    Inputs are trimmed in trim_order, lowest priority first, each one only as much as
+    needed: the end of a text is cut first, since the research digest and findings list
+    their most relevant sources first. Inputs missing from trim_order are never trimmed.
+
+    Args:
+        node: Name of the node
+        inputs: Prompt inputs
+        trim_order: Names of the inputs that may be trimmed, lowest priority first
+        usage: Token usage of the node, credited with the trimmed tokens
+
+    Returns:
+        Inputs fitting the budget (the same dictionary if no trimming was needed)
+    """
+    budget = input_budget(node)
+    if budget is None:
+        return inputs
+
+    sizes = {key: estimate_tokens(value) if isinstance(value, str) else 0 for key, value in inputs.items()}
+    excess = sum(sizes.values()) - budget
+    if excess <= 0:
+        return inputs
+
+    trimmed_inputs = dict(inputs)
+    trimmed = []
+    for key in trim_order:
+        if excess <= 0:
+            break
+        if not sizes.get(key):
+            continue
+        text = _trim_text(trimmed_inputs[key], max(0, sizes[key] - excess))
+        excess -= sizes[key] - estimate_tokens(text)
+        trimmed_inputs[key] = text
+        trimmed.append(key)
+
+    saved = sum(sizes.values()) - sum(estimate_tokens(value) if isinstance(value, str) else 0 for value in trimmed_inputs.values())
+    print(f"Trimmed {saved} tokens of {', '.join(trimmed)} to fit the {budget}-token input budget of {node}")
+    if usage is not None:
+        usage.record_trim(saved)
+    return trimmed_inputs
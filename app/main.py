@@ -9,11 +9,18 @@ import warnings
 from datetime import datetime
 
 from app.langraph.graph import run_medical_diagnosis
+from app.langraph.node_cache import get_node_cache
+from app.langraph.semantic_cache import get_semantic_cache
+from app.langraph.metrics import token_usage_totals
+from app.models.llm_cache import get_llm_cache
+from app.tools.single_flight import single_flight_stats
+from app.tools.rate_limiter import rate_limiter_stats
+from app.models.llm_router import get_llm_router
 
 # Ignore warnings from pysbd (sentence boundary detection library)
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
-def run(topic, symptoms=None, medical_history=None, test_results=None):
+def run(topic, symptoms=None, medical_history=None, test_results=None, resume_run_id=None):
     """
     Run the Medical Diagnosis System with the given inputs.
     
@@ -22,6 +29,7 @@ def run(topic, symptoms=None, medical_history=None, test_results=None):
         symptoms: Patient symptoms (optional)
         medical_history: Patient medical history (optional)
         test_results: Patient test results (optional)
+        resume_run_id: Run id of a failed or timed-out run to resume (optional)
         
     Returns:
         The results from the system execution
@@ -32,7 +40,8 @@ def run(topic, symptoms=None, medical_history=None, test_results=None):
             topic=topic,
             symptoms=symptoms or "No symptoms provided.",
             medical_history=medical_history or "No medical history provided.",
-            test_results=test_results or "No test results provided."
+            test_results=test_results or "No test results provided.",
+            resume_run_id=resume_run_id
         )
         return results
     except Exception as e:
@@ -108,6 +117,12 @@ def main():
         default=None
     )
     
+    parser.add_argument(
+        "--resume", "-r",
+        help="Run id of a failed or timed-out run to resume from its last completed node",
+        default=None
+    )
+    
     args = parser.parse_args()
     
     # Run the medical diagnosis workflow
@@ -116,13 +131,67 @@ def main():
         topic=args.topic,
         symptoms=args.symptoms,
         medical_history=args.medical_history,
-        test_results=args.test_results
+        test_results=args.test_results,
+        resume_run_id=args.resume
     )
     
     # Save the results
     filename = save_results(results, args.topic)
     
     print(f"\nResults saved to {filename}")
+    if results.get("run_id"):
+        print(f"Run id: {results['run_id']}")
+    
+    node_cache = get_node_cache()
+    if node_cache is not None:
+        for node, stats in node_cache.stats().items():
+            print(f"Node cache {node}: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+    
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        for node, stats in semantic_cache.stats().items():
+            print(f"Semantic cache {node}: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+    
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        stats = llm_cache.stats()
+        print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), "
+              f"{stats['entries']} entries, {stats['bytes'] / 1024:.0f} KB")
+    
+    for name, stats in single_flight_stats().items():
+        if stats["coalesced"]:
+            print(f"Coalesced {name}: {stats['coalesced']} of {stats['calls']} calls shared an in-flight request")
+    
+    for provider, stats in rate_limiter_stats().items():
+        if stats["throttled"] or stats["rate_limited"]:
+            print(f"Rate limiter {provider}: {stats['throttled']} of {stats['requests']} requests throttled "
+                  f"({stats['wait_seconds']}s), {stats['rate_limited']} rate limited, now {stats['rate']} req/s")
+    
+    for endpoint, stats in get_llm_router().stats().items():
+        print(f"LLM endpoint {endpoint}: {stats['calls']} calls, {stats['error_rate']:.0%} recent errors, "
+              f"median latency {stats['median_latency']}s{' (circuit open)' if stats['circuit_open'] else ''}")
+    for node, usage in results.get("run_metrics", {}).get("llm_usage", {}).items():
+        trimmed_note = f", {usage['trimmed_tokens']} input tokens trimmed" if usage.get("trimmed_tokens") else ""
+        print(f"LLM tokens {node}: {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion "
+              f"in {usage['calls']} calls ({usage['latency_seconds']}s){trimmed_note}")
+    usage = token_usage_totals(results.get("run_metrics"))
+    if usage["calls"]:
+        estimated_note = f", {usage['estimated_calls']} calls estimated" if usage["estimated_calls"] else ""
+        print(f"LLM tokens total: {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion = "
+              f"{usage['total_tokens']} in {usage['calls']} calls ({usage['latency_seconds']}s){estimated_note}")
+    digest = results.get("run_metrics", {}).get("research_digest")
+    if digest:
+        print(f"Research digest: {digest['sources_kept']} of {digest['sources_in']} sources, "
+              f"{digest['digest_tokens']} instead of {digest['findings_tokens']} tokens per prompt, "
+              f"~{digest['tokens_saved']} prompt tokens saved")
+    for node, route in results.get("run_metrics", {}).get("llm_routing", {}).items():
+        hedge = route.get("hedge")
+        hedge_note = f" (hedged to {hedge['endpoint']} after {hedge['after_seconds']}s)" if hedge else ""
+        print(f"Routed {node} to {route.get('served_by')}{hedge_note}")
+    hedge_stats = get_llm_router().hedge_stats()
+    if hedge_stats["hedges"]:
+        print(f"Hedged LLM requests: {hedge_stats['hedges']} of {hedge_stats['calls']} calls, "
+              f"{hedge_stats['hedge_wins']} won by the hedge")
     
     # Print the consensus
     print("\n=== CONSENSUS ===\n")
@@ -0,0 +1,412 @@
+"""
+Persistent embedding store backed by a memory-mapped NumPy matrix.
+"""
+
+import os
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Callable, Iterator
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+EMBEDDING_STORE_ENABLED = os.getenv("EMBEDDING_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "embedding_store")
+# float32, or float16 to halve the file and page cache size at a small precision cost
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float32")
+
+# Rows allocated when the vector file is created; it doubles whenever it is full
+INITIAL_CAPACITY = 1024
+# Rows scored per matrix-vector product in search, bounding the float32 copy of float16 rows
+SEARCH_CHUNK_ROWS = 65536
+# Maximum number of parameters bound in one SQLite query
+SQLITE_BATCH = 500
+
+
+def content_hash(text: str) -> str:
+    """
+    Hash of a text identifying identical contents.
+
+    Args:
+        text: Embedded text
+
+    Returns:
+        Hex SHA-256 digest of the UTF-8 text
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Embeddings stored in a memory-mapped matrix with a key to row index.
+
+    The vectors live in one float32 or float16 file mapped with np.memmap, so every
+    process opening the same directory shares one copy in the page cache and reads
+    rows without copying. The SQLite index maps keys and content hashes to rows:
+    identical texts share one row, and appends are serialized across processes by a
+    write transaction, so readers only ever see rows whose vectors are fully written.
+    Vectors are normalized on insert, so cosine similarity is a dot product.
+    """
+
+    def __init__(self, path: str, dtype: str = "float32"):
+        """
+        Open or create an embedding store.
+
+        Args:
+            path: Directory of the store
+            dtype: Storage type of new stores, "float32" or "float16" (existing stores
+                keep the type they were created with)
+        """
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported embedding store dtype: {dtype}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "appended": 0, "deduplicated": 0}
+
+        self._connection = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False,
+                                           isolation_level=None, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS keys_row ON keys (row)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS contents (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._connection.execute("INSERT OR IGNORE INTO meta VALUES ('dtype', ?)", (dtype,))
+
+        meta = self._meta()
+        self.dtype = np.dtype(meta["dtype"])
+        self.dim: Optional[int] = None
+        self._rows = 0
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._refresh(meta)
+
+    def _meta(self) -> Dict[str, str]:
+        """Read the store metadata."""
+        return dict(self._connection.execute("SELECT name, value FROM meta").fetchall())
+
+    def _vector_file(self) -> str:
+        """Path of the vector file."""
+        return os.path.join(self.path, f"vectors.{self.dtype.name}")
+
+    def _refresh(self, meta: Optional[Dict[str, str]] = None) -> None:
+        """Pick up rows appended by other processes, remapping the file if it grew. Call with the lock held."""
+        meta = meta if meta is not None else self._meta()
+        if "dim" not in meta:
+            return
+        self.dim = int(meta["dim"])
+        self._rows = int(meta["rows"])
+        capacity = int(meta["capacity"])
+        if capacity != self._capacity:
+            self._vectors = np.memmap(self._vector_file(), dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+            self._capacity = capacity
+
+    @contextmanager
+    def _write_transaction(self) -> Iterator[None]:
+        """Hold the cross-process write lock of the store. Call with the lock held."""
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._refresh()
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        else:
+            self._connection.execute("COMMIT")
+
+    def _reserve(self, count: int, dim: int) -> None:
+        """Make room for count more rows. Call within a write transaction."""
+        if self.dim is None:
+            self.dim = dim
+            self._connection.execute("INSERT INTO meta VALUES ('dim', ?), ('rows', '0'), ('capacity', '0')", (str(dim),))
+        elif dim != self.dim:
+            raise ValueError(f"Embedding dimension {dim} does not match the store dimension {self.dim}")
+
+        needed = self._rows + count
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2, INITIAL_CAPACITY)
+        with open(self._vector_file(), "ab") as vector_file:
+            vector_file.truncate(capacity * self.dim * self.dtype.itemsize)
+        self._connection.execute("UPDATE meta SET value = ? WHERE name = 'capacity'", (str(capacity),))
+        self._vectors = np.memmap(self._vector_file(), dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def _lookup(self, table: str, column: str, values: Sequence[str]) -> Dict[str, int]:
+        """Get the rows of keys or content hashes. Call with the lock held."""
+        rows = {}
+        for start in range(0, len(values), SQLITE_BATCH):
+            batch = list(values[start:start + SQLITE_BATCH])
+            placeholders = ",".join("?" * len(batch))
+            rows.update(self._connection.execute(
+                f"SELECT {column}, row FROM {table} WHERE {column} IN ({placeholders})", batch
+            ).fetchall())
+        return rows
+
+    def add(self, key: str, text: str, vector: Sequence[float]) -> int:
+        """
+        Store the embedding of a text under a key.
+
+        Args:
+            key: Key of the embedding (an existing key is repointed)
+            text: Embedded text, used to share one row among identical texts
+            vector: Embedding of the text
+
+        Returns:
+            Row of the embedding
+        """
+        return self.add_many([key], [text], np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+
+    def add_many(self, keys: Sequence[str], texts: Sequence[str], vectors: Any) -> List[int]:
+        """
+        Store the embeddings of many texts in one append.
+
+        Texts already stored (by content hash) are not appended again; their keys point
+        to the existing row.
+
+        Args:
+            keys: Keys of the embeddings
+            texts: Embedded texts
+            vectors: Matrix with one embedding per text
+
+        Returns:
+            Row of each embedding
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(keys) != len(texts) or vectors.ndim != 2 or vectors.shape[0] != len(texts):
+            raise ValueError("add_many needs one key, one text and one vector row per embedding")
+        if not len(keys):
+            return []
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        hashes = [content_hash(text) for text in texts]
+
+        with self._lock, self._write_transaction():
+            rows = self._lookup("contents", "hash", list(dict.fromkeys(hashes)))
+            new = {}
+            for index, text_hash in enumerate(hashes):
+                if text_hash not in rows and text_hash not in new:
+                    new[text_hash] = index
+            self._stats["deduplicated"] += len(hashes) - len(new)
+
+            if new:
+                self._reserve(len(new), vectors.shape[1])
+                start = self._rows
+                self._vectors[start:start + len(new)] = vectors[list(new.values())]
+                self._vectors.flush()
+                for offset, text_hash in enumerate(new):
+                    rows[text_hash] = start + offset
+                self._connection.executemany("INSERT INTO contents VALUES (?, ?)", [(h, rows[h]) for h in new])
+                self._rows = start + len(new)
+                self._connection.execute("UPDATE meta SET value = ? WHERE name = 'rows'", (str(self._rows),))
+                self._stats["appended"] += len(new)
+
+            result = [rows[text_hash] for text_hash in hashes]
+            self._connection.executemany("INSERT OR REPLACE INTO keys VALUES (?, ?)", list(zip(keys, result)))
+        return result
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Get the embedding stored under a key.
+
+        Args:
+            key: Key of the embedding
+
+        Returns:
+            Read-only view of the normalized embedding (no copy), or None if the key is unknown
+        """
+        with self._lock:
+            row = self._lookup("keys", "key", [key]).get(key)
+            return self._row(row)
+
+    def get_text(self, text: str) -> Optional[np.ndarray]:
+        """
+        Get the embedding of a text stored under any key.
+
+        Args:
+            text: Embedded text
+
+        Returns:
+            Read-only view of the normalized embedding (no copy), or None if the text is not stored
+        """
+        text_hash = content_hash(text)
+        with self._lock:
+            row = self._lookup("contents", "hash", [text_hash]).get(text_hash)
+            return self._row(row)
+
+    def _row(self, row: Optional[int]) -> Optional[np.ndarray]:
+        """Read-only view of a row, counting the hit or miss. Call with the lock held."""
+        if row is None:
+            self._stats["misses"] += 1
+            return None
+        if row >= self._rows:
+            self._refresh()
+        self._stats["hits"] += 1
+        view = self._vectors[row]
+        view.flags.writeable = False
+        return view
+
+    def embed(self, texts: Sequence[str], embed_many: Callable[[List[str]], Any]) -> np.ndarray:
+        """
+        Get the embeddings of texts, embedding only the texts not stored yet.
+
+        New embeddings are stored under their content hash.
+
+        Args:
+            texts: Texts to embed
+            embed_many: Function returning the embedding matrix of a list of texts
+
+        Returns:
+            float32 matrix of the normalized embeddings, one row per text
+        """
+        hashes = [content_hash(text) for text in texts]
+        with self._lock:
+            self._refresh()
+            rows = self._lookup("contents", "hash", list(dict.fromkeys(hashes)))
+        missing = list(dict.fromkeys(text for text, text_hash in zip(texts, hashes) if text_hash not in rows))
+        with self._lock:
+            self._stats["hits"] += len(texts) - len(missing)
+            self._stats["misses"] += len(missing)
+        if missing:
+            vectors = np.asarray(embed_many(missing), dtype=np.float32)
+            # Texts that failed to embed (zero rows) are not stored
+            embedded = [index for index in range(len(missing))
+                        if vectors.ndim == 2 and vectors.shape[1] and vectors[index].any()]
+            if embedded:
+                texts_embedded = [missing[index] for index in embedded]
+                text_hashes = [content_hash(text) for text in texts_embedded]
+                new_rows = self.add_many(text_hashes, texts_embedded, vectors[embedded])
+                rows.update(zip(text_hashes, new_rows))
+
+        with self._lock:
+            if self.dim is None:
+                return np.zeros((len(texts), 0), dtype=np.float32)
+            matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+            found = [(index, rows[text_hash]) for index, text_hash in enumerate(hashes) if text_hash in rows]
+            if found:
+                indices, store_rows = zip(*found)
+                matrix[list(indices)] = self._vectors[list(store_rows)]
+            return matrix
+
+    def vectors(self) -> np.ndarray:
+        """
+        Get all stored embeddings.
+
+        Returns:
+            Read-only view of the (rows, dim) matrix (no copy)
+        """
+        with self._lock:
+            self._refresh()
+            if self._vectors is None:
+                return np.zeros((0, 0), dtype=self.dtype)
+            view = self._vectors[:self._rows]
+            view.flags.writeable = False
+            return view
+
+    def search(self, query: Sequence[float], k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Find the embeddings most similar to a query.
+
+        Args:
+            query: Query embedding
+            k: Number of results
+
+        Returns:
+            List of (key, cosine similarity), most similar first. Rows stored under several
+            keys are returned once, under their first key.
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        matrix = self.vectors()
+        if norm == 0 or not matrix.shape[0] or k <= 0:
+            return []
+        if query.shape[0] != matrix.shape[1]:
+            raise ValueError(f"Query dimension {query.shape[0]} does not match the store dimension {matrix.shape[1]}")
+        query = query / norm
+
+        scores = np.empty(matrix.shape[0], dtype=np.float32)
+        for start in range(0, matrix.shape[0], SEARCH_CHUNK_ROWS):
+            chunk = matrix[start:start + SEARCH_CHUNK_ROWS]
+            scores[start:start + len(chunk)] = chunk.astype(np.float32, copy=False) @ query
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        with self._lock:
+            keys = {}
+            rows = [int(row) for row in top]
+            for start in range(0, len(rows), SQLITE_BATCH):
+                batch = rows[start:start + SQLITE_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                keys.update(self._connection.execute(
+                    f"SELECT row, MIN(key) FROM keys WHERE row IN ({placeholders}) GROUP BY row", batch
+                ).fetchall())
+        return [(keys[row], float(scores[row])) for row in rows if row in keys]
+
+    def __len__(self) -> int:
+        """Number of stored embeddings (distinct texts)."""
+        with self._lock:
+            self._refresh()
+            return self._rows
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the store counters.
+
+        Returns:
+            Dictionary with hits, misses, appended, deduplicated, rows, dim and dtype
+        """
+        with self._lock:
+            return {**self._stats, "rows": self._rows, "dim": self.dim, "dtype": self.dtype.name}
+
+    def close(self) -> None:
+        """Flush the vectors and close the index."""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._connection.close()
+
+
+_embedding_stores: Dict[str, EmbeddingStore] = {}
+_embedding_stores_lock = threading.Lock()
+
+
+def get_embedding_store(name: str) -> Optional[EmbeddingStore]:
+    """
+    Get the process-wide embedding store of a name.
+
+    Embeddings of different models must use different names.
+
+    Args:
+        name: Name of the store, e.g. the embedding model (used as directory name)
+
+    Returns:
+        EmbeddingStore under EMBEDDING_STORE_DIR, or None if the store is disabled
+    """
+    if not EMBEDDING_STORE_ENABLED:
+        return None
+
+    directory = "".join(char if char.isalnum() or char in "-_." else "_" for char in name)
+    with _embedding_stores_lock:
+        store = _embedding_stores.get(directory)
+        if store is None:
+            store = EmbeddingStore(os.path.join(EMBEDDING_STORE_DIR, directory), EMBEDDING_STORE_DTYPE)
+            _embedding_stores[directory] = store
+        return store
+
+
+def embedding_store_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get the counters of every open embedding store.
+
+    Returns:
+        Dictionary mapping store names to their statistics
+    """
+    with _embedding_stores_lock:
+        stores = dict(_embedding_stores)
+    return {name: store.stats() for name, store in stores.items()}
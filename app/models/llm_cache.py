@@ -0,0 +1,194 @@
+"""
+Persistent on-disk cache of LLM responses.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Sequence, Iterator
+from dotenv import load_dotenv
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+from app.models.sqlite_cache import SQLiteTTLStore, open_with_fallback
+
+# Load environment variables
+load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "604800"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+# Set within llm_cache_bypass() to skip cached responses
+_bypass_cache = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def llm_cache_bypass() -> Iterator[None]:
+    """
+    Skip cached LLM responses within the block.
+
+    Fresh responses are still stored, so the block also refreshes the cache.
+    """
+    token = _bypass_cache.set(True)
+    try:
+        yield
+    finally:
+        _bypass_cache.reset(token)
+
+
+class LLMResponseCache:
+    """
+    SQLite store of LLM responses with TTL expiry and byte-size LRU eviction.
+    """
+
+    def __init__(self, path: str = ":memory:", ttl_seconds: float = 604800, max_bytes: int = 100 * 1024 * 1024):
+        """
+        Initialize the response cache.
+
+        Args:
+            path: SQLite file storing the responses
+            ttl_seconds: Time after which a response is no longer served
+            max_bytes: Maximum total size of the stored responses
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "bypassed": 0, "evictions": 0}
+        self._store = SQLiteTTLStore(path, "llm_cache", ttl_seconds, max_bytes=max_bytes)
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        """
+        Compute the cache key of an LLM call.
+
+        Args:
+            **parts: Everything the response depends on (model, messages, temperature, max_tokens, ...)
+
+        Returns:
+            Hex digest identifying the call
+        """
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a cached response.
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            Cached response, or None on a miss, an expired entry or within llm_cache_bypass()
+        """
+        if _bypass_cache.get():
+            with self._lock:
+                self._stats["bypassed"] += 1
+            return None
+
+        value = self._store.get(key)
+        with self._lock:
+            self._stats["misses" if value is None else "hits"] += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Store a response, evicting the least recently used responses beyond max_bytes.
+
+        Args:
+            key: Cache key from make_key
+            value: Response to store
+        """
+        removed = self._store.set(key, value)
+        with self._lock:
+            self._stats["evictions"] += removed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the cache counters.
+
+        Returns:
+            Dictionary with hits, misses, bypassed, evictions, hit_rate, entries and bytes
+        """
+        entries, total_bytes = self._store.size()
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": entries,
+                "bytes": total_bytes
+            }
+
+    def clear(self) -> None:
+        """Remove all responses."""
+        self._store.clear()
+
+
+class LangChainLLMCache(BaseCache):
+    """Adapter exposing an LLMResponseCache as a LangChain chat model cache."""
+
+    def __init__(self, store: LLMResponseCache):
+        """
+        Initialize the adapter.
+
+        Args:
+            store: Response cache holding the generations
+        """
+        self.store = store
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        # llm_string covers the model, temperature, max_tokens and other call parameters
+        return self.store.make_key(source="langchain", prompt=prompt, llm=llm_string)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Any]]:
+        """Look up the generations of a prompt."""
+        value = self.store.get(self._key(prompt, llm_string))
+        if value is None:
+            return None
+        try:
+            return [loads(generation) for generation in json.loads(value)]
+        except Exception as e:
+            print(f"Warning: Could not load cached LLM response: {e}")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        """Store the generations of a prompt."""
+        try:
+            value = json.dumps([dumps(generation) for generation in return_val])
+        except Exception as e:
+            print(f"Warning: Could not cache LLM response: {e}")
+            return
+        self.store.set(self._key(prompt, llm_string), value)
+
+    def clear(self, **kwargs: Any) -> None:
+        """Remove all cached generations."""
+        self.store.clear()
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """
+    Get the process-wide LLM response cache.
+
+    Returns:
+        LLMResponseCache configured from the environment, or None if LLM caching is disabled
+    """
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = open_with_fallback(
+                lambda path: LLMResponseCache(path, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_BYTES), LLM_CACHE_PATH, "LLM cache"
+            )
+    return _llm_cache
@@ -3,42 +3,371 @@ Client for interacting with IO.net Intelligence API.
 """
 
 import os
+import json
+import time
+import asyncio
+import threading
+import weakref
+import httpx
 import openai
-from typing import Dict, Any, List, Optional
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Callable, Iterator, AsyncIterator, Awaitable
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import ChatMessage
 
+from app.models.llm_cache import get_llm_cache, LangChainLLMCache, LLMResponseCache
+from app.tools.single_flight import get_single_flight
+from app.tools.rate_limiter import httpx_event_hooks, async_httpx_event_hooks
+from app.models.token_usage import get_token_usage
+from app.models.llm_router import LLM_ROUTER_ENABLED, LLM_HEDGE_ENABLED, RoutedChatModel, get_llm_router, parse_fallback_models
+
 # Load environment variables
 load_dotenv()
 
-def get_llm():
+# Connection pool shared by every LLM client in the process
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10"))
+LLM_POOL_KEEPALIVE_EXPIRY = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "60"))
+
+# Batched embedding requests: texts per request (the provider's input limit) and concurrent requests
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-multilingual-gemma2"
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+
+# Ask for the usage record at the end of streamed completions (disable for servers rejecting stream_options)
+LLM_STREAM_USAGE = os.getenv("LLM_STREAM_USAGE", "true").lower() in ("1", "true", "yes")
+
+
+def get_provider_configs() -> List[Dict[str, Any]]:
     """
-    Get a LangChain LLM client.
+    Get the configurations of every LLM provider with an API key, in order of preference.
 
     Returns:
-        ChatOpenAI instance
+        List of dictionaries with id, name, api_key, base_url and default_model
     """
+    providers = []
     # Ưu tiên dùng IO.net Intelligence API key
     if os.getenv("IOINTELLIGENCE_API_KEY"):
-        print("Using IO.net Intelligence API key with primary model")
-        return ChatOpenAI(
-            api_key=os.getenv("IOINTELLIGENCE_API_KEY"),
-            base_url=os.getenv("IOINTELLIGENCE_BASE_URL", "https://api.intelligence.io.solutions/api/v1/"),
-            model=os.getenv("IOINTELLIGENCE_DEFAULT_MODEL", "meta-llama/Llama-3.3-70B-Instruct"),
-            temperature=0.7
-        )
-    # Only fall back to OpenAI if IO.net Intelligence is not available
-    elif os.getenv("OPENAI_API_KEY"):
-        print("Using OpenAI API key as fallback")
-        return ChatOpenAI(
-            model=os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
-            temperature=0.7
+        providers.append({
+            "id": "iointelligence",
+            "name": "IO.net Intelligence",
+            "api_key": os.getenv("IOINTELLIGENCE_API_KEY"),
+            "base_url": os.getenv("IOINTELLIGENCE_BASE_URL", "https://api.intelligence.io.solutions/api/v1/"),
+            "default_model": os.getenv("IOINTELLIGENCE_DEFAULT_MODEL", "meta-llama/Llama-3.3-70B-Instruct")
+        })
+    if os.getenv("OPENAI_API_KEY"):
+        providers.append({
+            "id": "openai",
+            "name": "OpenAI",
+            "api_key": os.getenv("OPENAI_API_KEY"),
+            "base_url": None,
+            "default_model": os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+        })
+    return providers
+
+
+def get_provider_config() -> Optional[Dict[str, Any]]:
+    """
+    Get the configuration of the preferred LLM provider.
+
+    IO.net Intelligence is preferred; OpenAI is only used if its key is missing.
+
+    Returns:
+        Dictionary with id, name, api_key, base_url and default_model, or None if no key is set
+    """
+    providers = get_provider_configs()
+    return providers[0] if providers else None
+
+
+def get_llm_endpoints(model: Optional[str] = None) -> List[Tuple[str, Dict[str, Any], str]]:
+    """
+    Get the endpoints an LLM call can be routed to, in order of preference.
+
+    The requested model is served by the preferred provider; the other providers use their
+    default model, followed by the extra endpoints of LLM_ROUTER_FALLBACK_MODELS.
+
+    Args:
+        model: Requested model (defaults to the default model of the preferred provider)
+
+    Returns:
+        List of (endpoint name, provider configuration, model) tuples
+    """
+    providers = get_provider_configs()
+    endpoints = []
+    for index, provider in enumerate(providers):
+        endpoint_model = (model or provider["default_model"]) if index == 0 else provider["default_model"]
+        endpoints.append((f"{provider['id']}:{endpoint_model}", provider, endpoint_model))
+
+    providers_by_id = {provider["id"]: provider for provider in providers}
+    for provider_id, endpoint_model in parse_fallback_models():
+        name = f"{provider_id}:{endpoint_model}"
+        if provider_id in providers_by_id and all(name != endpoint[0] for endpoint in endpoints):
+            endpoints.append((name, providers_by_id[provider_id], endpoint_model))
+    return endpoints
+
+
+class LLMClientManager:
+    """
+    Process-wide manager of LLM clients sharing keep-alive HTTP connection pools.
+
+    One chat model is kept per endpoint, model and temperature. The synchronous connection
+    pool is shared by all of them; asynchronous calls use one pool per event loop, because
+    async connections cannot be shared across loops. Every request on the pools, including
+    the retries of the OpenAI SDK, goes through the adaptive rate limiter of its provider.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections: int = LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry: float = LLM_POOL_KEEPALIVE_EXPIRY
+    ):
+        """
+        Initialize the client manager.
+
+        Args:
+            max_connections: Maximum number of concurrent connections per pool
+            max_keepalive_connections: Maximum number of idle connections kept open per pool
+            keepalive_expiry: Seconds an idle connection is kept open
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
         )
-    else:
+        self._lock = threading.Lock()
+        self._http_client: Optional[httpx.Client] = None
+        self._async_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._chat_models: Dict[Tuple[Optional[str], Optional[str], str, float], ChatOpenAI] = {}
+        self._async_chat_models: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[Optional[str], Optional[str], str, float], ChatOpenAI]]" = weakref.WeakKeyDictionary()
+        self._openai_clients: Dict[Tuple[Optional[str], Optional[str]], openai.OpenAI] = {}
+        self._async_openai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[Optional[str], Optional[str]], openai.AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+
+    def http_client(self) -> httpx.Client:
+        """Get the shared synchronous HTTP client."""
+        with self._lock:
+            if self._http_client is None or self._http_client.is_closed:
+                self._http_client = httpx.Client(
+                    limits=self.limits,
+                    timeout=httpx.Timeout(60.0, connect=10.0),
+                    event_hooks=httpx_event_hooks()
+                )
+            return self._http_client
+
+    def async_http_client(self) -> httpx.AsyncClient:
+        """Get the asynchronous HTTP client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_http_clients.get(loop)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    limits=self.limits,
+                    timeout=httpx.Timeout(60.0, connect=10.0),
+                    event_hooks=async_httpx_event_hooks()
+                )
+                self._async_http_clients[loop] = client
+                self._async_chat_models.pop(loop, None)
+                self._async_openai_clients.pop(loop, None)
+            return client
+
+    def get_chat_model(
+        self,
+        model: str,
+        temperature: float = 0.7,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None
+    ) -> ChatOpenAI:
+        """
+        Get the shared chat model for an endpoint, model and temperature.
+
+        Called from a running event loop, the model uses that loop's async connection pool,
+        so it can be awaited as well as invoked.
+
+        Args:
+            model: Model name
+            temperature: Sampling temperature
+            api_key: API key (defaults to the OpenAI environment configuration)
+            base_url: Base URL of an OpenAI-compatible API (defaults to OpenAI)
+
+        Returns:
+            ChatOpenAI instance
+        """
+        key = (base_url, api_key, model, temperature)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is None:
+            with self._lock:
+                chat_model = self._chat_models.get(key)
+            if chat_model is None:
+                chat_model = self._create_chat_model(key, self.http_client(), None)
+                with self._lock:
+                    chat_model = self._chat_models.setdefault(key, chat_model)
+            return chat_model
+
+        async_client = self.async_http_client()
+        with self._lock:
+            chat_model = self._async_chat_models.get(loop, {}).get(key)
+        if chat_model is None:
+            chat_model = self._create_chat_model(key, self.http_client(), async_client)
+            with self._lock:
+                chat_model = self._async_chat_models.setdefault(loop, {}).setdefault(key, chat_model)
+        return chat_model
+
+    def _create_chat_model(
+        self,
+        key: Tuple[Optional[str], Optional[str], str, float],
+        http_client: httpx.Client,
+        http_async_client: Optional[httpx.AsyncClient]
+    ) -> ChatOpenAI:
+        """Create a chat model on the shared connection pools."""
+        base_url, api_key, model, temperature = key
+        print(f"Creating pooled LLM client for model {model}")
+        kwargs = {"model": model, "temperature": temperature, "http_client": http_client}
+        llm_cache = get_llm_cache()
+        if llm_cache is not None:
+            kwargs["cache"] = LangChainLLMCache(llm_cache)
+        if http_async_client is not None:
+            kwargs["http_async_client"] = http_async_client
+        if api_key:
+            kwargs["api_key"] = api_key
+        if base_url:
+            kwargs["base_url"] = base_url
+        return ChatOpenAI(**kwargs)
+
+    def get_openai_client(self, api_key: Optional[str] = None, base_url: Optional[str] = None) -> openai.OpenAI:
+        """
+        Get a shared OpenAI SDK client on the synchronous connection pool.
+
+        Args:
+            api_key: API key
+            base_url: Base URL of an OpenAI-compatible API
+
+        Returns:
+            openai.OpenAI instance
+        """
+        key = (base_url, api_key)
+        http_client = self.http_client()
+        with self._lock:
+            client = self._openai_clients.get(key)
+            if client is None:
+                client = openai.OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+                self._openai_clients[key] = client
+            return client
+
+    def get_async_openai_client(self, api_key: Optional[str] = None, base_url: Optional[str] = None) -> openai.AsyncOpenAI:
+        """
+        Get the OpenAI SDK async client of the running event loop on its connection pool.
+
+        Args:
+            api_key: API key
+            base_url: Base URL of an OpenAI-compatible API
+
+        Returns:
+            openai.AsyncOpenAI instance
+        """
+        loop = asyncio.get_running_loop()
+        key = (base_url, api_key)
+        http_client = self.async_http_client()
+        with self._lock:
+            clients = self._async_openai_clients.setdefault(loop, {})
+            client = clients.get(key)
+            if client is None:
+                client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+                clients[key] = client
+            return client
+
+    async def aclose_loop_clients(self) -> None:
+        """Close the async connection pool of the running event loop, if any."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_http_clients.pop(loop, None)
+            self._async_chat_models.pop(loop, None)
+            self._async_openai_clients.pop(loop, None)
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+    def close(self) -> None:
+        """Close the synchronous connection pool and drop all clients."""
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._http_client = None
+            self._chat_models.clear()
+            self._openai_clients.clear()
+
+
+_llm_manager: Optional[LLMClientManager] = None
+_llm_manager_lock = threading.Lock()
+_simulated_llm = None
+
+
+def get_llm_manager() -> LLMClientManager:
+    """
+    Get the process-wide LLM client manager.
+
+    Returns:
+        LLMClientManager configured from the environment
+    """
+    global _llm_manager
+    with _llm_manager_lock:
+        if _llm_manager is None:
+            _llm_manager = LLMClientManager()
+        return _llm_manager
+
+
+def get_llm(model: Optional[str] = None, temperature: float = 0.7):
+    """
+    Get a LangChain LLM client.
+
+    Clients are pooled: repeated calls return the same client and reuse its connections.
+    If several endpoints are available (see get_llm_endpoints), the client routes each call
+    to the healthiest one and fails over to the others on errors. With LLM_HEDGE_ENABLED,
+    slow calls are also hedged, even with a single endpoint.
+
+    Args:
+        model: Model to use (defaults to the configured model of the active provider)
+        temperature: Sampling temperature
+
+    Returns:
+        ChatOpenAI instance, or RoutedChatModel when routing across several endpoints
+    """
+    global _simulated_llm
+    endpoints = get_llm_endpoints(model)
+    if not endpoints:
         # Fallback to a dummy LLM for development
-        print("Warning: No API keys found, using a simulated LLM")
-        return SimulatedLLM()
+        if _simulated_llm is None:
+            print("Warning: No API keys found, using a simulated LLM")
+            _simulated_llm = SimulatedLLM()
+        return _simulated_llm
+
+    manager = get_llm_manager()
+    if (len(endpoints) == 1 and not LLM_HEDGE_ENABLED) or not LLM_ROUTER_ENABLED:
+        _, provider, endpoint_model = endpoints[0]
+        return manager.get_chat_model(
+            model=endpoint_model,
+            temperature=temperature,
+            api_key=provider["api_key"],
+            base_url=provider["base_url"]
+        )
+
+    router = get_llm_router()
+    ranking = router.rank([name for name, _, _ in endpoints])
+    endpoints_by_name = {name: (provider, endpoint_model) for name, provider, endpoint_model in endpoints}
+    chat_models = []
+    for name, _ in ranking:
+        provider, endpoint_model = endpoints_by_name[name]
+        chat_models.append((name, manager.get_chat_model(
+            model=endpoint_model,
+            temperature=temperature,
+            api_key=provider["api_key"],
+            base_url=provider["base_url"]
+        )))
+    return RoutedChatModel(router, chat_models, ranking, hedge=LLM_HEDGE_ENABLED)
 
 class SimulatedLLM:
     """A simulated LLM for development purposes when no API keys are available."""
@@ -60,6 +389,193 @@ class SimulatedLLM:
             content=f"This is a simulated response for: {query[:50]}...\n\n"
                    f"In production, this would be a real AI response from a language model."
         )
+    
+    async def ainvoke(self, inputs):
+        """Simulate an async LLM response."""
+        return self.invoke(inputs)
+
+def to_openai_messages(messages: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Convert chat messages to the chat completions format.
+
+    Args:
+        messages: Message dictionaries or LangChain messages (e.g. from ChatPromptTemplate.format_messages)
+
+    Returns:
+        List of {"role", "content"} dictionaries
+    """
+    roles = {"human": "user", "ai": "assistant", "system": "system", "tool": "tool"}
+    converted = []
+    for message in messages:
+        if isinstance(message, dict):
+            converted.append(message)
+        else:
+            role = getattr(message, "role", None) or roles.get(getattr(message, "type", ""), "user")
+            converted.append({"role": role, "content": message.content})
+    return converted
+
+
+class _ChatCompletionStreamBase:
+    """Parsing and timing shared by the sync and async chat completion streams."""
+
+    def __init__(self, messages: List[Dict[str, Any]], model: str):
+        """
+        Initialize the stream state.
+
+        Args:
+            messages: Messages sent
+            model: Model generating the completion
+        """
+        self.model = model
+        self.content = ""
+        self.finish_reason: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+        self.ttft_seconds: Optional[float] = None
+        self.total_seconds: Optional[float] = None
+        self._prompt_chars = sum(len(str(message.get("content") or "")) for message in messages)
+        self._deltas = 0
+        self._start_time: Optional[float] = None
+
+    def _begin(self) -> None:
+        """Start timing; a stream can only be consumed once."""
+        if self._start_time is not None:
+            raise RuntimeError("A chat completion stream can only be iterated once")
+        self._start_time = time.monotonic()
+
+    def _on_chunk(self, chunk: Any) -> str:
+        """Record a streamed chunk and return its text delta."""
+        usage = getattr(chunk, "usage", None)
+        if usage:
+            self.usage = {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens
+            }
+        delta = ""
+        for choice in getattr(chunk, "choices", None) or []:
+            if choice.delta is not None and choice.delta.content:
+                delta += choice.delta.content
+            if choice.finish_reason:
+                self.finish_reason = choice.finish_reason
+        if delta:
+            if self.ttft_seconds is None:
+                self.ttft_seconds = round(time.monotonic() - self._start_time, 3)
+            self._deltas += 1
+            self.content += delta
+        return delta
+
+    def _finish(self) -> None:
+        """Close the timing and the usage record, and add it to the process-wide token usage."""
+        if self.total_seconds is not None or self._start_time is None:
+            return
+        self.total_seconds = round(time.monotonic() - self._start_time, 3)
+        if self.usage is None:
+            # The provider sent no usage record: about 4 characters per prompt token, one token per delta
+            prompt_tokens = (self._prompt_chars + 3) // 4
+            self.usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": self._deltas,
+                "total_tokens": prompt_tokens + self._deltas,
+                "estimated": True
+            }
+        get_token_usage("chat_completion").record(
+            self.usage["prompt_tokens"], self.usage["completion_tokens"], self.total_seconds,
+            estimated=self.usage.get("estimated", False)
+        )
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Completion tokens generated per second after the first token."""
+        if self.usage is None or self.ttft_seconds is None or self.total_seconds is None:
+            return None
+        generation_seconds = self.total_seconds - self.ttft_seconds
+        if generation_seconds <= 0:
+            return None
+        return round(self.usage["completion_tokens"] / generation_seconds, 1)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get the timing and usage of the stream.
+
+        Returns:
+            Dictionary with model, ttft_seconds, total_seconds, tokens_per_second, usage and
+            finish_reason (timings are None until the stream is consumed)
+        """
+        return {
+            "model": self.model,
+            "ttft_seconds": self.ttft_seconds,
+            "total_seconds": self.total_seconds,
+            "tokens_per_second": self.tokens_per_second,
+            "usage": self.usage,
+            "finish_reason": self.finish_reason
+        }
+
+
+class ChatCompletionStream(_ChatCompletionStreamBase):
+    """
+    Iterator over the text deltas of a streamed chat completion.
+
+    The request is sent when iteration starts. Once the stream is consumed (or closed
+    early), content holds the full text and metrics() the time to first token, the
+    generation rate and the usage record.
+    """
+
+    def __init__(self, create: Callable[[], Any], messages: List[Dict[str, Any]], model: str):
+        """
+        Initialize the stream.
+
+        Args:
+            create: Function sending the streaming request and returning the provider stream
+            messages: Messages sent
+            model: Model generating the completion
+        """
+        super().__init__(messages, model)
+        self._create = create
+
+    def __iter__(self) -> Iterator[str]:
+        """Send the request and yield the text deltas as they arrive."""
+        self._begin()
+        stream = self._create()
+        try:
+            for chunk in stream:
+                delta = self._on_chunk(chunk)
+                if delta:
+                    yield delta
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+            self._finish()
+
+
+class AsyncChatCompletionStream(_ChatCompletionStreamBase):
+    """Async version of ChatCompletionStream, iterated with async for."""
+
+    def __init__(self, create: Callable[[], Awaitable[Any]], messages: List[Dict[str, Any]], model: str):
+        """
+        Initialize the stream.
+
+        Args:
+            create: Coroutine function sending the streaming request and returning the provider stream
+            messages: Messages sent
+            model: Model generating the completion
+        """
+        super().__init__(messages, model)
+        self._create = create
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        """Send the request and yield the text deltas as they arrive."""
+        self._begin()
+        stream = await self._create()
+        try:
+            async for chunk in stream:
+                delta = self._on_chunk(chunk)
+                if delta:
+                    yield delta
+        finally:
+            if hasattr(stream, "close"):
+                await stream.close()
+            self._finish()
+
 
 class IOIntelligenceClient:
     """
@@ -87,8 +603,8 @@ class IOIntelligenceClient:
         self.base_url = base_url or os.getenv("IOINTELLIGENCE_BASE_URL", "https://api.intelligence.io.solutions/api/v1/")
         self.default_model = default_model or os.getenv("IOINTELLIGENCE_DEFAULT_MODEL", "DeepSeek-R1-0528")
         
-        # Initialize the OpenAI client with IO.net Intelligence API
-        self.client = openai.OpenAI(
+        # Use the shared OpenAI client (and connection pool) for IO.net Intelligence API
+        self.client = get_llm_manager().get_openai_client(
             api_key=self.api_key,
             base_url=self.base_url
         )
@@ -113,34 +629,139 @@ class IOIntelligenceClient:
         model: Optional[str] = None,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
-        stream: bool = False
+        stream: bool = False,
+        use_cache: bool = True
     ) -> Dict[str, Any]:
         """
         Generate a chat completion.
         
+        Non-streaming completions are served from and stored in the LLM response cache, and
+        concurrent identical non-streaming requests share one API call.
+        The tokens and latency of every API call are added to the process-wide
+        "chat_completion" token usage.
+        
         Args:
             messages: List of messages in the conversation
             model: Model to use for completion
             temperature: Temperature for sampling
             max_tokens: Maximum number of tokens to generate
-            stream: Whether to stream the response
+            stream: Whether to stream the response (see stream_chat_completion)
+            use_cache: Whether to use the LLM response cache and share concurrent identical
+                requests (False always makes a fresh API call)
+            
+        Returns:
+            Chat completion response, or a ChatCompletionStream of text deltas if stream is set
+        """
+        if stream:
+            return self.stream_chat_completion(messages, model, temperature, max_tokens)
+        if not use_cache:
+            return self._chat_completion(messages, model, temperature, max_tokens, None)
+        
+        cache_key = LLMResponseCache.make_key(
+            source="chat_completion",
+            base_url=self.base_url,
+            model=model or self.default_model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        llm_cache = get_llm_cache()
+        if llm_cache is not None:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return json.loads(cached)
+        
+        return get_single_flight("chat_completion").do(
+            cache_key, lambda: self._chat_completion(messages, model, temperature, max_tokens, cache_key)
+        )
+    
+    def stream_chat_completion(
+        self,
+        messages: List[Any],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
+    ) -> ChatCompletionStream:
+        """
+        Stream a chat completion as text deltas.
+        
+        Streams bypass the LLM response cache. Errors of the API call are raised while
+        iterating.
+        
+        Args:
+            messages: Message dictionaries or LangChain messages
+            model: Model to use for completion
+            temperature: Temperature for sampling
+            max_tokens: Maximum number of tokens to generate
             
         Returns:
-            Chat completion response
+            ChatCompletionStream yielding the text as it is generated, with its metrics
+        """
+        request = self._stream_request(messages, model, temperature, max_tokens)
+        return ChatCompletionStream(
+            lambda: self.client.chat.completions.create(**request), request["messages"], request["model"]
+        )
+    
+    def astream_chat_completion(
+        self,
+        messages: List[Any],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
+    ) -> AsyncChatCompletionStream:
         """
+        Async version of stream_chat_completion, on the event loop's connection pool.
+        
+        Args:
+            messages: Message dictionaries or LangChain messages
+            model: Model to use for completion
+            temperature: Temperature for sampling
+            max_tokens: Maximum number of tokens to generate
+            
+        Returns:
+            AsyncChatCompletionStream yielding the text as it is generated, with its metrics
+        """
+        request = self._stream_request(messages, model, temperature, max_tokens)
+        
+        async def create():
+            client = get_llm_manager().get_async_openai_client(api_key=self.api_key, base_url=self.base_url)
+            return await client.chat.completions.create(**request)
+        
+        return AsyncChatCompletionStream(create, request["messages"], request["model"])
+    
+    def _stream_request(self, messages: List[Any], model: Optional[str], temperature: float,
+                        max_tokens: Optional[int]) -> Dict[str, Any]:
+        """Build the arguments of a streaming chat completions request."""
+        request = {
+            "model": model or self.default_model,
+            "messages": to_openai_messages(messages),
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True
+        }
+        if LLM_STREAM_USAGE:
+            request["stream_options"] = {"include_usage": True}
+        return request
+    
+    def _chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+        temperature: float,
+        max_tokens: Optional[int],
+        cache_key: Optional[str]
+    ) -> Dict[str, Any]:
+        """Call the chat completions API, storing the response under cache_key if given."""
         try:
+            start_time = time.monotonic()
             response = self.client.chat.completions.create(
                 model=model or self.default_model,
                 messages=messages,
                 temperature=temperature,
-                max_tokens=max_tokens,
-                stream=stream
+                max_tokens=max_tokens
             )
             
-            if stream:
-                return response  # Return the stream object
-            
-            return {
+            result = {
                 "id": response.id,
                 "object": response.object,
                 "created": response.created,
@@ -160,8 +781,16 @@ class IOIntelligenceClient:
                     "prompt_tokens": response.usage.prompt_tokens,
                     "completion_tokens": response.usage.completion_tokens,
                     "total_tokens": response.usage.total_tokens
-                }
+                },
+                "latency_seconds": round(time.monotonic() - start_time, 3)
             }
+            get_token_usage("chat_completion").record(
+                response.usage.prompt_tokens, response.usage.completion_tokens, result["latency_seconds"]
+            )
+            llm_cache = get_llm_cache()
+            if cache_key is not None and llm_cache is not None:
+                llm_cache.set(cache_key, json.dumps(result))
+            return result
         except Exception as e:
             print(f"Error generating chat completion: {e}")
             return {"error": str(e)}
@@ -179,7 +808,7 @@ class IOIntelligenceClient:
         """
         try:
             # For IO.net Intelligence API, use the embedding model
-            embedding_model = model or "BAAI/bge-multilingual-gemma2"
+            embedding_model = model or DEFAULT_EMBEDDING_MODEL
             response = self.client.embeddings.create(
                 model=embedding_model,
                 input=text
@@ -187,4 +816,84 @@ class IOIntelligenceClient:
             return response.data[0].embedding
         except Exception as e:
             print(f"Error generating embedding: {e}")
-            return [] 
\ No newline at end of file
+            return []
+    
+    def get_embeddings(
+        self,
+        texts: List[str],
+        model: Optional[str] = None,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        max_concurrency: int = EMBEDDING_MAX_CONCURRENCY
+    ) -> np.ndarray:
+        """
+        Get the embeddings of many texts with batched, concurrent requests.
+        
+        Identical texts are embedded once. A batch that fails is retried one text per
+        request, so one bad input does not lose the rest of its batch.
+        
+        Args:
+            texts: Texts to embed
+            model: Model to use for embedding
+            batch_size: Texts per request (the provider's input limit)
+            max_concurrency: Maximum number of requests in flight
+            
+        Returns:
+            Contiguous float32 matrix with one row per text, in the order of texts. Rows of
+            texts that could not be embedded are zero and their indices are logged.
+        
+        Raises:
+            ValueError: If batch_size is less than 1
+            RuntimeError: If no text could be embedded
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        embedding_model = model or DEFAULT_EMBEDDING_MODEL
+        unique_texts = list(dict.fromkeys(texts))
+        if not unique_texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        
+        batches = [unique_texts[i:i + batch_size] for i in range(0, len(unique_texts), batch_size)]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches)))) as executor:
+            results = list(executor.map(lambda batch: self._embed_batch(batch, embedding_model), batches))
+        
+        vectors: Dict[str, List[float]] = {}
+        for batch, embeddings in zip(batches, results):
+            vectors.update((text, vector) for text, vector in zip(batch, embeddings) if vector is not None)
+        if not vectors:
+            raise RuntimeError(f"Could not embed any of the {len(unique_texts)} texts")
+        
+        dimension = len(next(iter(vectors.values())))
+        matrix = np.zeros((len(texts), dimension), dtype=np.float32)
+        failed = []
+        for row, text in enumerate(texts):
+            vector = vectors.get(text)
+            if vector is not None:
+                matrix[row] = vector
+            else:
+                failed.append(row)
+        if failed:
+            print(f"Warning: {len(failed)} of {len(texts)} texts could not be embedded (zero rows at indices {failed})")
+        return matrix
+    
+    def _embed_batch(self, batch: List[str], model: str) -> List[Optional[List[float]]]:
+        """Embed one batch, retrying each text alone if the batch fails. Failed texts yield None."""
+        # The API rejects empty inputs
+        inputs = [text or " " for text in batch]
+        try:
+            response = self.client.embeddings.create(model=model, input=inputs)
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except Exception as e:
+            if len(batch) == 1:
+                print(f"Error generating embedding: {e}")
+                return [None]
+            print(f"Error generating embeddings for a batch of {len(batch)}, retrying one by one: {e}")
+        
+        embeddings = []
+        for text in inputs:
+            try:
+                response = self.client.embeddings.create(model=model, input=text)
+                embeddings.append(response.data[0].embedding)
+            except Exception as e:
+                print(f"Error generating embedding: {e}")
+                embeddings.append(None)
+        return embeddings
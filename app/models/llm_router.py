@@ -0,0 +1,560 @@
+"""
+Latency- and error-aware routing of LLM calls across providers.
+"""
+
+import os
+import time
+import asyncio
+import statistics
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Optional, Iterator, AsyncIterator, Tuple
+from dotenv import load_dotenv
+from langchain_core.runnables import Runnable
+
+# Load environment variables
+load_dotenv()
+
+LLM_ROUTER_ENABLED = os.getenv("LLM_ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Number of recent calls per endpoint the health score is computed from
+LLM_ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "50"))
+# Consecutive failures after which an endpoint is skipped for the cooldown
+LLM_ROUTER_FAILURE_THRESHOLD = int(os.getenv("LLM_ROUTER_FAILURE_THRESHOLD", "3"))
+LLM_ROUTER_COOLDOWN_SECONDS = float(os.getenv("LLM_ROUTER_COOLDOWN_SECONDS", "30"))
+# Latency assumed for endpoints without successful calls yet
+LLM_ROUTER_PRIOR_LATENCY = float(os.getenv("LLM_ROUTER_PRIOR_LATENCY", "30"))
+# Extra endpoints to fail over to, written as "provider:model,provider:model"
+LLM_ROUTER_FALLBACK_MODELS = os.getenv("LLM_ROUTER_FALLBACK_MODELS", "")
+
+# Hedged requests: if a call is slower than this percentile of the endpoint's recent latency,
+# a duplicate is sent to the next endpoint (or the same one) and the first result wins
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# Successful calls an endpoint needs before its latency percentile is trusted
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "10"))
+# Maximum extra requests sent as hedges, as a fraction of all routed calls
+LLM_HEDGE_MAX_EXTRA_RATIO = float(os.getenv("LLM_HEDGE_MAX_EXTRA_RATIO", "0.05"))
+LLM_HEDGE_MAX_WORKERS = int(os.getenv("LLM_HEDGE_MAX_WORKERS", "16"))
+
+# Weight of the error rate in the health score
+ERROR_RATE_PENALTY = 4.0
+
+# Runs the synchronous calls of hedged requests, so the caller can wait for the first result
+_hedge_executor = ThreadPoolExecutor(max_workers=LLM_HEDGE_MAX_WORKERS, thread_name_prefix="llm-hedge")
+
+
+class EndpointHealth:
+    """Rolling latency and error statistics of one provider/model endpoint."""
+
+    def __init__(self, window: int):
+        """
+        Initialize the endpoint statistics.
+
+        Args:
+            window: Number of recent calls kept
+        """
+        self.calls: "deque[Tuple[float, bool]]" = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.total_calls = 0
+        self.total_errors = 0
+
+
+class LLMRouter:
+    """
+    Ranks LLM endpoints by health and records the outcome of every call.
+
+    The health score of an endpoint is its median latency over the recent successful calls,
+    inflated by its recent error rate; lower is better. An endpoint failing
+    failure_threshold times in a row is skipped for the cooldown (circuit breaker) unless
+    every endpoint is.
+
+    The router also decides when to hedge a call and caps the extra requests hedging sends
+    at max_hedge_ratio of the calls.
+    """
+
+    def __init__(
+        self,
+        window: int = LLM_ROUTER_WINDOW,
+        failure_threshold: int = LLM_ROUTER_FAILURE_THRESHOLD,
+        cooldown_seconds: float = LLM_ROUTER_COOLDOWN_SECONDS,
+        prior_latency: float = LLM_ROUTER_PRIOR_LATENCY,
+        hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+        hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        max_hedge_ratio: float = LLM_HEDGE_MAX_EXTRA_RATIO
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            window: Number of recent calls per endpoint the score is computed from
+            failure_threshold: Consecutive failures opening the circuit of an endpoint
+            cooldown_seconds: Time an open circuit skips the endpoint
+            prior_latency: Latency assumed for endpoints without successful calls
+            hedge_percentile: Latency percentile after which a call is hedged
+            hedge_min_samples: Successful calls needed before an endpoint's calls are hedged
+            max_hedge_ratio: Maximum hedges as a fraction of the hedgeable calls
+        """
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.prior_latency = prior_latency
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_hedge_ratio = max_hedge_ratio
+        self._lock = threading.Lock()
+        self._health: Dict[str, EndpointHealth] = {}
+        self._hedge_stats = {"calls": 0, "hedges": 0, "hedge_wins": 0}
+
+    def _get_health(self, endpoint: str) -> EndpointHealth:
+        """Get the statistics of an endpoint. Must be called with the lock held."""
+        health = self._health.get(endpoint)
+        if health is None:
+            health = EndpointHealth(self.window)
+            self._health[endpoint] = health
+        return health
+
+    def _score(self, health: EndpointHealth, now: float) -> float:
+        """Health score of an endpoint. Must be called with the lock held."""
+        if health.open_until > now:
+            return float("inf")
+        latencies = [latency for latency, ok in health.calls if ok]
+        latency = statistics.median(latencies) if latencies else self.prior_latency
+        error_rate = sum(1 for _, ok in health.calls if not ok) / len(health.calls) if health.calls else 0.0
+        return latency * (1 + ERROR_RATE_PENALTY * error_rate)
+
+    def rank(self, endpoints: List[str]) -> List[Tuple[str, float]]:
+        """
+        Order endpoints from healthiest to least healthy.
+
+        Ties keep the given order, so the preferred provider wins until it degrades.
+
+        Args:
+            endpoints: Endpoint names in order of preference
+
+        Returns:
+            List of (endpoint, score) tuples
+        """
+        now = time.monotonic()
+        with self._lock:
+            scored = [(endpoint, self._score(self._get_health(endpoint), now)) for endpoint in endpoints]
+        return sorted(scored, key=lambda item: item[1])
+
+    def record(self, endpoint: str, latency: float, ok: bool) -> None:
+        """
+        Record the outcome of a call.
+
+        Args:
+            endpoint: Endpoint that served the call
+            latency: Duration of the call in seconds
+            ok: Whether the call succeeded
+        """
+        with self._lock:
+            health = self._get_health(endpoint)
+            health.calls.append((latency, ok))
+            health.total_calls += 1
+            if ok:
+                health.consecutive_failures = 0
+                return
+            health.total_errors += 1
+            health.consecutive_failures += 1
+            if health.consecutive_failures >= self.failure_threshold:
+                health.open_until = time.monotonic() + self.cooldown_seconds
+                health.consecutive_failures = 0
+                print(f"LLM router: {endpoint} failed {self.failure_threshold} times in a row, "
+                      f"skipping it for {self.cooldown_seconds:.0f}s")
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """
+        Get the time after which a call to an endpoint should be hedged.
+
+        Also counts the call towards the hedge budget.
+
+        Args:
+            endpoint: Endpoint the call is sent to
+
+        Returns:
+            Delay in seconds, or None if the endpoint has too few successful calls
+        """
+        with self._lock:
+            self._hedge_stats["calls"] += 1
+            latencies = sorted(latency for latency, ok in self._get_health(endpoint).calls if ok)
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        index = min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile / 100))
+        return latencies[index]
+
+    def take_hedge(self) -> bool:
+        """
+        Reserve a hedge within the extra spend cap.
+
+        Returns:
+            Whether the hedge may be sent
+        """
+        with self._lock:
+            # The budget starts with one hedge and grows by max_hedge_ratio per call
+            if self.max_hedge_ratio <= 0 or self._hedge_stats["hedges"] > self.max_hedge_ratio * self._hedge_stats["calls"]:
+                return False
+            self._hedge_stats["hedges"] += 1
+            return True
+
+    def record_hedge_win(self) -> None:
+        """Count a hedge that returned before the call it duplicated."""
+        with self._lock:
+            self._hedge_stats["hedge_wins"] += 1
+
+    def hedge_stats(self) -> Dict[str, int]:
+        """
+        Get the hedging counters.
+
+        Returns:
+            Dictionary with calls (hedgeable), hedges and hedge_wins
+        """
+        with self._lock:
+            return dict(self._hedge_stats)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the health of every endpoint.
+
+        Returns:
+            Dictionary mapping endpoints to calls, errors, error_rate, median_latency, score and circuit_open
+        """
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            for endpoint, health in self._health.items():
+                latencies = [latency for latency, ok in health.calls if ok]
+                score = self._score(health, now)
+                result[endpoint] = {
+                    "calls": health.total_calls,
+                    "errors": health.total_errors,
+                    "error_rate": round(sum(1 for _, ok in health.calls if not ok) / len(health.calls), 3) if health.calls else 0.0,
+                    "median_latency": round(statistics.median(latencies), 3) if latencies else None,
+                    "score": round(score, 3) if score != float("inf") else None,
+                    "circuit_open": health.open_until > now
+                }
+            return result
+
+
+class RoutedChatModel(Runnable):
+    """
+    Chat model calling the healthiest of several endpoints and failing over on errors.
+
+    Streams fail over only until the first chunk was produced. With hedging, a call to the
+    healthiest endpoint that is slower than usual is duplicated and the first result wins;
+    the losing async call is cancelled, a losing sync call is left to finish and discarded.
+    The routing decision of the instance is kept in route, for the run metrics; since the
+    instance may be shared by worker threads, route is only changed under a lock and read
+    through route_snapshot. Every invoke/ainvoke result (and the first chunk of a stream)
+    carries the model of the endpoint that served it in response_metadata["routed_model"].
+    """
+
+    def __init__(self, router: LLMRouter, endpoints: List[Tuple[str, Any]], ranking: List[Tuple[str, float]],
+                 hedge: bool = False):
+        """
+        Initialize the routed chat model.
+
+        Args:
+            router: Router recording the outcome of every call
+            endpoints: (endpoint name, chat model) tuples, healthiest first
+            ranking: (endpoint name, score) tuples the order was chosen from
+            hedge: Whether to hedge slow invoke/ainvoke calls
+        """
+        self.router = router
+        self.endpoints = endpoints
+        self.hedge = hedge
+        self.model_names = {name: getattr(model, "model_name", None) or name for name, model in endpoints}
+        # Model the call is expected to be served by (before any failover)
+        self.model_name = self.model_names[endpoints[0][0]]
+        # Every endpoint's chat model is created with the same sampling temperature
+        self.temperature = getattr(endpoints[0][1], "temperature", None)
+        self._route_lock = threading.Lock()
+        self.route = {
+            "ranking": [
+                {"endpoint": endpoint, "score": round(score, 3) if score != float("inf") else None}
+                for endpoint, score in ranking
+            ],
+            "served_by": None,
+            "served_model": None,
+            "failovers": []
+        }
+
+    def route_snapshot(self) -> Dict[str, Any]:
+        """
+        Get a copy of the routing decision.
+
+        Returns:
+            Dictionary with ranking, served_by, served_model, failovers and hedge (if any)
+        """
+        with self._route_lock:
+            return {key: list(value) if isinstance(value, list) else
+                    dict(value) if isinstance(value, dict) else value
+                    for key, value in self.route.items()}
+
+    def _update_route(self, **changes: Any) -> None:
+        """Change the routing decision."""
+        with self._route_lock:
+            self.route.update(changes)
+
+    def _publish(self, endpoint: str, result: Any = None) -> Any:
+        """Publish an endpoint as the one serving the call, tagging the result with its model."""
+        self._update_route(served_by=endpoint, served_model=self.model_names[endpoint])
+        return self._tag(result, endpoint)
+
+    def _tag(self, result: Any, endpoint: str) -> Any:
+        """Record the model of the serving endpoint in a result's response metadata."""
+        metadata = getattr(result, "response_metadata", None)
+        if isinstance(metadata, dict):
+            metadata["routed_model"] = self.model_names[endpoint]
+        return result
+
+    def _failed(self, endpoint: str, start: float, error: Exception) -> None:
+        """Record a failed call and the failover it causes."""
+        self.router.record(endpoint, time.perf_counter() - start, False)
+        with self._route_lock:
+            self.route["failovers"].append({"endpoint": endpoint, "error": type(error).__name__})
+        print(f"LLM router: {endpoint} failed ({type(error).__name__}: {error}), failing over")
+
+    def _served(self, endpoint: str, start: float) -> None:
+        """Record a successful call."""
+        self.router.record(endpoint, time.perf_counter() - start, True)
+
+    @staticmethod
+    def _deadline(kwargs: Dict[str, Any]) -> Optional[float]:
+        """Deadline of a call whose kwargs carry a request timeout (see bind_timeout), else None."""
+        timeout = kwargs.get("timeout")
+        return time.monotonic() + timeout if isinstance(timeout, (int, float)) else None
+
+    @staticmethod
+    def _time_left_kwargs(kwargs: Dict[str, Any], deadline: Optional[float]) -> Optional[Dict[str, Any]]:
+        """
+        Kwargs of the next attempt of a call, with the timeout cut to the time left.
+
+        Failovers and hedges share the timeout of the call instead of each getting it again.
+        Returns None if no time is left.
+        """
+        if deadline is None:
+            return kwargs
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        return {**kwargs, "timeout": remaining}
+
+    def _hedge_target(self) -> Tuple[str, Any]:
+        """Endpoint receiving the duplicate of a hedged call: the next healthiest, if any."""
+        return self.endpoints[1] if len(self.endpoints) > 1 else self.endpoints[0]
+
+    def _call(self, endpoint: str, model: Any, input: Any, config: Optional[Any], kwargs: Dict[str, Any],
+              publish: bool = True) -> Any:
+        """Call one endpoint, recording the outcome."""
+        start = time.perf_counter()
+        try:
+            result = model.invoke(input, config, **kwargs)
+        except Exception as e:
+            self._failed(endpoint, start, e)
+            raise
+        self._served(endpoint, start)
+        return self._publish(endpoint, result) if publish else result
+
+    async def _acall(self, endpoint: str, model: Any, input: Any, config: Optional[Any], kwargs: Dict[str, Any],
+                     publish: bool = True) -> Any:
+        """Async version of _call. Cancelled calls are not recorded."""
+        start = time.perf_counter()
+        try:
+            result = await model.ainvoke(input, config, **kwargs)
+        except Exception as e:
+            self._failed(endpoint, start, e)
+            raise
+        self._served(endpoint, start)
+        return self._publish(endpoint, result) if publish else result
+
+    def _hedged_call(self, endpoint: str, model: Any, input: Any, config: Optional[Any], kwargs: Dict[str, Any],
+                     deadline: Optional[float] = None) -> Any:
+        """Call an endpoint, duplicating the call if it is slower than usual."""
+        delay = self.router.hedge_delay(endpoint)
+        if delay is None:
+            return self._call(endpoint, model, input, config, kwargs)
+
+        primary = _hedge_executor.submit(contextvars.copy_context().run, self._call, endpoint, model, input, config, kwargs, False)
+        done, _ = wait([primary], timeout=delay)
+        hedge_kwargs = self._time_left_kwargs(kwargs, deadline)
+        if done or hedge_kwargs is None or not self.router.take_hedge():
+            return self._publish(endpoint, primary.result())
+
+        hedge_endpoint, hedge_model = self._hedge_target()
+        self._update_route(hedge={"endpoint": hedge_endpoint, "after_seconds": round(delay, 3), "won": False})
+        hedge = _hedge_executor.submit(contextvars.copy_context().run, self._call, hedge_endpoint, hedge_model, input, config, hedge_kwargs, False)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._update_route(hedge={"endpoint": hedge_endpoint, "after_seconds": round(delay, 3), "won": True})
+                        self.router.record_hedge_win()
+                    # A blocking HTTP call cannot be interrupted; the loser's result is discarded
+                    return self._publish(hedge_endpoint if future is hedge else endpoint, future.result())
+        return primary.result()
+
+    async def _ahedged_call(self, endpoint: str, model: Any, input: Any, config: Optional[Any], kwargs: Dict[str, Any],
+                            deadline: Optional[float] = None) -> Any:
+        """Async version of _hedged_call. The losing call is cancelled."""
+        delay = self.router.hedge_delay(endpoint)
+        if delay is None:
+            return await self._acall(endpoint, model, input, config, kwargs)
+
+        primary = asyncio.ensure_future(self._acall(endpoint, model, input, config, kwargs, False))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            hedge_kwargs = self._time_left_kwargs(kwargs, deadline)
+            if done or hedge_kwargs is None or not self.router.take_hedge():
+                return self._publish(endpoint, await primary)
+
+            hedge_endpoint, hedge_model = self._hedge_target()
+            self._update_route(hedge={"endpoint": hedge_endpoint, "after_seconds": round(delay, 3), "won": False})
+            hedge = asyncio.ensure_future(self._acall(hedge_endpoint, hedge_model, input, config, hedge_kwargs, False))
+            tasks.append(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._update_route(hedge={"endpoint": hedge_endpoint, "after_seconds": round(delay, 3), "won": True})
+                            self.router.record_hedge_win()
+                        return self._publish(hedge_endpoint if task is hedge else endpoint, task.result())
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def invoke(self, input: Any, config: Optional[Any] = None, **kwargs: Any) -> Any:
+        """
+        Call the healthiest endpoint, failing over to the next ones on errors.
+
+        A bound timeout covers the whole call: each failover only gets the time left.
+        """
+        deadline = self._deadline(kwargs)
+        last_error = None
+        for index, (endpoint, model) in enumerate(self.endpoints):
+            call_kwargs = self._time_left_kwargs(kwargs, deadline)
+            if call_kwargs is None:
+                break
+            try:
+                if index == 0 and self.hedge:
+                    return self._hedged_call(endpoint, model, input, config, call_kwargs, deadline)
+                return self._call(endpoint, model, input, config, call_kwargs)
+            except Exception as e:
+                last_error = e
+        raise last_error or TimeoutError("LLM call timed out before any endpoint was tried")
+
+    async def ainvoke(self, input: Any, config: Optional[Any] = None, **kwargs: Any) -> Any:
+        """Async version of invoke."""
+        deadline = self._deadline(kwargs)
+        last_error = None
+        for index, (endpoint, model) in enumerate(self.endpoints):
+            call_kwargs = self._time_left_kwargs(kwargs, deadline)
+            if call_kwargs is None:
+                break
+            try:
+                if index == 0 and self.hedge:
+                    return await self._ahedged_call(endpoint, model, input, config, call_kwargs, deadline)
+                return await self._acall(endpoint, model, input, config, call_kwargs)
+            except Exception as e:
+                last_error = e
+        raise last_error or TimeoutError("LLM call timed out before any endpoint was tried")
+
+    def stream(self, input: Any, config: Optional[Any] = None, **kwargs: Any) -> Iterator[Any]:
+        """Stream from the healthiest endpoint, failing over until the first chunk."""
+        deadline = self._deadline(kwargs)
+        last_error = None
+        for endpoint, model in self.endpoints:
+            call_kwargs = self._time_left_kwargs(kwargs, deadline)
+            if call_kwargs is None:
+                break
+            start = time.perf_counter()
+            started = False
+            try:
+                for chunk in model.stream(input, config, **call_kwargs):
+                    if not started:
+                        self._tag(chunk, endpoint)
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self._failed(endpoint, start, e)
+                if started:
+                    raise
+                last_error = e
+                continue
+            self._served(endpoint, start)
+            self._publish(endpoint)
+            return
+        raise last_error or TimeoutError("LLM call timed out before any endpoint was tried")
+
+    async def astream(self, input: Any, config: Optional[Any] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        """Async version of stream."""
+        deadline = self._deadline(kwargs)
+        last_error = None
+        for endpoint, model in self.endpoints:
+            call_kwargs = self._time_left_kwargs(kwargs, deadline)
+            if call_kwargs is None:
+                break
+            start = time.perf_counter()
+            started = False
+            try:
+                async for chunk in model.astream(input, config, **call_kwargs):
+                    if not started:
+                        self._tag(chunk, endpoint)
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self._failed(endpoint, start, e)
+                if started:
+                    raise
+                last_error = e
+                continue
+            self._served(endpoint, start)
+            self._publish(endpoint)
+            return
+        raise last_error or TimeoutError("LLM call timed out before any endpoint was tried")
+
+
+def parse_fallback_models(value: str = LLM_ROUTER_FALLBACK_MODELS) -> List[Tuple[str, str]]:
+    """
+    Parse extra endpoints written as "provider:model,provider:model".
+
+    Args:
+        value: Endpoint list
+
+    Returns:
+        List of (provider id, model) tuples
+    """
+    endpoints = []
+    for item in value.split(","):
+        provider, sep, model = item.strip().partition(":")
+        if sep and provider and model:
+            endpoints.append((provider, model))
+    return endpoints
+
+
+_llm_router: Optional[LLMRouter] = None
+_llm_router_lock = threading.Lock()
+
+
+def get_llm_router() -> LLMRouter:
+    """
+    Get the process-wide LLM router.
+
+    Returns:
+        LLMRouter configured from the environment
+    """
+    global _llm_router
+    with _llm_router_lock:
+        if _llm_router is None:
+            _llm_router = LLMRouter()
+        return _llm_router
@@ -0,0 +1,165 @@
+"""
+SQLite key-value store with TTL expiry and LRU eviction, shared by the output caches.
+"""
+
+import time
+import sqlite3
+import threading
+from typing import Optional, Callable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+COLUMNS = ["key", "value", "size", "created_at", "accessed_at"]
+
+
+class SQLiteTTLStore:
+    """
+    Table of string values with TTL expiry and least recently used eviction.
+
+    Entries expire ttl_seconds after they were stored. Once the table holds more than
+    max_entries entries or max_bytes bytes of values, the least recently read or written
+    entries are evicted. The store only handles storage: callers derive the keys,
+    serialize the values and keep their own statistics.
+    """
+
+    def __init__(self, path: str, table: str, ttl_seconds: float, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        """
+        Open or create the store.
+
+        Args:
+            path: SQLite file storing the entries (":memory:" keeps them for the process only)
+            table: Name of the table holding the entries
+            ttl_seconds: Time after which an entry is no longer served
+            max_entries: Maximum number of entries kept, or None for no limit
+            max_bytes: Maximum total size of the values in bytes, or None for no limit
+        """
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        columns = [row[1] for row in self._connection.execute(f"PRAGMA table_info({table})").fetchall()]
+        if columns and columns != COLUMNS:
+            # Written by an older version with another schema; cached entries can be dropped
+            self._connection.execute(f"DROP TABLE {table}")
+        self._connection.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)")
+        self._connection.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a value, marking it as recently used.
+
+        Args:
+            key: Key of the entry
+
+        Returns:
+            Stored value, or None on a miss or an expired entry
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._connection.commit()
+                return None
+            if row is None:
+                return None
+            self._connection.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> int:
+        """
+        Store a value, then remove expired entries and evict beyond the limits.
+
+        Values larger than max_bytes are not stored.
+
+        Args:
+            key: Key of the entry
+            value: Value to store
+
+        Returns:
+            Number of entries removed by expiry or eviction
+        """
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        if self.max_bytes is not None and size > self.max_bytes:
+            return 0
+
+        with self._lock:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            removed = self._connection.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            if self.max_entries is not None:
+                removed += self._connection.execute(
+                    f"""DELETE FROM {self.table} WHERE key IN (
+                        SELECT key FROM {self.table} ORDER BY accessed_at DESC, key LIMIT -1 OFFSET ?
+                    )""",
+                    (max(0, self.max_entries),)
+                ).rowcount
+            if self.max_bytes is not None:
+                removed += self._connection.execute(
+                    f"""DELETE FROM {self.table} WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS total FROM {self.table}
+                        ) WHERE total > ?
+                    )""",
+                    (self.max_bytes,)
+                ).rowcount
+            self._connection.commit()
+            return removed
+
+    def size(self) -> Tuple[int, int]:
+        """
+        Get the size of the store.
+
+        Returns:
+            Tuple of (number of entries, total bytes of the values)
+        """
+        with self._lock:
+            entries, total_bytes = self._connection.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+            return entries, total_bytes
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._connection.execute(f"DELETE FROM {self.table}")
+            self._connection.commit()
+
+
+def open_with_fallback(create: Callable[[str], T], path: str, name: str) -> T:
+    """
+    Open a SQLite-backed cache, falling back to an in-memory one if the file cannot be opened.
+
+    Args:
+        create: Function creating the cache from a SQLite path
+        path: SQLite file of the cache (empty for an in-memory cache)
+        name: Name of the cache, used in the warning
+
+    Returns:
+        The cache created by create
+    """
+    try:
+        return create(path or ":memory:")
+    except sqlite3.Error as e:
+        print(f"Warning: Could not open {name} at {path}: {e}. Using an in-memory cache.")
+        return create(":memory:")
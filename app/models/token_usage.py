@@ -0,0 +1,135 @@
+"""
+Token and latency accounting of LLM calls.
+"""
+
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+
+def usage_from_response(response: Any) -> Optional[Tuple[int, int]]:
+    """
+    Get the token usage reported by the provider for a response.
+
+    Understands LangChain messages (usage_metadata or response_metadata.token_usage) and
+    chat completion dictionaries (usage).
+
+    Args:
+        response: LangChain message or chunk, or chat completion dictionary
+
+    Returns:
+        (prompt_tokens, completion_tokens), or None if the provider reported no usage
+    """
+    if isinstance(response, dict):
+        usage = response.get("usage")
+        if usage:
+            return int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0)
+        return None
+
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return int(usage.get("input_tokens") or 0), int(usage.get("output_tokens") or 0)
+    usage = (getattr(response, "response_metadata", None) or {}).get("token_usage")
+    if usage:
+        return int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0)
+    return None
+
+
+class TokenUsage:
+    """Thread-safe totals of the tokens and time spent by a series of LLM calls."""
+
+    def __init__(self):
+        """Initialize empty totals."""
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_seconds = 0.0
+        self.estimated_calls = 0
+        self.trimmed_tokens = 0
+
+    def record(self, prompt_tokens: int, completion_tokens: int, latency_seconds: float, estimated: bool = False) -> None:
+        """
+        Add one LLM call.
+
+        Args:
+            prompt_tokens: Tokens sent
+            completion_tokens: Tokens received
+            latency_seconds: Duration of the call
+            estimated: Whether the counts are estimates because the provider reported no usage
+        """
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.latency_seconds += latency_seconds
+            if estimated:
+                self.estimated_calls += 1
+
+    def record_trim(self, tokens: int) -> None:
+        """
+        Add prompt tokens removed to fit an input budget.
+
+        Args:
+            tokens: Tokens trimmed
+        """
+        with self._lock:
+            self.trimmed_tokens += tokens
+
+    def as_dict(self, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Get the totals, optionally added to totals reported earlier.
+
+        Args:
+            previous: Totals from an earlier as_dict (e.g. of a previous consensus round)
+
+        Returns:
+            Dictionary with calls, prompt_tokens, completion_tokens, total_tokens,
+            latency_seconds, estimated_calls and trimmed_tokens
+        """
+        previous = previous or {}
+        with self._lock:
+            prompt_tokens = previous.get("prompt_tokens", 0) + self.prompt_tokens
+            completion_tokens = previous.get("completion_tokens", 0) + self.completion_tokens
+            return {
+                "calls": previous.get("calls", 0) + self.calls,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "latency_seconds": round(previous.get("latency_seconds", 0.0) + self.latency_seconds, 3),
+                "estimated_calls": previous.get("estimated_calls", 0) + self.estimated_calls,
+                "trimmed_tokens": previous.get("trimmed_tokens", 0) + self.trimmed_tokens
+            }
+
+
+_token_usage: Dict[str, TokenUsage] = {}
+_token_usage_lock = threading.Lock()
+
+
+def get_token_usage(source: str) -> TokenUsage:
+    """
+    Get the process-wide token usage of a source.
+
+    Args:
+        source: Node name, or "chat_completion" for IOIntelligenceClient calls
+
+    Returns:
+        TokenUsage shared by all callers using the source
+    """
+    with _token_usage_lock:
+        usage = _token_usage.get(source)
+        if usage is None:
+            usage = TokenUsage()
+            _token_usage[source] = usage
+        return usage
+
+
+def token_usage_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get the process-wide token usage of every source.
+
+    Returns:
+        Dictionary mapping sources to their totals
+    """
+    with _token_usage_lock:
+        usages = dict(_token_usage)
+    return {source: usage.as_dict() for source, usage in usages.items()}
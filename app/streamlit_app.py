@@ -16,7 +16,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 load_dotenv()
 
 # Import necessary modules
-from app.langraph.main import get_medical_diagnosis, get_medical_diagnosis_with_translation
+from app.langraph.main import get_medical_diagnosis, get_medical_diagnosis_with_translation, get_medical_diagnosis_stream
+from langgraph.graph import END
+from app.langraph.graph import CONSENSUS_TOKEN_EVENT, EXPERT_OPINION_EVENT
+from app.langraph.graph import warm_up_graphs
 try:
     from app.agents.translation_agent import SUPPORTED_LANGUAGES
 except ImportError:
@@ -43,6 +46,11 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource(show_spinner=False)
+def warm_up_diagnosis_graphs():
+    """Compile the diagnosis graphs once when the Streamlit server starts."""
+    return warm_up_graphs()
+
 # Custom CSS for modern styling
 st.markdown("""
 <style>
@@ -270,6 +278,117 @@ def display_progress_steps(current_step=0):
             else:
                 st.markdown(f'<div style="text-align: center;"><div style="background-color: white; color: black; width: 30px; height: 30px; border-radius: 50%; line-height: 30px; border: 2px solid #e0e0e0; margin: 0 auto;">{i+1}</div><div>{step}</div></div>', unsafe_allow_html=True)
 
+# Analysis stages shown while the workflow runs
+ANALYSIS_STAGES = [
+    "Cancer Research",
+    "Source Verification",
+    "Cancer Analysis",
+    "Treatment Analysis",
+    "Consensus Building"
+]
+
+# Number of completed progress steps once each workflow node finishes
+NODE_PROGRESS_STEPS = {
+    "research": 1,
+    "verify_sources": 2,
+    "diagnose": 3,
+    "recommend_treatment": 4,
+    "lung_cancer_analysis": 4,
+    "build_consensus": 5
+}
+
+def display_diagnosis_preview(diagnoses):
+    """Display preliminary diagnoses while the consensus is still being built."""
+    st.subheader("Preliminary Diagnoses")
+    st.caption("The tumor board consensus is still being prepared.")
+    if isinstance(diagnoses, list):
+        for diagnosis in diagnoses:
+            st.markdown(f"- {diagnosis}")
+    else:
+        st.markdown(str(diagnoses))
+
+def run_analysis_with_progress(topic, symptoms, medical_history, test_results, realtime, target_language,
+                               progress_container, status_text, preview_container):
+    """
+    Run the analysis workflow, driving the progress indicator from real node completions.
+    
+    Args:
+        topic: Cancer concern
+        symptoms: Patient symptoms
+        medical_history: Patient medical history
+        test_results: Patient test results
+        realtime: Whether to use real-time research
+        target_language: Target language for translation (optional)
+        progress_container: Placeholder for the progress steps
+        status_text: Placeholder for the status message
+        preview_container: Placeholder for the preliminary diagnoses and the streaming report
+        
+    Returns:
+        Analysis result dictionary
+    """
+    result = None
+    diagnoses_shown = False
+    completed_steps = 0
+    expert_opinions = []
+    report_text = ""
+    last_report_render = 0.0
+    
+    with preview_container.container():
+        diagnosis_placeholder = st.empty()
+        panel_placeholder = st.empty()
+        report_placeholder = st.empty()
+    
+    for node, state, elapsed_ms in get_medical_diagnosis_stream(
+        topic=topic,
+        symptoms=symptoms,
+        medical_history=medical_history,
+        test_results=test_results,
+        realtime=realtime,
+        target_language=target_language
+    ):
+        if node == END:
+            result = state
+            break
+        
+        # Render the consensus report progressively as tokens arrive
+        if node == CONSENSUS_TOKEN_EVENT:
+            report_text += state.get("consensus_delta", "")
+            if time.time() - last_report_render >= 0.1:
+                with report_placeholder.container():
+                    st.subheader("Consensus Report")
+                    st.markdown(report_text + " ▌")
+                last_report_render = time.time()
+            continue
+        
+        # List expert panel opinions as each specialist finishes
+        if node == EXPERT_OPINION_EVENT:
+            expert_opinions.append(state["expert_opinion"])
+            with panel_placeholder.container():
+                st.subheader("Expert Panel")
+                st.caption(f"{len(expert_opinions)} specialist opinion(s) received.")
+                for opinion in expert_opinions:
+                    with st.expander(opinion["persona"].title()):
+                        st.markdown(opinion["analysis"])
+            continue
+        
+        step = NODE_PROGRESS_STEPS.get(node)
+        # Parallel branches may finish out of order, so progress never moves backwards
+        if step is not None and step > completed_steps:
+            completed_steps = step
+            with progress_container.container():
+                display_progress_steps(step)
+            if step < len(ANALYSIS_STAGES):
+                status_text.info(f"In progress: {ANALYSIS_STAGES[step]}... ({elapsed_ms / 1000:.1f}s elapsed)")
+        
+        # Show diagnoses as soon as they exist, without waiting for consensus
+        if node in ("diagnose", "lung_cancer_analysis") and state.get("diagnoses") and not diagnoses_shown:
+            with diagnosis_placeholder.container():
+                display_diagnosis_preview(state["diagnoses"])
+            diagnoses_shown = True
+    
+    preview_container.empty()
+    return result
+
 def display_tags(tags, style="blue"):
     """Display a list of tags with appropriate styling."""
     html_tags = ""
@@ -402,6 +521,13 @@ def display_results(result):
                         st.markdown(f"- {diag}")
             else:
                 st.info(result["diagnoses"] if isinstance(result["diagnoses"], str) else "No diagnostic information available")
+        
+        # Opinions of the multidisciplinary expert panel, when it was convened
+        if result.get("expert_opinions"):
+            st.subheader("Expert Panel Opinions")
+            for opinion in result["expert_opinions"]:
+                with st.expander(opinion["persona"].title()):
+                    st.markdown(opinion["analysis"])
     
     # Tab 3: Treatment Plan
     with tabs[2]:
@@ -810,6 +936,9 @@ def display_results(result):
             st.info("No source information available.")
 
 def main():
+    # Make sure the diagnosis graphs are compiled before the first request
+    warm_up_diagnosis_graphs()
+    
     # Sidebar
     with st.sidebar:
         st.title("Cancer Consensus AI")
@@ -926,54 +1055,33 @@ def main():
         # Analysis process
         progress_container = st.empty()
         status_text = st.empty()
+        preview_container = st.empty()
         result_container = st.empty()
         
         try:
-            # Process stages
-            stages = [
-                "Cancer Research",
-                "Source Verification",
-                "Cancer Analysis",
-                "Treatment Analysis",
-                "Consensus Building"
-            ]
-            
             # Run the actual diagnosis workflow
             with st.spinner("Analyzing cancer information..."):
                 # Show initial progress
                 with progress_container.container():
                     display_progress_steps(0)
-                status_text.info(f"In progress: {stages[0]}...")
-                
-                # Get results with optional translation
-                if target_language:
-                    result = get_medical_diagnosis_with_translation(
-                        topic=topic,
-                        symptoms=symptoms,
-                        medical_history=medical_history,
-                        test_results=test_results,
-                        realtime=use_realtime,
-                        target_language=target_language
-                    )
-                else:
-                    result = get_medical_diagnosis(
-                        topic=topic,
-                        symptoms=symptoms,
-                        medical_history=medical_history,
-                        test_results=test_results,
-                        realtime=use_realtime
-                    )
+                status_text.info(f"In progress: {ANALYSIS_STAGES[0]}...")
                 
-                # Display progress for remaining steps
-                for i in range(1, len(stages)):
-                    with progress_container.container():
-                        display_progress_steps(i)
-                    status_text.info(f"In progress: {stages[i]}...")
-                    time.sleep(0.5)  # Simulate progress
+                # Progress follows the workflow nodes as they complete
+                result = run_analysis_with_progress(
+                    topic=topic,
+                    symptoms=symptoms,
+                    medical_history=medical_history,
+                    test_results=test_results,
+                    realtime=use_realtime,
+                    target_language=target_language,
+                    progress_container=progress_container,
+                    status_text=status_text,
+                    preview_container=preview_container
+                )
             
             # Complete progress indicator
             with progress_container.container():
-                display_progress_steps(len(stages))
+                display_progress_steps(len(ANALYSIS_STAGES))
             status_text.success("Analysis complete!")
             
             # Display results
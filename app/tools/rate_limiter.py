@@ -0,0 +1,382 @@
+"""
+Adaptive per-provider rate limiting of outgoing API requests.
+"""
+
+import os
+import time
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from typing import Dict, Any, Callable, Awaitable, Optional, Tuple, TypeVar
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Longest Retry-After honoured; longer pauses are capped so a run is not blocked for minutes
+RATE_LIMIT_MAX_RETRY_AFTER = float(os.getenv("RATE_LIMIT_MAX_RETRY_AFTER", "60"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3"))
+
+# Requests per second and burst size of each provider
+DEFAULT_RATE_LIMITS = {
+    "iointelligence": (5.0, 10),
+    "openai": (10.0, 20),
+    "serper": (5.0, 10),
+    "google_cse": (1.0, 5),
+    "serpapi": (1.0, 5)
+}
+# Limits of hosts that do not belong to a known provider
+DEFAULT_HOST_RATE_LIMIT = (5.0, 10)
+
+T = TypeVar("T")
+
+
+class RateLimitTimeout(TimeoutError):
+    """Raised when waiting for a rate limiter would exceed the caller's time budget."""
+
+
+def _parse_rate_limits(value: str) -> Dict[str, Tuple[float, int]]:
+    """Parse limits written as "provider=rps:burst,provider=rps:burst"."""
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for item in value.split(","):
+        if "=" in item:
+            provider, limit = item.split("=", 1)
+            rate, _, burst = limit.partition(":")
+            limits[provider.strip()] = (float(rate), int(burst) if burst else max(1, int(float(rate))))
+    return limits
+
+
+RATE_LIMITS = _parse_rate_limits(os.getenv("RATE_LIMITS", ""))
+
+
+def parse_retry_after(headers: Any) -> Optional[float]:
+    """
+    Get the delay requested by a Retry-After (or retry-after-ms) header.
+
+    Args:
+        headers: Response headers (any mapping with case-insensitive or lowercase keys)
+
+    Returns:
+        Delay in seconds, or None if the header is missing or invalid
+    """
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return max(0.0, float(value) / 1000)
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket limiting the request rate of one provider.
+
+    The rate adapts to the provider (AIMD): every 429 response halves it and pauses all
+    requests for the Retry-After delay, and every other response raises it again
+    additively, up to the configured rate.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, min_rate: float = 0.1):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            name: Provider name
+            rate: Maximum requests per second
+            burst: Maximum number of requests sent at once after an idle period
+            min_rate: Rate below which 429 responses no longer slow the limiter down
+        """
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.min_rate = min(min_rate, rate)
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._stats = {"requests": 0, "throttled": 0, "rate_limited": 0, "timed_out": 0, "wait_seconds": 0.0}
+
+    def _refill(self, until: float) -> None:
+        """Add the tokens accrued up to a time. Must be called with the lock held."""
+        if until > self._updated:
+            self._tokens = min(self.burst, self._tokens + (until - self._updated) * self.rate)
+            self._updated = until
+
+    def _reserve(self, max_wait: Optional[float] = None) -> float:
+        """
+        Take a token, possibly in advance. Returns the seconds to wait before sending.
+
+        Raises RateLimitTimeout, without taking the token, if the wait would exceed max_wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._blocked_until)
+            self._refill(start)
+            wait = (start - now) + max(0.0, 1 - self._tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                self._stats["timed_out"] += 1
+                raise RateLimitTimeout(f"Rate limiter of {self.name} needs {wait:.1f}s, more than the {max(0.0, max_wait):.1f}s left")
+            self._tokens -= 1
+
+            self._stats["requests"] += 1
+            if wait > 0:
+                self._stats["throttled"] += 1
+                self._stats["wait_seconds"] += wait
+            return wait
+
+    def acquire(self, max_wait: Optional[float] = None) -> None:
+        """
+        Wait until a request may be sent.
+
+        Args:
+            max_wait: Longest wait acceptable to the caller in seconds (None: unlimited)
+
+        Raises:
+            RateLimitTimeout: If the request could not be sent within max_wait
+        """
+        if not RATE_LIMIT_ENABLED:
+            return
+        wait = self._reserve(max_wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, max_wait: Optional[float] = None) -> None:
+        """Async version of acquire."""
+        if not RATE_LIMIT_ENABLED:
+            return
+        wait = self._reserve(max_wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, status_code: Optional[int], headers: Any = None) -> None:
+        """
+        Adapt the rate to a response of the provider.
+
+        Args:
+            status_code: HTTP status of the response
+            headers: Response headers (for Retry-After)
+        """
+        with self._lock:
+            if status_code != 429:
+                if status_code is not None and status_code < 500:
+                    self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+                return
+
+            self._stats["rate_limited"] += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            retry_after = parse_retry_after(headers)
+            if retry_after is None:
+                retry_after = 1 / self.rate
+            # Pause everyone and let a single request probe the provider after the pause
+            now = time.monotonic()
+            blocked_until = now + min(retry_after, RATE_LIMIT_MAX_RETRY_AFTER)
+            if blocked_until > self._blocked_until:
+                self._refill(now)
+                self._blocked_until = blocked_until
+                self._updated = blocked_until
+                self._tokens = min(self._tokens, 1.0)
+            print(f"Rate limited by {self.name}: pausing {min(retry_after, RATE_LIMIT_MAX_RETRY_AFTER):.1f}s, "
+                  f"rate lowered to {self.rate:.2f} req/s")
+
+    def record_exception(self, exc: BaseException) -> None:
+        """
+        Adapt the rate to a failed request, if the exception carries an HTTP response.
+
+        Understands requests, httpx and OpenAI SDK errors (.response) and Google API
+        client errors (.resp).
+
+        Args:
+            exc: Exception raised by the request
+        """
+        response = getattr(exc, "response", None)
+        if response is not None and getattr(response, "status_code", None) is not None:
+            self.record(response.status_code, response.headers)
+            return
+        resp = getattr(exc, "resp", None)
+        if resp is not None and getattr(resp, "status", None) is not None:
+            self.record(int(resp.status), resp)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the limiter counters.
+
+        Returns:
+            Dictionary with requests, throttled, rate_limited, timed_out, wait_seconds and the current rate
+        """
+        with self._lock:
+            return {**self._stats, "wait_seconds": round(self._stats["wait_seconds"], 2), "rate": round(self.rate, 2)}
+
+
+_rate_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> AdaptiveRateLimiter:
+    """
+    Get the process-wide rate limiter of a provider.
+
+    Args:
+        provider: Provider name (iointelligence, openai, serper, google_cse, serpapi) or host name
+
+    Returns:
+        AdaptiveRateLimiter shared by all agents
+    """
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(provider)
+        if limiter is None:
+            rate, burst = RATE_LIMITS.get(provider, DEFAULT_HOST_RATE_LIMIT)
+            limiter = AdaptiveRateLimiter(provider, rate, burst)
+            _rate_limiters[provider] = limiter
+        return limiter
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get the counters of every rate limiter.
+
+    Returns:
+        Dictionary mapping provider names to their statistics
+    """
+    with _rate_limiters_lock:
+        limiters = list(_rate_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+def provider_for_url(url: Any) -> str:
+    """
+    Get the provider serving a URL.
+
+    Args:
+        url: Request URL (string or httpx.URL)
+
+    Returns:
+        Provider name, or the host name for hosts of unknown providers
+    """
+    # Hosts are compared with their ports, so a local server (e.g. app.tools.stub_server)
+    # configured through IOINTELLIGENCE_BASE_URL or SERPER_SEARCH_URL maps to its provider
+    host = urlparse(str(url)).netloc
+    provider_hosts = {
+        "iointelligence": urlparse(os.getenv("IOINTELLIGENCE_BASE_URL", "https://api.intelligence.io.solutions/api/v1/")).netloc,
+        "openai": "api.openai.com",
+        "serper": urlparse(os.getenv("SERPER_SEARCH_URL", "https://google.serper.dev/search")).netloc,
+        "google_cse": "www.googleapis.com",
+        "serpapi": "serpapi.com"
+    }
+    for provider, provider_host in provider_hosts.items():
+        if host == provider_host:
+            return provider
+    return urlparse(str(url)).hostname or ""
+
+
+def _time_left(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left before a time.monotonic() deadline (None: no deadline)."""
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def call_with_rate_limit(provider: str, send: Callable[[], T], max_retries: int = RATE_LIMIT_MAX_RETRIES,
+                         max_wait: Optional[float] = None) -> T:
+    """
+    Send a request through the provider's rate limiter, retrying 429 responses.
+
+    Each retry waits for the limiter, which honours the Retry-After of the 429, unless the
+    wait would not fit in the caller's time budget: then the 429 is returned instead.
+
+    Args:
+        provider: Provider name
+        send: Function sending the request and returning a response with status_code and headers
+        max_retries: Maximum number of retries after 429 responses
+        max_wait: Time budget of the whole call in seconds, e.g. the request timeout (None: unlimited)
+
+    Returns:
+        Last response (still a 429 if every retry was rate limited or the budget ran out)
+
+    Raises:
+        RateLimitTimeout: If not even the first request could be sent within max_wait
+    """
+    limiter = get_rate_limiter(provider)
+    deadline = None if max_wait is None else time.monotonic() + max_wait
+    response = None
+    for attempt in range(max_retries + 1):
+        try:
+            limiter.acquire(_time_left(deadline))
+        except RateLimitTimeout:
+            if response is None:
+                raise
+            return response
+        response = send()
+        limiter.record(response.status_code, response.headers)
+        if response.status_code != 429 or attempt == max_retries:
+            return response
+    return response
+
+
+async def acall_with_rate_limit(provider: str, send: Callable[[], Awaitable[T]], max_retries: int = RATE_LIMIT_MAX_RETRIES,
+                                max_wait: Optional[float] = None) -> T:
+    """Async version of call_with_rate_limit."""
+    limiter = get_rate_limiter(provider)
+    deadline = None if max_wait is None else time.monotonic() + max_wait
+    response = None
+    for attempt in range(max_retries + 1):
+        try:
+            await limiter.aacquire(_time_left(deadline))
+        except RateLimitTimeout:
+            if response is None:
+                raise
+            return response
+        response = await send()
+        limiter.record(response.status_code, response.headers)
+        if response.status_code != 429 or attempt == max_retries:
+            return response
+    return response
+
+
+def _request_max_wait(request: Any) -> Optional[float]:
+    """Longest limiter wait of an httpx request: its timeout (e.g. bound to the run deadline)."""
+    timeouts = getattr(request, "extensions", {}).get("timeout") or {}
+    return timeouts.get("pool") or timeouts.get("read")
+
+
+def httpx_event_hooks() -> Dict[str, list]:
+    """
+    Event hooks rate limiting every request of a synchronous httpx client by provider.
+
+    A request whose limiter wait would exceed its timeout fails with RateLimitTimeout.
+
+    Returns:
+        Dictionary to pass as event_hooks to httpx.Client
+    """
+    def on_request(request: Any) -> None:
+        get_rate_limiter(provider_for_url(request.url)).acquire(_request_max_wait(request))
+
+    def on_response(response: Any) -> None:
+        get_rate_limiter(provider_for_url(response.request.url)).record(response.status_code, response.headers)
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def async_httpx_event_hooks() -> Dict[str, list]:
+    """
+    Event hooks rate limiting every request of an httpx.AsyncClient by provider.
+
+    Returns:
+        Dictionary to pass as event_hooks to httpx.AsyncClient
+    """
+    async def on_request(request: Any) -> None:
+        await get_rate_limiter(provider_for_url(request.url)).aacquire(_request_max_wait(request))
+
+    async def on_response(response: Any) -> None:
+        get_rate_limiter(provider_for_url(response.request.url)).record(response.status_code, response.headers)
+
+    return {"request": [on_request], "response": [on_response]}
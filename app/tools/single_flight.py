@@ -0,0 +1,239 @@
+"""
+Coalescing of identical in-flight calls (single flight).
+"""
+
+import os
+import asyncio
+import threading
+from concurrent.futures import Future, CancelledError, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Callable, Awaitable, Hashable, Optional, Tuple, TypeVar
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+T = TypeVar("T")
+
+
+class _Call:
+    """One in-flight call and the callers waiting for it."""
+
+    def __init__(self):
+        """Initialize a call with its leading caller as the only waiter."""
+        self.future = Future()
+        self.waiters = 1
+        # Cancels the leading task once every caller has left (async leaders only)
+        self.cancel: Optional[Callable[[], None]] = None
+
+
+def _cancelling() -> bool:
+    """Whether cancellation of the current task was requested (not detectable before Python 3.11)."""
+    task = asyncio.current_task()
+    cancelling = getattr(task, "cancelling", None)
+    return bool(cancelling and cancelling())
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call among concurrent callers with the same key.
+
+    The first caller of a key runs the call; callers arriving while it is in flight wait for
+    its result (or exception) instead of repeating it. Results are kept in a
+    concurrent.futures.Future, so callers in other threads and other event loops are
+    coalesced too. Nothing is cached once the call completes.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize the single flight group.
+
+        Args:
+            name: Name of the group, used in the statistics
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"calls": 0, "coalesced": 0, "abandoned": 0}
+
+    def _join(self, key: Hashable) -> Tuple[_Call, bool]:
+        """Get the in-flight call of a key, or register a new one. Returns (call, is_leader)."""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats["coalesced"] += 1
+                call.waiters += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            return call, True
+
+    def _finish(self, key: Hashable, call: _Call) -> None:
+        """Unregister a completed call."""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def _leave(self, key: Hashable, call: _Call) -> None:
+        """Withdraw a cancelled caller, cancelling the call if nobody waits for it anymore."""
+        with self._lock:
+            call.waiters -= 1
+            if call.waiters > 0 or call.cancel is None or call.future.done():
+                return
+            self._stats["abandoned"] += 1
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            cancel = call.cancel
+        cancel()
+
+    def do(self, key: Hashable, fn: Callable[[], T], timeout: Optional[float] = None) -> T:
+        """
+        Run a call, or wait for the identical call already in flight.
+
+        Args:
+            key: Identity of the call (must cover everything the result depends on)
+            fn: Function performing the call
+            timeout: Longest time to wait for a call already in flight (the caller's remaining
+                time budget), or None to wait until it completes
+
+        Returns:
+            Result of the call, shared by all coalesced callers
+
+        Raises:
+            TimeoutError: If the call in flight did not complete within the timeout
+        """
+        if not SINGLE_FLIGHT_ENABLED:
+            return fn()
+
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return call.future.result(timeout=timeout)
+            except CancelledError:
+                # The leading call was abandoned; run it again
+                continue
+            except FutureTimeoutError:
+                self._leave(key, call)
+                raise TimeoutError(f"Timed out after {timeout:.1f}s waiting for the in-flight {self.name} call") from None
+
+        future = call.future
+        try:
+            result = fn()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._finish(key, call)
+
+    async def ado(self, key: Hashable, coro_fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Async version of do.
+
+        The leading call runs as a task shielded from the cancellation of its caller, so a
+        caller timing out does not cancel the call for the others. Once every caller waiting
+        for it has been cancelled, the task is cancelled too, aborting its LLM or HTTP request.
+
+        Args:
+            key: Identity of the call (must cover everything the result depends on)
+            coro_fn: Function returning the awaitable performing the call
+
+        Returns:
+            Result of the call, shared by all coalesced callers
+        """
+        if not SINGLE_FLIGHT_ENABLED:
+            return await coro_fn()
+
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return await asyncio.shield(asyncio.wrap_future(call.future))
+            except asyncio.CancelledError:
+                if _cancelling() or not call.future.cancelled():
+                    self._leave(key, call)
+                    raise
+                # Only the leading call was abandoned; run it again
+
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(coro_fn())
+
+        def cancel() -> None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                # The leader's event loop is already closed, and the task with it
+                pass
+
+        call.cancel = cancel
+        task.add_done_callback(lambda done: self._settle(key, call, done))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done():
+                self._leave(key, call)
+            raise
+
+    def _settle(self, key: Hashable, call: _Call, task: "asyncio.Future") -> None:
+        """Publish the outcome of a leading task to the coalesced callers."""
+        if task.cancelled():
+            call.future.cancel()
+        elif task.exception() is not None:
+            call.future.set_exception(task.exception())
+        else:
+            call.future.set_result(task.result())
+        self._finish(key, call)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the coalescing counters.
+
+        Returns:
+            Dictionary with calls, coalesced, abandoned and in_flight
+        """
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
+
+
+_single_flights: Dict[str, SingleFlight] = {}
+_single_flights_lock = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """
+    Get the process-wide single flight group of a name.
+
+    Args:
+        name: Name of the group (e.g. "web_search")
+
+    Returns:
+        SingleFlight shared by all callers using the name
+    """
+    with _single_flights_lock:
+        group = _single_flights.get(name)
+        if group is None:
+            group = SingleFlight(name)
+            _single_flights[name] = group
+        return group
+
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get the coalescing counters of every group.
+
+    Returns:
+        Dictionary mapping group names to their statistics
+    """
+    with _single_flights_lock:
+        groups = list(_single_flights.values())
+    return {group.name: group.stats() for group in groups}
@@ -0,0 +1,407 @@
+"""
+Local OpenAI-compatible and Serper-compatible stub server for load testing.
+
+Point the real clients at it to exercise pooling, rate limiting and retries without
+calling IO.net or Serper:
+
+    python -m app.tools.stub_server --port 8900 --latency lognormal:0.8:0.5 --rate-limit-rate 0.02
+
+    IOINTELLIGENCE_BASE_URL=http://127.0.0.1:8900/api/v1/
+    SERPER_SEARCH_URL=http://127.0.0.1:8900/search
+
+Responses are deterministic functions of the request, so runs are comparable; latency
+and fault injection are drawn from a seeded random generator.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Callable
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Domains of the stub search results; links carry them so the trusted-domain filters and the
+# source verifier treat the results like real ones, while pages are still served by the stub
+STUB_DOMAINS = [
+    "cancer.gov/types/lung", "nih.gov", "lungcancer.org", "mayoclinic.org/lung-cancer",
+    "who.int", "nejm.org", "cancer.org/cancer/lung-cancer", "example-health-blog.com"
+]
+
+WORDS = (
+    "patients with non small cell lung cancer often present with persistent cough chest pain "
+    "weight loss and dyspnea staging relies on computed tomography and biopsy targeted therapy "
+    "immunotherapy and chemotherapy improve survival outcomes in selected cohorts clinical trials "
+    "continue to evaluate combination regimens and biomarker driven treatment selection"
+).split()
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution.
+
+    Supported forms (seconds): "fixed:0.2", "uniform:0.1:0.5", "normal:0.3:0.1",
+    "lognormal:median:sigma" and "exponential:mean".
+
+    Args:
+        spec: Distribution specification
+
+    Returns:
+        Function drawing a latency from a random generator
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(":") if value]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(0, values[1]) * values[0]
+    if kind == "exponential":
+        return lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class StubConfig:
+    """Behaviour of the stub server."""
+
+    def __init__(self, args: argparse.Namespace):
+        """
+        Initialize the configuration from the command line.
+
+        Args:
+            args: Parsed command line arguments
+        """
+        self.latency = {
+            "chat": parse_latency(args.chat_latency or args.latency),
+            "embeddings": parse_latency(args.embeddings_latency or args.latency),
+            "search": parse_latency(args.search_latency or args.latency),
+            "pages": parse_latency(args.latency)
+        }
+        self.token_delay = args.token_delay
+        self.completion_tokens = args.completion_tokens
+        self.embedding_dim = args.embedding_dim
+        self.max_batch = args.max_batch
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.retry_after = args.retry_after
+        self.max_in_flight = args.max_in_flight
+        self.search_results = args.search_results
+
+        self._rng = random.Random(args.seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def draw(self, kind: str) -> Dict[str, Any]:
+        """Draw the latency and the injected fault of one request."""
+        with self._lock:
+            latency = self.latency[kind](self._rng)
+            roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            return {"latency": latency, "fault": 429}
+        if roll < self.rate_limit_rate + self.error_rate:
+            return {"latency": latency, "fault": 500}
+        return {"latency": latency, "fault": None}
+
+    def enter(self) -> bool:
+        """Count a request in flight. Returns False if the concurrency limit is exceeded."""
+        with self._lock:
+            if self.max_in_flight and self._in_flight >= self.max_in_flight:
+                return False
+            self._in_flight += 1
+            return True
+
+    def leave(self) -> None:
+        """Count a finished request."""
+        with self._lock:
+            self._in_flight -= 1
+
+    def count(self, kind: str, outcome: str) -> None:
+        """Count a request outcome."""
+        with self._lock:
+            counters = self.stats.setdefault(kind, {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0})
+            counters["requests"] += 1
+            counters[outcome] += 1
+
+
+def _seed(*parts: Any) -> int:
+    """Deterministic seed of a request."""
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def _estimate_tokens(text: str) -> int:
+    """About 4 characters per token."""
+    return max(1, (len(text) + 3) // 4)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler of the stub server."""
+
+    protocol_version = "HTTP/1.1"
+    config: StubConfig = None
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Keep the console quiet under load."""
+
+    def _body(self) -> Dict[str, Any]:
+        """Read the JSON request body."""
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        """Send a JSON response on the kept-alive connection."""
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str, headers: Optional[Dict[str, str]] = None) -> None:
+        """Send an OpenAI-style error."""
+        self._send_json(status, {"error": {"message": message, "type": "stub_error", "code": status}}, headers)
+
+    def _handle(self, kind: str, respond: Callable[[], None]) -> None:
+        """Apply the concurrency limit, latency and fault injection, then respond."""
+        config = self.config
+        if not config.enter():
+            config.count(kind, "rate_limited")
+            self._send_error(429, "Too many concurrent requests", {"Retry-After": str(config.retry_after)})
+            return
+        try:
+            draw = config.draw(kind)
+            time.sleep(draw["latency"])
+            if draw["fault"] == 429:
+                config.count(kind, "rate_limited")
+                self._send_error(429, "Rate limit exceeded", {"Retry-After": str(config.retry_after)})
+            elif draw["fault"] == 500:
+                config.count(kind, "errors")
+                self._send_error(500, "Injected server error")
+            else:
+                respond()
+                config.count(kind, "ok")
+        finally:
+            config.leave()
+
+    def do_GET(self) -> None:
+        """Serve the model list, statistics and the pages linked by search results."""
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": "stub-model", "object": "model", "created": 0, "owned_by": "stub"}
+            ]})
+        elif self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.config.stats)
+        elif self.path.startswith("/pages/"):
+            self._handle("pages", self._page)
+        else:
+            self._send_error(404, f"Unknown path {self.path}")
+
+    def do_POST(self) -> None:
+        """Serve chat completions, embeddings and Serper searches."""
+        body = self._body()
+        path = self.path.rstrip("/")
+        if path.endswith("/chat/completions"):
+            self._handle("chat", lambda: self._chat(body))
+        elif path.endswith("/embeddings"):
+            self._handle("embeddings", lambda: self._embeddings(body))
+        elif path.endswith("/search"):
+            self._handle("search", lambda: self._search(body))
+        else:
+            self._send_error(404, f"Unknown path {self.path}")
+
+    def _completion_words(self, body: Dict[str, Any]) -> List[str]:
+        """Deterministic completion of a chat request."""
+        rng = random.Random(_seed(body.get("model"), body.get("messages")))
+        count = min(self.config.completion_tokens, body.get("max_tokens") or self.config.completion_tokens)
+        return [rng.choice(WORDS) for _ in range(count)]
+
+    def _chat(self, body: Dict[str, Any]) -> None:
+        """Answer a chat completion, streamed as server-sent events if requested."""
+        messages = body.get("messages") or []
+        prompt_tokens = sum(_estimate_tokens(str(message.get("content") or "")) for message in messages)
+        words = self._completion_words(body)
+        model = body.get("model") or "stub-model"
+        completion_id = f"chatcmpl-stub-{_seed(model, messages) % 10 ** 12}"
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                 "total_tokens": prompt_tokens + len(words)}
+
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)},
+                             "finish_reason": "stop"}],
+                "usage": usage
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra: Any) -> Dict[str, Any]:
+            choices = [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else []
+            return {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model, "choices": choices, **extra}
+
+        self._send_event(chunk({"role": "assistant", "content": ""}))
+        for index, word in enumerate(words):
+            time.sleep(self.config.token_delay)
+            self._send_event(chunk({"content": word if index == 0 else f" {word}"}))
+        self._send_event(chunk({}, "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._send_event(chunk(None, usage=usage))
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _send_event(self, payload: Dict[str, Any]) -> None:
+        """Send one server-sent event."""
+        self._send_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def _send_chunk(self, data: bytes) -> None:
+        """Send one chunk of a chunked response (an empty chunk ends the response)."""
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _embeddings(self, body: Dict[str, Any]) -> None:
+        """Answer an embeddings request with deterministic unit vectors."""
+        inputs = body.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        if len(inputs) > self.config.max_batch:
+            self._send_error(400, f"Too many inputs: {len(inputs)} > {self.config.max_batch}")
+            return
+
+        data = []
+        for index, text in enumerate(inputs):
+            rng = random.Random(_seed(body.get("model"), text))
+            vector = [rng.gauss(0, 1) for _ in range(self.config.embedding_dim)]
+            norm = sum(value * value for value in vector) ** 0.5 or 1.0
+            data.append({"object": "embedding", "index": index, "embedding": [value / norm for value in vector]})
+        tokens = sum(_estimate_tokens(str(text)) for text in inputs)
+        self._send_json(200, {"object": "list", "data": data, "model": body.get("model") or "stub-embedding",
+                              "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+    def _search(self, body: Dict[str, Any]) -> None:
+        """Answer a Serper search with deterministic organic results."""
+        query = str(body.get("q") or "")
+        count = min(int(body.get("num") or 10), self.config.search_results)
+        rng = random.Random(_seed(query))
+        host = self.headers.get("Host") or f"127.0.0.1:{self.server.server_port}"
+        organic = []
+        for position in range(1, count + 1):
+            domain = rng.choice(STUB_DOMAINS)
+            slug = f"{re.sub(r'[^a-z0-9]+', '-', query.lower()).strip('-')[:40]}-{position}"
+            organic.append({
+                "title": f"{query.title()} - result {position}",
+                "link": f"http://{host}/pages/{domain}/{slug}",
+                "snippet": " ".join(rng.choice(WORDS) for _ in range(30)).capitalize() + ".",
+                "position": position
+            })
+        self._send_json(200, {"searchParameters": {"q": query, "num": count, "engine": "stub"}, "organic": organic})
+
+    def _page(self) -> None:
+        """Serve a deterministic article for a search result link."""
+        rng = random.Random(_seed(self.path))
+        paragraphs = "".join(
+            f"<p>{' '.join(rng.choice(WORDS) for _ in range(60)).capitalize()}.</p>" for _ in range(5)
+        )
+        body = f"<html><head><title>{self.path}</title></head><body><article>{paragraphs}</article></body></html>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_stub_server(args: argparse.Namespace) -> ThreadingHTTPServer:
+    """
+    Create the stub server.
+
+    Args:
+        args: Parsed command line arguments (see parse_args)
+
+    Returns:
+        Server ready for serve_forever(); each connection is served by its own thread
+    """
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": StubConfig(args)})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse the stub server options. Defaults come from STUB_* environment variables.
+
+    Args:
+        argv: Command line arguments (defaults to sys.argv)
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="OpenAI- and Serper-compatible stub server for load testing")
+    parser.add_argument("--host", default=os.getenv("STUB_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("STUB_PORT", "8900")))
+    parser.add_argument("--latency", default=os.getenv("STUB_LATENCY", "lognormal:0.5:0.4"),
+                        help="Latency distribution of every endpoint, e.g. fixed:0.2, uniform:0.1:0.5, "
+                             "normal:0.3:0.1, lognormal:median:sigma, exponential:mean")
+    parser.add_argument("--chat-latency", default=os.getenv("STUB_CHAT_LATENCY"),
+                        help="Latency of chat completions (before the first token when streaming)")
+    parser.add_argument("--embeddings-latency", default=os.getenv("STUB_EMBEDDINGS_LATENCY"))
+    parser.add_argument("--search-latency", default=os.getenv("STUB_SEARCH_LATENCY"))
+    parser.add_argument("--token-delay", type=float, default=float(os.getenv("STUB_TOKEN_DELAY", "0.02")),
+                        help="Seconds between streamed tokens")
+    parser.add_argument("--completion-tokens", type=int, default=int(os.getenv("STUB_COMPLETION_TOKENS", "200")))
+    parser.add_argument("--embedding-dim", type=int, default=int(os.getenv("STUB_EMBEDDING_DIM", "384")))
+    parser.add_argument("--max-batch", type=int, default=int(os.getenv("STUB_MAX_BATCH", "256")),
+                        help="Maximum inputs per embeddings request")
+    parser.add_argument("--search-results", type=int, default=int(os.getenv("STUB_SEARCH_RESULTS", "30")))
+    parser.add_argument("--error-rate", type=float, default=float(os.getenv("STUB_ERROR_RATE", "0")),
+                        help="Fraction of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=float(os.getenv("STUB_RATE_LIMIT_RATE", "0")),
+                        help="Fraction of requests rejected with 429")
+    parser.add_argument("--retry-after", type=float, default=float(os.getenv("STUB_RETRY_AFTER", "1")),
+                        help="Retry-After of 429 responses in seconds")
+    parser.add_argument("--max-in-flight", type=int, default=int(os.getenv("STUB_MAX_IN_FLIGHT", "0")),
+                        help="Concurrent requests above which 429 is returned (0: unlimited)")
+    parser.add_argument("--seed", type=int, default=int(os.getenv("STUB_SEED", "0")))
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the stub server until interrupted."""
+    args = parse_args(argv)
+    server = create_stub_server(args)
+    print(f"Stub server listening on http://{args.host}:{args.port} "
+          f"(OpenAI API at /api/v1/, Serper at /search, statistics at /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
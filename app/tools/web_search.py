@@ -4,8 +4,13 @@ Web search tools for the researcher agent.
 
 import os
 import json
+import asyncio
+import weakref
 import requests
+import httpx
 import time
+import threading
+from collections import OrderedDict
 from functools import lru_cache
 from bs4 import BeautifulSoup
 from typing import List, Dict, Any, Optional, Type, Annotated
@@ -14,6 +19,9 @@ from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 from googleapiclient.discovery import build
 
+from app.tools.single_flight import get_single_flight
+from app.tools.rate_limiter import get_rate_limiter, call_with_rate_limit, acall_with_rate_limit, RateLimitTimeout
+
 # List of trusted lung cancer-specific medical domains
 TRUSTED_DOMAINS = [
     # Tổ chức chuyên về ung thư phổi
@@ -50,10 +58,12 @@ def create_default_session(timeout: int = 10):
     from requests.adapters import HTTPAdapter
     from urllib3.util.retry import Retry
     
+    # 429 responses are not retried here: call_with_rate_limit retries them after the
+    # provider's Retry-After, shared with every other request to the provider
     retry_strategy = Retry(
         total=3,
         backoff_factor=1,
-        status_forcelist=[429, 500, 502, 503, 504],
+        status_forcelist=[500, 502, 503, 504],
     )
     adapter = HTTPAdapter(max_retries=retry_strategy)
     session = requests.Session()
@@ -63,26 +73,66 @@ def create_default_session(timeout: int = 10):
 
 default_session = create_default_session()
 
-@lru_cache(maxsize=32)
-def web_search(query: str, num_results: int = 12, use_trusted_domains: bool = True) -> List[Dict[str, Any]]:
+SERPER_SEARCH_URL = os.getenv("SERPER_SEARCH_URL", "https://google.serper.dev/search")
+
+# LRU cache of successful searches shared by web_search and async_web_search.
+# The request timeout is not part of the key, so a cached result is reused whatever deadline the caller has.
+_search_cache: "OrderedDict[tuple, List[Dict[str, Any]]]" = OrderedDict()
+_SEARCH_CACHE_SIZE = 32
+_search_cache_lock = threading.Lock()
+
+def _get_cached_search(cache_key: tuple) -> Optional[List[Dict[str, Any]]]:
+    """Return a cached search result, marking it as recently used."""
+    with _search_cache_lock:
+        if cache_key in _search_cache:
+            _search_cache.move_to_end(cache_key)
+            return _search_cache[cache_key]
+    return None
+
+def _store_cached_search(cache_key: tuple, search_results: List[Dict[str, Any]]) -> None:
+    """Store a successful search result, evicting the least recently used entry."""
+    with _search_cache_lock:
+        _search_cache[cache_key] = search_results
+        if len(_search_cache) > _SEARCH_CACHE_SIZE:
+            _search_cache.popitem(last=False)
+
+def web_search(query: str, num_results: int = 12, use_trusted_domains: bool = True, timeout: float = 15) -> List[Dict[str, Any]]:
     """
     Perform a web search and return the results.
     
+    Concurrent identical searches (sync or async, from any thread) share one request.
+    
     Args:
         query: The search query
         num_results: Number of results to return
         use_trusted_domains: Whether to filter results to trusted medical domains
+        timeout: Request timeout in seconds
         
     Returns:
         List of search results with title, snippet and url
     """
+    cache_key = (query, num_results, use_trusted_domains)
+    # Callers get their own list: the cached list and the one shared by coalesced callers
+    # must not see the results a caller appends
+    cached = _get_cached_search(cache_key)
+    if cached is not None:
+        return list(cached)
+    
+    try:
+        return list(get_single_flight("web_search").do(
+            cache_key, lambda: _web_search(cache_key, query, num_results, use_trusted_domains, timeout), timeout=timeout
+        ))
+    except TimeoutError as e:
+        print(f"Error during web search: {str(e)}")
+        return [{"title": "Search Error", "snippet": f"Error: {str(e)}", "link": ""}]
+
+def _web_search(cache_key: tuple, query: str, num_results: int, use_trusted_domains: bool, timeout: float) -> List[Dict[str, Any]]:
+    """Search the Serper API and cache successful results."""
     api_key = os.environ.get('SERPER_API_KEY')
     if not api_key:
         print("Warning: SERPER_API_KEY environment variable not set")
         return [{"title": "No API key found", "snippet": "Please set the SERPER_API_KEY environment variable", "link": ""}]
     
-    url = "https://google.serper.dev/search"
-    
     payload = {
         "q": query,
         "gl": "us",
@@ -98,61 +148,168 @@ def web_search(query: str, num_results: int = 12, use_trusted_domains: bool = Tr
     try:
         # Use session with timeout
         session = default_session
-        response = session.post(url, headers=headers, json=payload, timeout=15)
+        response = call_with_rate_limit(
+            "serper", lambda: session.post(SERPER_SEARCH_URL, headers=headers, json=payload, timeout=timeout),
+            max_wait=timeout
+        )
         response.raise_for_status()
         
         search_results = []
         if response.status_code == 200:
             result = response.json()
-            organic = result.get("organic", [])
+            search_results = _filter_search_results(result.get("organic", []), num_results, use_trusted_domains)
+            _store_cached_search(cache_key, search_results)
+        
+        return search_results
+    except (requests.exceptions.RequestException, RateLimitTimeout, ValueError) as e:
+        # Network errors, the rate limiter running out of time and malformed responses
+        print(f"Error during web search: {str(e)}")
+        return [{"title": "Search Error", "snippet": f"Error: {str(e)}", "link": ""}]
+
+
+def _filter_search_results(organic: List[Dict[str, Any]], num_results: int, use_trusted_domains: bool) -> List[Dict[str, Any]]:
+    """
+    Select search results from Serper organic results, preferring trusted domains.
+    
+    Args:
+        organic: Organic results from the Serper API
+        num_results: Number of results to return
+        use_trusted_domains: Whether to filter results to trusted medical domains
+        
+    Returns:
+        List of search results with title, snippet and url
+    """
+    search_results = []
+    for item in organic:
+        title = item.get("title", "")
+        snippet = item.get("snippet", "")
+        link = item.get("link", "")
+        
+        # Filter results by trusted domains if requested
+        if use_trusted_domains:
+            if any(domain in link.lower() for domain in TRUSTED_DOMAINS):
+                search_results.append({
+                    "title": title,
+                    "snippet": snippet,
+                    "link": link
+                })
+        else:
+            search_results.append({
+                "title": title,
+                "snippet": snippet,
+                "link": link
+            })
+        
+        if len(search_results) >= num_results:
+            break
+    
+    # If not enough results from trusted domains, add other results
+    if len(search_results) < num_results and use_trusted_domains:
+        for item in organic:
+            title = item.get("title", "")
+            snippet = item.get("snippet", "")
+            link = item.get("link", "")
             
-            for item in organic:
-                title = item.get("title", "")
-                snippet = item.get("snippet", "")
-                link = item.get("link", "")
-                
-                # Filter results by trusted domains if requested
-                if use_trusted_domains:
-                    if any(domain in link.lower() for domain in TRUSTED_DOMAINS):
-                        search_results.append({
-                            "title": title,
-                            "snippet": snippet,
-                            "link": link
-                        })
-                else:
-                    search_results.append({
-                        "title": title,
-                        "snippet": snippet,
-                        "link": link
-                    })
+            if not any(domain in link.lower() for domain in TRUSTED_DOMAINS):
+                search_results.append({
+                    "title": title,
+                    "snippet": snippet,
+                    "link": link
+                })
                 
                 if len(search_results) >= num_results:
                     break
-            
-            # If not enough results from trusted domains, add other results
-            if len(search_results) < num_results and use_trusted_domains:
-                for item in organic:
-                    title = item.get("title", "")
-                    snippet = item.get("snippet", "")
-                    link = item.get("link", "")
-                    
-                    if not any(domain in link.lower() for domain in TRUSTED_DOMAINS):
-                        search_results.append({
-                            "title": title,
-                            "snippet": snippet,
-                            "link": link
-                        })
-                        
-                        if len(search_results) >= num_results:
-                            break
+    
+    return search_results
+
+
+# Async HTTP clients are bound to the event loop that created them, so keep one per loop
+_async_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def get_async_session() -> httpx.AsyncClient:
+    """
+    Get the shared async HTTP client for the running event loop.
+    
+    Returns:
+        httpx.AsyncClient shared by all async searches on this loop
+    """
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.is_closed:
+        session = httpx.AsyncClient(
+            timeout=httpx.Timeout(15.0),
+            transport=httpx.AsyncHTTPTransport(retries=3)
+        )
+        _async_sessions[loop] = session
+    return session
+
+async def close_async_session() -> None:
+    """Close the shared async HTTP client of the running event loop, if any."""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.is_closed:
+        await session.aclose()
+
+async def async_web_search(query: str, num_results: int = 12, use_trusted_domains: bool = True, timeout: float = 15) -> List[Dict[str, Any]]:
+    """
+    Perform a web search without blocking the event loop.
+    
+    Concurrent identical searches (sync or async, from any thread) share one request.
+    
+    Args:
+        query: The search query
+        num_results: Number of results to return
+        use_trusted_domains: Whether to filter results to trusted medical domains
+        timeout: Request timeout in seconds
+        
+    Returns:
+        List of search results with title, snippet and url
+    """
+    cache_key = (query, num_results, use_trusted_domains)
+    # Callers get their own list: the cached list and the one shared by coalesced callers
+    # must not see the results a caller appends
+    cached = _get_cached_search(cache_key)
+    if cached is not None:
+        return list(cached)
+    
+    return list(await get_single_flight("web_search").ado(
+        cache_key, lambda: _async_web_search(cache_key, query, num_results, use_trusted_domains, timeout)
+    ))
+
+async def _async_web_search(cache_key: tuple, query: str, num_results: int, use_trusted_domains: bool, timeout: float) -> List[Dict[str, Any]]:
+    """Search the Serper API without blocking the event loop and cache successful results."""
+    api_key = os.environ.get('SERPER_API_KEY')
+    if not api_key:
+        print("Warning: SERPER_API_KEY environment variable not set")
+        return [{"title": "No API key found", "snippet": "Please set the SERPER_API_KEY environment variable", "link": ""}]
+    
+    payload = {
+        "q": query,
+        "gl": "us",
+        "hl": "en",
+        "num": num_results * 3  # Request more results to account for filtering
+    }
+    
+    headers = {
+        'X-API-KEY': api_key,
+        'Content-Type': 'application/json'
+    }
+    
+    try:
+        session = get_async_session()
+        response = await acall_with_rate_limit(
+            "serper", lambda: session.post(SERPER_SEARCH_URL, headers=headers, json=payload, timeout=timeout),
+            max_wait=timeout
+        )
+        response.raise_for_status()
         
+        result = response.json()
+        search_results = _filter_search_results(result.get("organic", []), num_results, use_trusted_domains)
+        _store_cached_search(cache_key, search_results)
         return search_results
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, RateLimitTimeout, ValueError) as e:
+        # Network errors, the rate limiter running out of time and malformed responses
         print(f"Error during web search: {str(e)}")
         return [{"title": "Search Error", "snippet": f"Error: {str(e)}", "link": ""}]
-    except Exception as e:
-        print(f"Unexpected error during web search: {str(e)}")
-        return [{"title": "Error", "snippet": f"Unexpected error: {str(e)}", "link": ""}]
 
 
 class GoogleSearchTool(BaseTool):
@@ -192,7 +349,14 @@ class GoogleSearchTool(BaseTool):
             site_restriction = " OR ".join([f"site:{domain}" for domain in top_domains])
             trusted_sites_query = f"{query} ({site_restriction})"
             
-        result = service.cse().list(q=trusted_sites_query, cx=self._cse_id, num=num_results).execute()
+        limiter = get_rate_limiter("google_cse")
+        limiter.acquire()
+        try:
+            result = service.cse().list(q=trusted_sites_query, cx=self._cse_id, num=num_results).execute()
+        except Exception as e:
+            limiter.record_exception(e)
+            raise
+        limiter.record(200)
         
         # Process and format the results
         formatted_results = []
@@ -249,7 +413,9 @@ class GoogleSearchTool(BaseTool):
             return self._previous_results[query]
         
         try:
-            formatted_results = self._cached_search(query, num_results)
+            formatted_results = get_single_flight("google_search").do(
+                (query, num_results), lambda: self._cached_search(query, num_results)
+            )
             
             # If no results from trusted domains, use sample data
             if not formatted_results:
@@ -421,6 +587,20 @@ class WebScraper(BaseTool):
             self._cache[url] = json.dumps(untrusted_result)
             return self._cache[url]
         
+        # Concurrent scrapes of the same URL (from any WebScraper) share one request
+        self._cache[url] = get_single_flight("web_scraper").do(url, lambda: self._scrape(url))
+        return self._cache[url]
+    
+    def _scrape(self, url: str) -> str:
+        """
+        Fetch and extract the content of a URL, retrying once.
+        
+        Args:
+            url: The URL to scrape
+            
+        Returns:
+            JSON string of the scraped content (sample content if the URL could not be accessed)
+        """
         max_retries = 2
         retry_count = 0
         
@@ -478,18 +658,14 @@ class WebScraper(BaseTool):
                     "url": url
                 }
                 
-                # Cache the result
-                self._cache[url] = json.dumps(result)
-                return self._cache[url]
+                return json.dumps(result)
                 
             except Exception as e:
                 retry_count += 1
                 print(f"Warning: Error scraping URL (attempt {retry_count}/{max_retries}): {str(e)}")
                 if retry_count >= max_retries:
                     print(f"Warning: Using fallback sample data for web scraping as URL '{url}' could not be accessed.")
-                    sample_data = self._get_sample_content(url)
-                    self._cache[url] = json.dumps(sample_data)
-                    return self._cache[url]
+                    return json.dumps(self._get_sample_content(url))
                 time.sleep(1)  # Wait 1 second before retrying
     
     def _get_sample_content(self, url: str) -> Dict[str, str]:
@@ -560,7 +736,9 @@ class SerpApiSearchTool(BaseTool):
             "engine": "google"
         }
         
-        response = requests.get("https://serpapi.com/search", params=params, timeout=15)
+        response = call_with_rate_limit(
+            "serpapi", lambda: requests.get("https://serpapi.com/search", params=params, timeout=15), max_wait=15
+        )
         response.raise_for_status()
         result = response.json()
         
@@ -624,7 +802,9 @@ class SerpApiSearchTool(BaseTool):
             
             while retry_count < max_retries:
                 try:
-                    formatted_results = self._cached_search(query, num_results)
+                    formatted_results = get_single_flight("serpapi_search").do(
+                        (query, num_results), lambda: self._cached_search(query, num_results)
+                    )
                     
                     # If no results from trusted domains, get more results or use sample data
                     if not formatted_results:
@@ -71,6 +71,8 @@ try:
     format_consensus_text = main_app_module.format_consensus_text
     display_progress_steps = main_app_module.display_progress_steps
     display_results = main_app_module.display_results
+    run_analysis_with_progress = main_app_module.run_analysis_with_progress
+    ANALYSIS_STAGES = main_app_module.ANALYSIS_STAGES
     
     try:
         SUPPORTED_LANGUAGES = main_app_module.SUPPORTED_LANGUAGES
@@ -101,6 +103,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Compile the diagnosis graphs once when the server starts
+main_app_module.warm_up_diagnosis_graphs()
+
 # Update Custom CSS section, add center container
 st.markdown("""
 <style>
@@ -482,55 +487,33 @@ if app_mode == "Cancer Analysis System":
         # Analysis process
         progress_container = st.empty()
         status_text = st.empty()
+        preview_container = st.empty()
         result_container = st.empty()
         
         try:
-            # Processing stages
-            stages = [
-                "Cancer Research",
-                "Source Verification",
-                "Cancer Analysis",
-                "Treatment Analysis",
-                "Consensus Building"
-            ]
-            
             # Run the actual analysis process
             with st.spinner("Analyzing cancer information..."):
                 # Display initial progress
                 with progress_container.container():
                     display_progress_steps(0)
-                status_text.info(f"Processing: {stages[0]}...")
+                status_text.info(f"Processing: {ANALYSIS_STAGES[0]}...")
                 
-                # Get results with optional translation
-                if target_language:
-                    result = get_medical_diagnosis_with_translation(
-                        topic=topic,
-                        symptoms=symptoms,
-                        medical_history=medical_history,
-                        test_results=test_results,
-                        realtime=use_realtime,
-                        target_language=target_language
-                    )
-                else:
-                    result = get_medical_diagnosis(
-                        topic=topic,
-                        symptoms=symptoms,
-                        medical_history=medical_history,
-                        test_results=test_results,
-                        realtime=use_realtime
-                    )
-                
-                # Display progress for remaining steps
-                for i in range(1, len(stages)):
-                    with progress_container.container():
-                        display_progress_steps(i)
-                    status_text.info(f"Processing: {stages[i]}...")
-                    import time
-                    time.sleep(0.5)  # Simulate progress
+                # Progress follows the workflow nodes as they complete
+                result = run_analysis_with_progress(
+                    topic=topic,
+                    symptoms=symptoms,
+                    medical_history=medical_history,
+                    test_results=test_results,
+                    realtime=use_realtime,
+                    target_language=target_language,
+                    progress_container=progress_container,
+                    status_text=status_text,
+                    preview_container=preview_container
+                )
             
             # Complete progress indicator
             with progress_container.container():
-                display_progress_steps(len(stages))
+                display_progress_steps(len(ANALYSIS_STAGES))
             status_text.success("Analysis complete!")
             
             # Display results